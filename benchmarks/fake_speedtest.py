@@ -0,0 +1,173 @@
+# a local stand-in for the speedtest.net endpoints speedtest-cli talks to:
+# config, server list, latency, download images and upload.php.
+# usage: python benchmarks/fake_speedtest.py [--port 8080] [--rate-mbps 1000] [--servers 3]
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+CHUNK = 64 * 1024
+_BLOCK = memoryview(os.urandom(CHUNK))
+
+CONFIG_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<settings>
+<client ip="127.0.0.1" lat="0.0" lon="0.0" isp="Localtest Bench ISP" isprating="3.7" rating="0" ispdlavg="0" ispulavg="0" loggedin="0" country="ZZ"/>
+<server-config threadcount="4" ignoreids="" notonmap="" forcepingid="" preferredserverid=""/>
+<licensekey>bench</licensekey>
+<customer>bench</customer>
+<odometer start="1" rate="1"/>
+<times dl1="5000000" dl2="35000000" dl3="800000000" ul1="1000000" ul2="8000000" ul3="35000000"/>
+<download testlength="{length}" initialtest="250K" mintestsize="250K" threadsperurl="4"/>
+<upload testlength="{length}" ratio="5" initialtest="0" mintestsize="32K" threads="2" maxchunksize="512K" maxchunkcount="50" threadsperurl="4"/>
+<latency testlength="10" waittime="50" timeout="20"/>
+<socket-download testlength="15" initialthreads="4" minthreads="4" maxthreads="32" threadratio="750K" maxsamplesize="5000000" minsamplesize="32000" startsamplesize="1000000" startbuffersize="1" bufferlength="5000" packetlength="1000" readbuffer="65536"/>
+<socket-upload testlength="15" initialthreads="dyn:tcpulthreads" minthreads="dyn:tcpulthreads" maxthreads="32" threadratio="750K" maxsamplesize="1000000" minsamplesize="32000" startsamplesize="100000" startbuffersize="2" bufferlength="1000" packetlength="1000" disabled="false"/>
+<socket-latency testlength="10" waittime="50" timeout="20"/>
+<translation lang="xml"></translation>
+</settings>
+"""
+
+class TokenBucket:
+    # shared by every connection so the whole fake server behaves like one link of rate_mbps
+    def __init__(self, rate_mbps):
+        self.rate = rate_mbps * 1_000_000 / 8 if rate_mbps else None
+        self.tokens = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, n):
+        if self.rate is None:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate * 0.05, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, body, content_type="text/plain"):
+        if isinstance(body, str):
+            body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        name = os.path.basename(path)
+        if name == "speedtest-config.php":
+            self._reply(CONFIG_XML.format(length=self.server.test_length), "text/xml")
+        elif name.startswith("speedtest-servers"):
+            self._reply(self.server.servers_xml(), "text/xml")
+        elif name == "latency.txt":
+            self._reply("test=test\n")
+        elif name.startswith("random") and name.endswith(".jpg"):
+            size = int(name[len("random"):-len(".jpg")].split("x")[0])
+            self._send_image(size * size * 2)
+        else:
+            self.send_error(404)
+
+    def _send_image(self, length):
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        remaining = length
+        try:
+            while remaining > 0:
+                n = min(CHUNK, remaining)
+                self.server.bucket.take(n)
+                self.wfile.write(_BLOCK[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        remaining = length
+        try:
+            while remaining > 0:
+                data = self.rfile.read(min(CHUNK, remaining))
+                if not data:
+                    break
+                self.server.bucket.take(len(data))
+                remaining -= len(data)
+            self._reply(f"size={length - remaining}")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # client hung up mid-body when its time ran out
+
+class FakeSpeedtestServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), rate_mbps=None, server_count=3, test_length=5):
+        super().__init__(address, _Handler)
+        self.bucket = TokenBucket(rate_mbps)
+        self.server_count = server_count
+        self.test_length = test_length
+
+    @property
+    def base(self):
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+    def servers_xml(self):
+        rows = []
+        for i in range(1, self.server_count + 1):
+            rows.append(f'<server url="http://{self.base}/s{i}/speedtest/upload.php" lat="0.{i}" lon="0.{i}" '
+                        f'name="Bench {i}" country="Nowhere" cc="ZZ" sponsor="Localtest Bench {i}" id="{9000 + i}" host="{self.base}"/>')
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n<settings>\n<servers>\n'
+                + "\n".join(rows) + "\n</servers>\n</settings>\n")
+
+    def set_rate(self, rate_mbps):
+        self.bucket = TokenBucket(rate_mbps)
+
+def start(rate_mbps=None, server_count=3, test_length=5, port=0):
+    server = FakeSpeedtestServer(("127.0.0.1", port), rate_mbps, server_count, test_length)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def redirect_speedtest(base):
+    # points speedtest-cli's hardcoded speedtest.net urls at the fake server (base is "host:port")
+    import speedtest
+    original = getattr(speedtest, "_localtest_original_build_request", speedtest.build_request)
+    speedtest._localtest_original_build_request = original
+    hosts = ("www.speedtest.net", "c.speedtest.net")
+
+    def build_request(url, *args, **kwargs):
+        for host in hosts:
+            url = url.replace(f"https://{host}", f"http://{base}").replace(f"http://{host}", f"http://{base}")
+            if url.startswith(f"://{host}"):
+                url = f"http://{base}" + url[len(f"://{host}"):]
+        kwargs["secure"] = False
+        return original(url, *args, **kwargs)
+
+    speedtest.build_request = build_request
+
+def main():
+    port = int(sys.argv[sys.argv.index("--port") + 1]) if "--port" in sys.argv else 8080
+    rate = float(sys.argv[sys.argv.index("--rate-mbps") + 1]) if "--rate-mbps" in sys.argv else None
+    count = int(sys.argv[sys.argv.index("--servers") + 1]) if "--servers" in sys.argv else 3
+    server = FakeSpeedtestServer(("127.0.0.1", port), rate, count)
+    print(f"fake speedtest server on http://{server.base} ({f'{rate} Mbps' if rate else 'unthrottled'}, {count} servers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
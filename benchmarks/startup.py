@@ -0,0 +1,74 @@
+# startup-time regression check for the CLI.
+# usage: python benchmarks/startup.py [--runs N]
+# exits non-zero if a command goes over its budget or drags in a heavy module it shouldn't need.
+import os
+import sys
+import json
+import tempfile
+import subprocess
+import statistics
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# milliseconds on top of a bare "python -c pass"
+BUDGETS_MS = {
+    "help": 60,
+    "network history": 100,
+    "network settings": 80,
+}
+
+HEAVY_MODULES = ("speedtest", "asyncio", "urllib.request", "http.client", "subprocess",
+                 "packaging", "socketserver", "ssl", "platform")
+
+SNIPPET = """
+import sys
+sys.argv = ["localtest"] + {args!r}
+from localtest.cli import main
+main()
+sys.stdout.flush()
+sys.stderr.write("@@MODULES@@" + ",".join(sorted(sys.modules)))
+"""
+
+def run_once(code, cwd):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    start = time.perf_counter()
+    p = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if p.returncode != 0:
+        raise RuntimeError(p.stderr)
+    return elapsed, p.stderr
+
+def measure(code, cwd, runs):
+    timings = []
+    stderr = ""
+    for _ in range(runs):
+        elapsed, stderr = run_once(code, cwd)
+        timings.append(elapsed)
+    return statistics.median(timings), stderr
+
+def main():
+    runs = int(sys.argv[sys.argv.index("--runs") + 1]) if "--runs" in sys.argv else 15
+    failed = False
+    report = {}
+    with tempfile.TemporaryDirectory() as cwd:
+        bare, _ = measure("pass", cwd, runs)
+        print(f"bare interpreter: {bare:.1f} ms (median of {runs})")
+        for command, budget in BUDGETS_MS.items():
+            median, stderr = measure(SNIPPET.format(args=command.split()), cwd, runs)
+            modules = stderr.split("@@MODULES@@")[-1].split(",")
+            heavy = [m for m in HEAVY_MODULES if m in modules]
+            overhead = median - bare
+            ok = overhead <= budget and not heavy
+            failed |= not ok
+            report[command] = {"median_ms": round(median, 1), "overhead_ms": round(overhead, 1), "budget_ms": budget, "heavy_imports": heavy}
+            status = "OK" if ok else "FAIL"
+            print(f"[{status}] localtest {command}: {median:.1f} ms (+{overhead:.1f} ms, budget {budget} ms)"
+                  + (f" heavy imports: {', '.join(heavy)}" if heavy else ""))
+
+    if "--json" in sys.argv:
+        print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# end-to-end self-benchmark: drives the real CLI against benchmarks/fake_speedtest.py and big generated histories.
+# usage: python benchmarks/suite.py [--quick] [--out results.json] [--compare old_results.json]
+# every run writes one JSON file, diff two of them with --compare to see what a change did.
+import os
+import re
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_speedtest # noqa: E402
+
+HISTORY_SIZES = (10, 1_000, 100_000, 1_000_000)
+QUICK_HISTORY_SIZES = (10, 1_000, 10_000)
+LINK_RATES_MBPS = (100, 1_000, 5_000, None) # None = as fast as loopback goes
+QUICK_LINK_RATES_MBPS = (100, 1_000)
+
+# runs the cli in a child process with speedtest-cli pointed at the fake server,
+# and reports the child's own cpu time so we can see what localtest costs per Gbit
+SNIPPET = """
+import sys, time, json
+sys.path[:0] = {paths!r}
+if {base!r}:
+    import fake_speedtest
+    fake_speedtest.redirect_speedtest({base!r})
+sys.argv = ["localtest"] + {args!r}
+from localtest.cli import main
+main()
+sys.stdout.flush()
+sys.stderr.write("@@STATS@@" + json.dumps({{"cpu_seconds": time.process_time()}}))
+"""
+
+def run_cli(args, cwd, base=None, timeout=600):
+    code = SNIPPET.format(paths=[ROOT, os.path.dirname(os.path.abspath(__file__))], base=base, args=args)
+    start = time.perf_counter()
+    p = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - start
+    if p.returncode != 0 or "@@STATS@@" not in p.stderr:
+        raise RuntimeError((p.stderr or p.stdout).strip().splitlines()[-1] if (p.stderr or p.stdout).strip() else f"exit {p.returncode}")
+    stats = json.loads(p.stderr.rsplit("@@STATS@@", 1)[1])
+    events = []
+    for line in p.stdout.splitlines():
+        if line.startswith("{"):
+            events.append(json.loads(line))
+    return {"wall_seconds": round(wall, 3), "cpu_seconds": round(stats["cpu_seconds"], 3)}, events
+
+def write_settings(cwd, **overrides):
+    settings = {"ping_test_host": "127.0.0.1", "ping_method": "tcp", "ping_count": 4, "colors": False}
+    settings.update(overrides)
+    with open(os.path.join(cwd, "network_settings.json"), "w") as f:
+        json.dump(settings, f)
+
+def bench_speed(server, rates, log):
+    results = {}
+    for rate in rates:
+        name = f"network_run_{rate or 'unthrottled'}mbps"
+        server.set_rate(rate)
+        with tempfile.TemporaryDirectory() as cwd:
+            write_settings(cwd, ping_tcp_port=server.server_address[1])
+            try:
+                timing, events = run_cli(["--output", "ndjson", "network", "run"], cwd, server.base)
+            except Exception as e:
+                results[name] = {"error": str(e)}
+                log(f"{name}: error: {e}")
+                continue
+        result = next((e for e in events if e.get("event") == "result"), {})
+        # rough: each phase runs for about the configured test length, so bits moved ~ rate * length
+        moved_gbit = ((result.get("download_mbps") or 0) + (result.get("upload_mbps") or 0)) * server.test_length / 1000
+        timing.update({
+            "link_mbps": rate,
+            "download_mbps": result.get("download_mbps"),
+            "upload_mbps": result.get("upload_mbps"),
+            "cpu_seconds_per_gbit": round(timing["cpu_seconds"] / moved_gbit, 4) if moved_gbit else None,
+        })
+        results[name] = timing
+        log(f"{name}: ↓ {timing['download_mbps']} ↑ {timing['upload_mbps']} Mbps, {timing['wall_seconds']}s wall, {timing['cpu_seconds']}s cpu")
+    return results
+
+def bench_improve(server, log):
+    server.set_rate(1_000)
+    with tempfile.TemporaryDirectory() as cwd:
+        write_settings(cwd, ping_tcp_port=server.server_address[1])
+        try:
+            timing, events = run_cli(["--output", "ndjson", "network", "improve"], cwd, server.base)
+        except Exception as e:
+            log(f"network_improve: error: {e}")
+            return {"network_improve": {"error": str(e)}}
+    timing["diagnostics"] = any(e.get("event") == "diagnostics" for e in events)
+    log(f"network_improve: {timing['wall_seconds']}s wall, {timing['cpu_seconds']}s cpu")
+    return {"network_improve": timing}
+
+def fake_entries(count, seed=1):
+    rng = random.Random(seed)
+    start = time.mktime(time.strptime("2020-01-01 00:00:00", "%Y-%m-%d %H:%M:%S"))
+    step = max(1, int(5 * 365 * 86400 / count)) # spread over ~5 years
+    isps = ("Bench Fiber", "Bench Cable", "Bench Mobile")
+    for i in range(count):
+        yield {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start + i * step)),
+            "full_scan": rng.random() < 0.2,
+            "isp": isps[rng.randrange(len(isps))],
+            "ping": round(rng.uniform(5, 60), 2),
+            "download_mbps": round(rng.uniform(50, 2_000), 2),
+            "upload_mbps": round(rng.uniform(10, 500), 2),
+        }
+
+def bench_history(sizes, log):
+    from localtest.history import append_entries, HISTORY_DIR
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as cwd:
+            directory = os.path.join(cwd, HISTORY_DIR)
+            batch = []
+            start = time.perf_counter()
+            last_timestamp = None
+            for entry in fake_entries(size):
+                batch.append(entry)
+                if len(batch) >= 10_000:
+                    append_entries(batch, directory)
+                    batch = []
+                last_timestamp = entry["timestamp"]
+            if batch:
+                append_entries(batch, directory)
+            generated = time.perf_counter() - start
+
+            row = {"entries": size, "generate_seconds": round(generated, 3),
+                   "disk_mb": round(sum(os.path.getsize(os.path.join(directory, n)) for n in os.listdir(directory)) / 1e6, 2)}
+            commands = {
+                "list": ["--output", "ndjson", "network", "history"],
+                "tail": ["network", "history", "--since", last_timestamp[:10]],
+                "rollup_cold": ["network", "history", "--window", "day"],
+                "rollup_warm": ["network", "history", "--window", "day"],
+                "rollup_month_isp": ["network", "history", "--window", "month", "--isp", "fiber"],
+            }
+            for label, args in commands.items():
+                try:
+                    timing, _ = run_cli(args, cwd)
+                    row[label + "_seconds"] = timing["wall_seconds"]
+                except Exception as e:
+                    row[label + "_seconds"] = None
+                    row.setdefault("errors", []).append(f"{label}: {e}")
+            try:
+                timing, _ = run_cli(["network", "history", "compact"], cwd)
+                row["compact_seconds"] = timing["wall_seconds"]
+            except Exception as e:
+                row.setdefault("errors", []).append(f"compact: {e}")
+        results[f"history_{size}"] = row
+        log(f"history_{size}: " + ", ".join(f"{k} {v}" for k, v in row.items() if k.endswith("_seconds")))
+    return results
+
+def get_version():
+    with open(os.path.join(ROOT, "pyproject.toml"), "r") as f:
+        match = re.search(r'^version\s*=\s*"([^"]+)"', f.read(), re.M)
+    return match.group(1) if match else "unknown"
+
+def get_commit():
+    try:
+        p = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+        return p.stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(old, new):
+    # prints every numeric metric that moved, slower/faster is left to the reader since some are rates
+    print(f"\ncomparing {old.get('version')} ({old.get('commit')}) -> {new.get('version')} ({new.get('commit')})")
+    for name, row in new["results"].items():
+        before = old.get("results", {}).get(name)
+        if not before:
+            continue
+        for key, value in row.items():
+            prev = before.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(prev, (int, float)) or isinstance(value, bool) or not prev:
+                continue
+            change = (value - prev) / prev * 100
+            if abs(change) >= 1:
+                print(f"  {name}.{key}: {prev} -> {value} ({change:+.1f}%)")
+
+def main():
+    quick = "--quick" in sys.argv
+    out = sys.argv[sys.argv.index("--out") + 1] if "--out" in sys.argv else "localtest_bench.json"
+    log = lambda text: print(text, flush=True)
+
+    report = {
+        "version": get_version(),
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "quick": quick,
+        "results": {},
+    }
+
+    server = fake_speedtest.start(test_length=3 if quick else 5)
+    log(f"fake speedtest server on http://{server.base}")
+    try:
+        report["results"].update(bench_speed(server, QUICK_LINK_RATES_MBPS if quick else LINK_RATES_MBPS, log))
+        report["results"].update(bench_improve(server, log))
+    finally:
+        server.shutdown()
+        server.server_close()
+    report["results"].update(bench_history(QUICK_HISTORY_SIZES if quick else HISTORY_SIZES, log))
+
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    log(f"\nwrote {out}")
+
+    if "--compare" in sys.argv:
+        with open(sys.argv[sys.argv.index("--compare") + 1], "r") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
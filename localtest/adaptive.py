@@ -0,0 +1,68 @@
+import math
+import time
+import threading
+
+Z_95 = 1.96
+
+class ConvergenceWatcher:
+    # watches the live samples of one phase and trips stop_event once the throughput estimate has settled.
+    # speedtest-cli's downloader/uploader threads check that event between chunks, so the phase ends early.
+    def __init__(self, interval, tolerance=0.05, window_seconds=2.0, min_seconds=3.0, max_seconds=15.0, max_bytes=None,
+                 clock=time.perf_counter):
+        self.interval = interval
+        self.tolerance = tolerance
+        self.window = max(3, int(round(window_seconds / interval)))
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self.started = clock()
+        self.recent = []
+        self.reason = None
+        self.mean = None
+        self.halfwidth = None
+        self.bytes = 0
+
+    def update(self, mbps, total_bytes):
+        if self.reason is not None:
+            return
+        self.bytes = total_bytes
+        elapsed = self.clock() - self.started
+        if elapsed >= self.min_seconds:
+            self.recent.append(mbps)
+            if len(self.recent) > self.window:
+                del self.recent[0]
+            self._estimate()
+
+        if self.halfwidth is not None and self.mean and self.halfwidth / self.mean <= self.tolerance:
+            self._stop("converged")
+        elif elapsed >= self.max_seconds:
+            self._stop("time_cap")
+        elif self.max_bytes is not None and total_bytes >= self.max_bytes:
+            self._stop("byte_cap")
+
+    def _estimate(self):
+        n = len(self.recent)
+        if n < self.window:
+            return
+        mean = sum(self.recent) / n
+        variance = sum((x - mean) ** 2 for x in self.recent) / (n - 1)
+        self.mean = mean
+        self.halfwidth = Z_95 * math.sqrt(variance) / math.sqrt(n)
+
+    def _stop(self, reason):
+        self.reason = reason
+        self.stop_event.set()
+
+    def estimate_bps(self):
+        return self.mean * 1_000_000 if self.mean is not None else None
+
+    def report(self):
+        return {
+            "stopped": self.reason or "completed",
+            "seconds": round(self.clock() - self.started, 2),
+            "megabytes": round(self.bytes / 1_000_000, 2),
+            "tolerance_percent": round(self.tolerance * 100, 2),
+            "ci95_percent": round(100 * self.halfwidth / self.mean, 2) if self.mean and self.halfwidth is not None else None,
+        }
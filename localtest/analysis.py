@@ -0,0 +1,234 @@
+import os
+import json
+from bisect import insort, bisect_left
+
+from localtest.history import HISTORY_DIR, _HistoryLock, open_history, iter_after, cursor_is_valid
+from localtest.query import METRICS
+
+ANALYSIS_FILE = "analysis.json"
+CHANGE_POINTS_KEPT = 10
+
+# ping going up is bad, throughput going down is bad
+HIGHER_IS_BETTER = {"download_mbps": True, "upload_mbps": True, "ping": False}
+
+# CUSUM tuning in units of sigma: ignore drifts under half a sigma, alarm after ~5 sigma of piled up evidence
+CUSUM_SLACK = 0.5
+CUSUM_LIMIT = 5.0
+
+def _alpha(half_life):
+    # EWMA weight so a run's influence halves every `half_life` runs
+    return 1 - 0.5 ** (1 / max(1, half_life))
+
+class Tracker:
+    # running stats for one (isp, metric). everything updates in O(window) per run,
+    # nothing ever looks at the full history again
+    def __init__(self, metric):
+        self.metric = metric
+        self.count = 0
+        self.fast = None # where the metric is now
+        self.baseline = None # where it usually is, moves slowly and stops moving during a regression
+        self.variance = 0.0
+        self.cusum = 0.0
+        self.window = [] # last N values in arrival order, for rolling percentiles
+        self.sorted = []
+        self.regression = None
+        # runs since a change point or regression, the baseline holds still until it's clear whether it sticks
+        self.shifted = 0
+        self.change_points = []
+        self.last_timestamp = None
+
+    def worse_by(self, value, reference):
+        # how far value is on the bad side of reference, as a fraction of reference
+        if not reference:
+            return 0.0
+        drop = (reference - value) / reference
+        return drop if HIGHER_IS_BETTER[self.metric] else -drop
+
+    def add(self, value, timestamp, config):
+        self.count += 1
+        self.last_timestamp = timestamp
+        self.window.append(value)
+        insort(self.sorted, value)
+        if len(self.window) > config["window"]:
+            old = self.window.pop(0)
+            del self.sorted[bisect_left(self.sorted, old)]
+
+        if self.count == 1:
+            self.fast = self.baseline = value
+            return None
+        self.fast += config["fast_alpha"] * (value - self.fast)
+
+        # the ewm variance starts at zero, so the window's spread covers for it early on.
+        # sigma also floors at 2% of the baseline so a perfectly steady link doesn't alarm on noise
+        sigma = max(self.variance ** 0.5, self.window_std(), abs(self.baseline) * 0.02, 1e-9)
+        if self.regression is None and self.count > 2 * config["min_runs"]:
+            shortfall = self.worse_by(value, self.baseline) * abs(self.baseline) / sigma
+            self.cusum = max(0.0, self.cusum + shortfall - CUSUM_SLACK)
+
+        event = None
+        if self.cusum > CUSUM_LIMIT:
+            self.change_points.append({"timestamp": timestamp, "run": self.count,
+                                       "baseline": round(self.baseline, 2), "level": round(self.fast, 2)})
+            del self.change_points[:-CHANGE_POINTS_KEPT]
+            self.cusum = 0.0
+            self.shifted = self.shifted or 1
+            event = "change_point"
+
+        drop = self.worse_by(self.fast, self.baseline)
+        if self.regression is None:
+            if self.count >= config["min_runs"] and drop >= config["threshold"]:
+                self.regression = {"since": timestamp, "runs": 0, "baseline": round(self.baseline, 2)}
+                event = "regression"
+            elif self.shifted > config["min_runs"] and drop < config["threshold"] / 4:
+                self.shifted = 0 # settled back near the baseline, just a blip
+        elif drop < config["threshold"] / 2:
+            self.regression = None
+            self.shifted = 0
+            event = "recovered"
+
+        if self.regression is None and not self.shifted:
+            diff = value - self.baseline
+            self.baseline += config["baseline_alpha"] * diff
+            self.variance = (1 - config["baseline_alpha"]) * (self.variance + config["baseline_alpha"] * diff * diff)
+            return event
+
+        if self.regression is not None:
+            self.regression["runs"] += 1
+            self.regression["level"] = round(self.fast, 2)
+            self.regression["drop_percent"] = round(drop * 100, 1)
+        self.shifted += 1
+        if self.shifted > config["window"]:
+            # different for a whole window, that's the new normal (new plan, moved house...). start over from here
+            if self.regression is not None:
+                event = "accepted"
+            self.regression = None
+            self.shifted = 0
+            self.baseline = self.fast
+            self.variance = 0.0
+        return event
+
+    def window_std(self):
+        n = len(self.window)
+        if n < 2:
+            return 0.0
+        mean = sum(self.window) / n
+        return (sum((v - mean) ** 2 for v in self.window) / (n - 1)) ** 0.5
+
+    def percentile(self, p):
+        if not self.sorted:
+            return None
+        return round(self.sorted[min(len(self.sorted) - 1, int(len(self.sorted) * p / 100))], 2)
+
+    def summary(self):
+        return {
+            "runs": self.count,
+            "window": len(self.window),
+            "now": round(self.fast, 2) if self.fast is not None else None,
+            "baseline": round(self.baseline, 2) if self.baseline is not None else None,
+            "p10": self.percentile(10),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "regression": self.regression,
+            "change_points": self.change_points,
+            "last_timestamp": self.last_timestamp,
+        }
+
+    def to_dict(self):
+        return {"metric": self.metric, "count": self.count, "fast": self.fast, "baseline": self.baseline,
+                "variance": self.variance, "cusum": self.cusum, "window": self.window, "regression": self.regression,
+                "shifted": self.shifted, "change_points": self.change_points, "last_timestamp": self.last_timestamp}
+
+    @classmethod
+    def from_dict(cls, data):
+        tracker = cls(data["metric"])
+        tracker.count = data["count"]
+        tracker.fast = data["fast"]
+        tracker.baseline = data["baseline"]
+        tracker.variance = data["variance"]
+        tracker.cusum = data["cusum"]
+        tracker.window = data["window"]
+        tracker.sorted = sorted(tracker.window)
+        tracker.regression = data["regression"]
+        tracker.shifted = data.get("shifted", 0)
+        tracker.change_points = data["change_points"]
+        tracker.last_timestamp = data["last_timestamp"]
+        return tracker
+
+def config_from_settings(settings):
+    return {
+        "fast_alpha": _alpha(settings.get("analysis_fast_runs", 5)),
+        "baseline_alpha": _alpha(settings.get("analysis_baseline_runs", 30)),
+        "window": max(2, settings.get("analysis_window_runs", 50)),
+        "min_runs": settings.get("analysis_min_runs", 5),
+        "threshold": settings.get("analysis_regression_percent", 15) / 100,
+    }
+
+def _path(directory):
+    return os.path.join(directory, ANALYSIS_FILE)
+
+def _empty_state():
+    return {"cursor": None, "trackers": {}}
+
+def load_state(directory=HISTORY_DIR):
+    try:
+        with open(_path(directory), "r") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return _empty_state()
+    if "cursor" not in data:
+        return _empty_state() # older file that went by timestamp, rebuilt from scratch
+    data["trackers"] = {key: Tracker.from_dict(t) for key, t in data.get("trackers", {}).items()}
+    return data
+
+def save_state(state, directory=HISTORY_DIR):
+    # callers hold the history lock, the pid in the name keeps a stray writer from sharing the tmp file anyway
+    data = {"cursor": state["cursor"],
+            "trackers": {key: t.to_dict() for key, t in state["trackers"].items()}}
+    tmp_path = _path(directory) + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, _path(directory))
+
+def tracker_key(isp, metric):
+    return f"{isp}|{metric}"
+
+def feed(state, entry, config):
+    # returns [(isp, metric, event, tracker)] for anything that changed state
+    events = []
+    isp = entry.get("isp") or "Unknown"
+    ts = entry.get("timestamp")
+    for metric in METRICS:
+        value = entry.get(metric)
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            continue
+        key = tracker_key(isp, metric)
+        if key not in state["trackers"]:
+            state["trackers"][key] = Tracker(metric)
+        tracker = state["trackers"][key]
+        event = tracker.add(float(value), ts, config)
+        if event:
+            events.append((isp, metric, event, tracker))
+    return events
+
+def update(settings, directory=HISTORY_DIR, rebuild=False):
+    # picks up every entry saved since the last update, normally just the one run_speed_test wrote.
+    # the whole read-feed-save happens under the history lock so two updates can't both apply the same runs
+    open_history(directory)
+    config = config_from_settings(settings)
+    events = []
+    with _HistoryLock(directory):
+        state = _empty_state() if rebuild else load_state(directory)
+        replaying = False
+        if state["cursor"] is not None and not cursor_is_valid(state["cursor"], directory):
+            # history got compacted under us, start over but only report what the newest run changed
+            state = _empty_state()
+            replaying = True
+        start = state["cursor"]
+        for entry, cursor in iter_after(start, directory):
+            state["cursor"] = cursor
+            if entry.get("timestamp"):
+                new = feed(state, entry, config)
+                events = new if replaying else events + new
+        if state["cursor"] != start or rebuild:
+            save_state(state, directory)
+    return state, events
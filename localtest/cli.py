@@ -1,45 +1,29 @@
 import sys
-import time
-import threading
-import speedtest
 import os
-import json
+import time
 import itertools
 import signal
-import subprocess
-import platform
-import re
-import urllib.request
-import importlib.metadata
-import json
-from packaging.version import parse as parse_version
-
-if os.name == "nt":
-    import ctypes
-    kernel32 = ctypes.windll.kernel32
-    handle = kernel32.GetStdHandle(-11)
-    mode = ctypes.c_uint32()
-    kernel32.GetConsoleMode(handle, ctypes.byref(mode))
-    kernel32.SetConsoleMode(handle, mode.value | 0x0004)
+from localtest.settings import DEFAULT_SETTINGS, load_settings, save_settings, get_formatter
+from localtest.output import OUTPUT_MODES, write_text, emit, set_mode, machine_readable, flush as flush_output, close as close_output
+
+_console_ready = False
+
+def setup_console():
+    # only windows needs this, and only once something is actually printed
+    global _console_ready
+    _console_ready = True
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        kernel32.GetConsoleMode(handle, ctypes.byref(mode))
+        kernel32.SetConsoleMode(handle, mode.value | 0x0004)
 
 def cprint(text):
-    settings = load_settings()
-    if settings.get("colors", True):
-        print(text)
-    else:
-        ansi_escape = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
-        print(ansi_escape.sub('', text))
-
-HISTORY_FILE = "network_history.json"
-SETTINGS_FILE = "network_settings.json"
-
-DEFAULT_SETTINGS = {
-    "threads_quick": 2,
-    "threads_full": 16,
-    "ping_test_host": "8.8.8.8",
-    "ping_count": 4,
-    "colors": True,
-}
+    if not _console_ready:
+        setup_console()
+    write_text(get_formatter()(text))
 
 active_stop_events = []
 
@@ -77,8 +61,19 @@ COMMANDS_TEXT = """
 \033[1;33mlocaltest network\033[0m
     \033[90mrun\033[0m Runs the network scan. -fs is compatiable.
     \033[90mhistory\033[0m Shows the history of all your scans, locally.
+        \033[90mcompact\033[0m Folds old history segments together.
     \033[90msettings\033[0m View or change settings for the Network tool.
     \033[90mimprove\033[0m Running this command will improve your network speeds. -a is compatiable.
+    \033[90mdns\033[0m Benchmarks your DNS resolvers against popular ones.
+    \033[90mserve\033[0m Runs a LAN server for 'network run --target' and 'network udp --target'.
+    \033[90mmonitor\033[0m Keeps probing latency and runs speed tests on a schedule.
+    \033[90mudp\033[0m Streams UDP packets to measure jitter, loss and reordering.
+    \033[90manalyze\033[0m Tracks each metric per ISP and flags when one gets worse than usual.
+
+\033[1;33mlocaltest hardware\033[0m
+    \033[90mcpu\033[0m Benchmarks single-core, all-core and memory performance.
+    \033[90mdisk\033[0m Benchmarks sequential throughput and random 4K IOPS of a disk.
+    \033[90mhistory\033[0m Shows your hardware results, and compares nodes with --from.
 """
 
 FLAGS_TEXT = """
@@ -86,53 +81,41 @@ FLAGS_TEXT = """
 
 \033[1;33m-fs\033[0m Fully and precisely use the current tool. Compatiable with: Network RUN.
 \033[1;33m-a\033[0m Apply. Compatiable with: Network IMPROVE.
+\033[1;33m--refresh\033[0m Skip the cached release info and ask the package index again. Compatiable with: UPDATE.
+\033[1;33m--output\033[0m text, json or ndjson. Streams machine-readable events on stdout. Compatiable with: everything.
+\033[1;33m--profile\033[0m Time every phase and write a Chrome trace to localtest_trace.json. Compatiable with: everything.
+\033[1;33m--cprofile\033[0m Same as --profile, plus cProfile stats in localtest_profile.pstats. Compatiable with: everything.
+\033[1;33m--refresh-server\033[0m Ignore the cached best server and pick a new one. Compatiable with: Network RUN.
+\033[1;33m--adaptive\033[0m Stop each phase as soon as the speed has settled (see adaptive_* settings). Compatiable with: Network RUN.
+\033[1;33m--auto-threads\033[0m Ramp up parallel streams until speed stops improving instead of using threads_quick/threads_full. Compatiable with: Network RUN.
+\033[1;33m--servers\033[0m Test against the N best servers at once and add up the throughput. Compatiable with: Network RUN.
+\033[1;33m--bufferbloat\033[0m Keep pinging during download and upload to grade latency under load. Compatiable with: Network RUN.
+\033[1;33m--since\033[0m / \033[1;33m--until\033[0m Only show scans in this time range (e.g. 2024-05-01). Compatiable with: Network HISTORY.
+\033[1;33m--isp\033[0m Only show scans from ISPs matching this name. Compatiable with: Network HISTORY, Network ANALYZE.
+\033[1;33m--quick\033[0m / \033[1;33m--full\033[0m Only show quick or full scans. Compatiable with: Network HISTORY.
+\033[1;33m--window\033[0m Summarize per hour, day, week, month or all. Compatiable with: Network HISTORY.
+\033[1;33m--no-cache\033[0m Ignore cached history rollups. Compatiable with: Network HISTORY.
+\033[1;33m--rebuild\033[0m Throw away the running stats and replay the whole history. Compatiable with: Network ANALYZE.
+\033[1;33m--check\033[0m Exit with status 1 if any metric is regressed. Compatiable with: Network ANALYZE.
+\033[1;33m--target\033[0m Test against a 'localtest network serve' host (host or host:port). Compatiable with: Network RUN, Network UDP.
+\033[1;33m--streams\033[0m / \033[1;33m--duration\033[0m Parallel streams and seconds per phase for --target. Compatiable with: Network RUN.
+\033[1;33m--direction\033[0m download, upload, both (one after another, default) or bidir for --target. Compatiable with: Network RUN.
+\033[1;33m--bidir\033[0m Upload and download at the same time for --target, same as --direction bidir. Compatiable with: Network RUN.
+\033[1;33m--rate\033[0m / \033[1;33m--size\033[0m / \033[1;33m--duration\033[0m Packets per second, bytes per packet and seconds to send for. Compatiable with: Network UDP.
+\033[1;33m--port\033[0m / \033[1;33m--bind\033[0m Where the LAN server listens. Compatiable with: Network SERVE.
+\033[1;33m--hosts\033[0m Extra comma-separated hosts to probe. Compatiable with: Network MONITOR.
+\033[1;33m--resolvers\033[0m Extra comma-separated resolvers to test (ip or ip:port). Compatiable with: Network DNS.
+\033[1;33m--seconds\033[0m / \033[1;33m--memory-mb\033[0m Seconds per CPU kernel and memory buffer size. Compatiable with: Hardware CPU.
+\033[1;33m--path\033[0m / \033[1;33m--size-mb\033[0m Where to put the scratch file and how big it is. Compatiable with: Hardware DISK.
+\033[1;33m--seconds\033[0m Seconds per random IO test. Compatiable with: Hardware DISK.
+\033[1;33m--buffered\033[0m Go through the page cache instead of using O_DIRECT. Compatiable with: Hardware DISK.
+\033[1;33m--node\033[0m Only show results from nodes matching this name. Compatiable with: Hardware HISTORY.
+\033[1;33m--since\033[0m / \033[1;33m--until\033[0m Only show results in this time range. Compatiable with: Hardware HISTORY.
+\033[1;33m--from\033[0m Comma-separated hardware_history folders from other nodes to compare against. Compatiable with: Hardware HISTORY.
 """
 
 HELP_TEXT = COMMANDS_TEXT + FLAGS_TEXT
 
-def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as f:
-            return json.load(f)
-    return []
-
-def save_history(history):
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=2)
-
-def load_settings():
-    if os.path.exists(SETTINGS_FILE):
-        with open(SETTINGS_FILE, "r") as f:
-            try:
-                user_settings = json.load(f)
-            except json.JSONDecodeError:
-                cprint("[WARN] Corrupted settings file. Restoring defaults.")
-                user_settings = {}
-        
-        updated = False
-        keys_to_remove = [key for key in user_settings if key not in DEFAULT_SETTINGS]
-        for key in keys_to_remove:
-            del user_settings[key]
-            updated = True
-
-        for key, default_value in DEFAULT_SETTINGS.items():
-            if key not in user_settings:
-                user_settings[key] = default_value
-                updated = True
-
-        if updated:
-            save_settings(user_settings)
-        
-        return user_settings
-    
-    save_settings(DEFAULT_SETTINGS)
-    return DEFAULT_SETTINGS
-
-def save_settings(settings):
-    merged = {**DEFAULT_SETTINGS, **settings}
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(merged, f, indent=2)
-
 def handle_exit(signum, frame):
     cprint("\n\033[1;31m[!] Process interrupted by user. Exiting...\033[0m")
     sys.exit(0)
@@ -156,8 +139,17 @@ def show_network_header(): # holy shit styling no way :shocked:
     cprint("\033[1;34m║\033[0m      \033[1;36mᯤ  Network Tool  ᯤ\033[0m      \033[1;34m║\033[0m")
     cprint("\033[1;34m╚══════════════════════════════╝\033[0m\n")
 
+def show_hardware_header():
+    cprint("\n\033[1;34m╔══════════════════════════════╗\033[0m")
+    cprint("\033[1;34m║\033[0m     \033[1;36m⚙  Hardware Tool  ⚙\033[0m      \033[1;34m║\033[0m")
+    cprint("\033[1;34m╚══════════════════════════════╝\033[0m\n")
+
 # next gen animated dots :heavysob-random:
 def spinner(text, stop_event):
+    if machine_readable():
+        stop_event.wait() # nobody's watching a spinner in json mode
+        return
+    flush_output()
     spinner_cycle = itertools.cycle(['|', '/', '-', '\\'])
     while not stop_event.is_set():
         sys.stdout.write(f"\r{text} {next(spinner_cycle)}")
@@ -165,446 +157,388 @@ def spinner(text, stop_event):
         time.sleep(0.1)
     sys.stdout.write("\r" + " " * (len(text) + 2) + "\r")
 
-# i leaked my ip in devlogs twice... this is why i'm masking ips
-def mask_ip(ip):
-    parts = ip.split(".")
-    if len(parts) == 4:
-        return ".".join(parts[:1] + ["x" * len(parts[1]), "x" * len(parts[2]), "x" * len(parts[3])])
-    return ".".join("x" * len(part) for part in parts)
-
-# runs speed test :shocked:
-def run_speed_test(full_scan=False):
-    cprint(f"Starting {'full' if full_scan else 'quick'} network speed test...\n")
-    st = speedtest.Speedtest()
-    stop_event = threading.Event()
-    spinner_thread = threading.Thread(target=spinner, args=("Finding best server", stop_event))
-    spinner_thread.start()
+def get_flag_value(args, *names, default=None):
+    for i, arg in enumerate(args):
+        for name in names:
+            if arg == name and i + 1 < len(args):
+                return args[i + 1]
+            if arg.startswith(name + "="):
+                return arg.split("=", 1)[1]
+    return default
+
+def format_history_entry(entry):
+    return (f"[{entry['timestamp']}] "
+            f"{'FULL' if entry['full_scan'] else 'QUICK'} | "
+            f"ISP: {entry['isp']} | Ping: {entry['ping']} ms | "
+            f"↓ {entry['download_mbps']} Mbps | ↑ {entry['upload_mbps']} Mbps")
+
+def show_history(args):
+    from localtest.query import WINDOWS, METRICS, aggregate, query_entries, normalize_timestamp
+
+    since = normalize_timestamp(get_flag_value(args, "--since"))
+    until = normalize_timestamp(get_flag_value(args, "--until"), end=True)
+    isp = get_flag_value(args, "--isp")
+    scan = "full" if "--full" in args else "quick" if "--quick" in args else None
+    window = get_flag_value(args, "--window")
+
+    if window is None:
+        found = False
+        machine = machine_readable()
+        for entry in query_entries(since, until, isp, scan):
+            found = True
+            if machine:
+                emit("history", **entry)
+            else:
+                cprint(format_history_entry(entry))
+        if not found:
+            cprint("No history found. Start Localhosting by using the command 'localtest network run'!")
+        return
 
-    try:
-        st.get_best_server()
-    finally:
-        stop_event.set()
-        spinner_thread.join()
+    if window not in WINDOWS:
+        cprint(f"Unknown window: {window}. Use one of: {', '.join(WINDOWS)}")
+        return
 
-    settings = load_settings()
-    st._threads = settings.get("threads_full" if full_scan else "threads_quick", 16 if full_scan else 2)
+    rollup = aggregate(window, since, until, isp, scan, use_cache="--no-cache" not in args)
+    if not rollup:
+        cprint("No history found for that filter.")
+        return
 
-    download_result = [None]
-    stop_download = threading.Event()
-    def download_worker():
-        try:
-            download_result[0] = st.download()
-        finally:
-            stop_download.set()
-
-    download_thread = threading.Thread(target=download_worker)
-    spinner_thread = threading.Thread(target=spinner, args=("Testing ↓ download speed", stop_download))
-    download_thread.start()
-    spinner_thread.start()
-    download_thread.join()
-    spinner_thread.join()
-
-    upload_result = [None]
-    stop_upload = threading.Event()
-    def upload_worker():
-        try:
-            upload_result[0] = st.upload()
-        finally:
-            stop_upload.set()
-
-    upload_thread = threading.Thread(target=upload_worker)
-    spinner_thread = threading.Thread(target=spinner, args=("Testing ↑ upload speed", stop_upload))
-    upload_thread.start()
-    spinner_thread.start()
-    upload_thread.join()
-    spinner_thread.join()
-
-    results = st.results.dict()
-    download_mbps = results['download'] / 1_000_000
-    upload_mbps = results['upload'] / 1_000_000
-    ping = results['ping']
-    isp = results.get('client', {}).get('isp', 'Unknown ISP')
-
-    cprint("\n\033[1;32m--- Speed Test Results ---\033[0m")
-    cprint(f"\033[1;33mISP:\033[0m {isp}")
-    cprint(f"\033[1;33mPing:\033[0m {ping:.2f} ms")
-    cprint(f"\033[1;33mDownload:\033[0m {download_mbps:.2f} Mbps")
-    cprint(f"\033[1;33mUpload:\033[0m {upload_mbps:.2f} Mbps\n")
-
-    entry = {
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "full_scan": full_scan,
-        "isp": isp,
-        "ping": round(ping, 2),
-        "download_mbps": round(download_mbps, 2),
-        "upload_mbps": round(upload_mbps, 2)
-    }
-
-    history = load_history()
-    history.append(entry)
-    save_history(history)
-
-    return entry
-
-def run_ping(host="8.8.8.8", count=4): # oh no google's going to googsteale your data
-    settings = load_settings()
-    host = settings.get("ping_test_host", "8.8.8.8")
-    count = settings.get("ping_count", 4)
+    units = {"download_mbps": "Mbps", "upload_mbps": "Mbps", "ping": "ms"}
+    labels = {"download_mbps": "↓ Download", "upload_mbps": "↑ Upload", "ping": "Ping"}
+    for key, stats in rollup.items():
+        emit("rollup", window=window, key=key, stats=stats)
+        if machine_readable():
+            continue
+        cprint(f"\n\033[1;36m[{key}]\033[0m {max(stats[m]['count'] for m in METRICS)} scans")
+        for metric in METRICS:
+            m = stats[metric]
+            if not m["count"]:
+                continue
+            cprint(f"  \033[1;33m{labels[metric]}:\033[0m "
+                   f"min {m['min']:.2f} | mean {m['mean']:.2f} | max {m['max']:.2f} | "
+                   f"p50 {m['p50']:.2f} | p95 {m['p95']:.2f} | p99 {m['p99']:.2f} {units[metric]}")
+
+def show_analysis(args):
+    from localtest.analysis import update, METRICS
+
+    state, _ = update(load_settings(), rebuild="--rebuild" in args)
+    isp_filter = get_flag_value(args, "--isp")
+    by_isp = {}
+    for key, tracker in state["trackers"].items():
+        isp = key.rsplit("|", 1)[0]
+        if isp_filter and isp_filter.lower() not in isp.lower():
+            continue
+        by_isp.setdefault(isp, {})[tracker.metric] = tracker.summary()
+    if not by_isp:
+        if isp_filter and state["trackers"]:
+            cprint(f"No ISPs matching '{isp_filter}'.")
+        else:
+            cprint("Nothing to analyze yet. Run 'localtest network run' a few times first!")
+        return
 
-    os_name = platform.system().lower()
-    if os_name == "windows":
-        cmd = ["ping", "-n", str(count), host]
+    units = {"download_mbps": "Mbps", "upload_mbps": "Mbps", "ping": "ms"}
+    labels = {"download_mbps": "↓ Download", "upload_mbps": "↑ Upload", "ping": "Ping"}
+    regressed = False
+    for isp, metrics in sorted(by_isp.items()):
+        runs = max(m["runs"] for m in metrics.values())
+        cprint(f"\n\033[1;36m[{isp}]\033[0m {runs} scans")
+        for metric in METRICS:
+            m = metrics.get(metric)
+            if not m:
+                continue
+            emit("analysis", isp=isp, metric=metric, **m)
+            if m["regression"]:
+                regressed = True
+                r = m["regression"]
+                status = f"\033[1;31mREGRESSED {r['drop_percent']}% since {r['since']}\033[0m"
+            else:
+                status = "\033[1;32mok\033[0m"
+            cprint(f"  \033[1;33m{labels[metric]}:\033[0m now {m['now']:.2f} | usual {m['baseline']:.2f} | "
+                   f"last {m['window']}: p10 {m['p10']:.2f} p50 {m['p50']:.2f} p90 {m['p90']:.2f} {units[metric]} | {status}")
+            for point in m["change_points"][-3:]:
+                cprint(f"    \033[90mshifted at {point['timestamp']}: {point['baseline']} -> {point['level']} {units[metric]}\033[0m")
+    cprint("")
+    if regressed and "--check" in args:
+        sys.exit(1) # lets cron / monitoring treat a regression as a failure
+
+# each command imports its subsystem only when it runs, so "help" doesn't pay for speedtest & co
+def cmd_help(args):
+    if len(args) == 1:
+        show_help()
+    elif args[1] == "commands":
+        show_commands()
+    elif args[1] == "flags":
+        show_flags()
     else:
-        cmd = ["ping", "-c", str(count), host]
-    try:
-        p = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        out = p.stdout
-        packet_loss = None
-        avg = None
-
-        m_loss = re.search(r"Lost = \d+ $begin:math:text$(\\d+)% loss$end:math:text$", out)
-        if m_loss:
-            packet_loss = float(m_loss.group(1))
-        else:
-            m_loss_unix = re.search(r"(\d+)% packet loss", out)
-            if m_loss_unix:
-                packet_loss = float(m_loss_unix.group(1))
+        cprint(f"Unknown help subcommand: {args[1]}")
 
-        m_avg_win = re.search(r"Average = (\d+)ms", out)
-        if m_avg_win:
-            avg = float(m_avg_win.group(1))
-        else:
-            m_avg_unix = re.search(r"rtt .* = [\d\.]+/([\d\.]+)/", out)
-            if m_avg_unix:
-                avg = float(m_avg_unix.group(1))
-        
-        return {"raw": out, "packet_loss_percent": packet_loss, "avg_ms": avg}
-    except Exception as e:
-        return {"error": str(e)}
+def cmd_update(args):
+    from localtest.updater import update
+    update(force_refresh="--refresh" in args)
+
+def maybe_check_for_updates(args):
+    # off unless update_check is set, and then it only reads a small cache file; the network part is detached
+    settings = load_settings()
+    if not settings.get("update_check", False) or (args and args[0] == "update") or machine_readable():
+        return
+    from localtest.updater import background_check
+    background_check(settings)
 
-def get_dns_servers():
-    os_name = platform.system().lower()
-    servers = []
+def valid_target(target):
+    from localtest.lan import parse_target
     try:
-        if os_name == "windows":
-            p = subprocess.run(["ipconfig", "/all"], capture_output=True, text=True)
-            matches = re.findall(r"DNS Servers[.\s:]*([\d\.\s\r\n:]+)", p.stdout)
-            if matches:
-                raw = matches[0].strip().splitlines() # please do not screenshot that out of context i beg
-                for line in raw:
-                    ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
-                    if ip_match:
-                        servers.append(ip_match.group(1))
-            else:
-                lines = p.stdout.splitlines()
-                for i, line in enumerate(lines):
-                    if "DNS Servers" in line:
-                        j = i + 1
-                        while j < len(lines) and lines[j].strip():
-                            ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", lines[j])
-                            if ip_match:
-                                servers.append(ip_match.group(1))
-                            j += 1
-        else:
-            if os.path.exists("/etc/resolv.conf"):
-                with open("/etc/resolv.conf", "r") as f:
-                    for ln in f:
-                        if ln.strip().startswith("nameserver"):
-                            parts = ln.split()
-                            if len(parts) >= 2:
-                                servers.append(parts[1].strip())
-            if not servers:
-                p = subprocess.run(["resolvectl", "status"], capture_output=True, text=True)
-                if p.returncode == 0:
-                    servers += re.findall(r"Current DNS Server: (\d+\.\d+\.\d+\.\d+)", p.stdout)
-    except Exception:
-        pass
-    return servers
-
-def build_suggestions(metrics):
-    suggestions = []
-    download = metrics.get("download_mbps")
-    upload = metrics.get("upload_mbps")
-    ping = metrics.get("ping")
-    packet_loss = metrics.get("packet_loss_percent")
-
-    suggestions.append("1) Used a wired (Ethernet) connection where possible. It's the best way to reduce latency.")
-    suggestions.append("2) Reboot your modem or router if possible. Most issues are resolved by a quick reboot of network gear.")
-    suggestions.append("3) Ensure other devices or apps aren't eating your connection (cloud backups, torrents, streaming).")
-
-    if download is not None:
-        if download < 5:
-            suggestions.append("Download speed is very low - check if you're on the correct ISP plan or contact your ISP. Also check for heavy background uploads.")
-        elif download < 50:
-            suggestions.append("Download speed is moderate - if you expected higher, try moving closer to the router, switching Wi-Fi bands (5GHz), or using Ethernet.")
+        parse_target(target)
+    except ValueError:
+        cprint("Invalid value for --target. Must be host or host:port (port 1-65535), e.g. 192.168.1.20:5201.")
+        return False
+    return True
+
+def cmd_network_run(args):
+    from localtest.network import run_speed_test, run_lan_test
+    full_scan = "-fs" in args or "--fullscan" in args
+    target = get_flag_value(args, "--target")
+    if target:
+        if not valid_target(target):
+            return
+        try:
+            streams = max(1, int(get_flag_value(args, "--streams", default=4)))
+            duration = max(1, int(get_flag_value(args, "--duration", default=10)))
+        except ValueError:
+            cprint("Invalid value for --streams or --duration. Must be an integer.")
+            return
+        from localtest.lan import DIRECTIONS
+        direction = "bidir" if "--bidir" in args else get_flag_value(args, "--direction", default="both")
+        if direction not in DIRECTIONS:
+            cprint(f"Invalid value for --direction. Must be one of: {', '.join(DIRECTIONS)}.")
+            return
+        run_lan_test(target, streams=streams, duration=duration, direction=direction)
+        return
+    try:
+        server_count = max(1, int(get_flag_value(args, "--servers", default=1)))
+    except ValueError:
+        cprint("Invalid value for --servers. Must be an integer.")
+        return
+    run_speed_test(full_scan=full_scan, refresh_server="--refresh-server" in args, server_count=server_count,
+                   adaptive="--adaptive" in args, auto_threads="--auto-threads" in args, bufferbloat="--bufferbloat" in args)
+
+def cmd_network_history(args):
+    if len(args) >= 3 and args[2] == "compact":
+        from localtest.history import compact_history
+        stats = compact_history()
+        if stats["entries"] is None:
+            cprint("Nothing to compact yet.")
         else:
-            suggestions.append("Download speed looks good.")
+            cprint(f"[OK] Compacted {stats['entries']} entries: {stats['segments_before']} segments -> {stats['segments_after']}.")
+        return
+    show_history(args)
 
-    if ping is not None:
-        if ping > 150:
-            suggestions.append("High ping detected - try switching to a closer server, use wired connection, or check for VPNs and background processes causing latency.")
-        elif ping > 60:
-            suggestions.append("Moderate latency - wired connection and moving your router to an open area may help.")
-        else:
-            suggestions.append("Latency is good.")
+def cmd_network_analyze(args):
+    show_analysis(args)
 
-    if packet_loss is not None:
-        if packet_loss > 1:
-            suggestions.append(f"Packet loss detected ({packet_loss}%) - this often indicates Wi-Fi interference, bad cabling, or upstream ISP issues.")
-        else:
-            suggestions.append("No significant packet loss detected.")
-
-    dns = metrics.get("dns_servers", [])
-    if dns:
-        masked_dns = [mask_ip(d) for d in dns]
-        suggestions.append(f"Your DNS servers: {', '.join(masked_dns)} - consider using reliable DNS providers like 1.1.1.1 (Cloudflare), 8.8.8.8 (Google) if you have DNS resolution issues.")
-    
-    suggestions.append("Advanced: Make sure you update router firmware, ensure drivers for your network network adapter are up-to-date, consider changing QoS settings on your router, or try changing your router channel to reduce Wi-Fi interference.")
-    suggestions.append("If multiple tests show consistent low throughput, contact your ISP and provide the speed test timestamps and results.")
-
-    return suggestions
-
-def build_fix_commands():
-    os_name = platform.system().lower()
-    commands = []
-    if os_name == "windows":
-        commands = [
-            ("Flush DNS cache (Windows)", "ipconfig /flushdns"),
-            ("Release DHCP (Windows)", "ipconfig /release"),
-            ("Renew DHCP (Windows)", "ipconfig /renew"),
-        ] # afaik these are safe to run? ima get sued :skulk:
-    elif os_name == "darwin":
-        # stinky macOS
-        commands = [
-            ("Flush DNS (macOS)", "sudo dscacheutil -flushcache; sudo killall -HUP mDNSResponder"),
-            ("Restart network service (macOS)", "sudo ifconfig en0 down; sleep 1; sudo ifconfig en0 up"),
-        ]
-    else:
-        # assume Linux-ish os
-        commands = [
-            ("Flush DNS (systemd-resolved)", "sudo systemd-resolve --flush-caches"),
-            ("Restart NetworkManager (Linux)", "sudo systemctl restart NetworkManager"),
-            ("Restart network interface (Linux) - may vary", "sudo ip link set $(ip route get 8.8.8.8 | awk '{cprint $5; exit}') down; sleep 1; sudo ip link set $(ip route get 8.8.8.8 | awk 'cprintt $5; exit}') up"),
-        ]
-    return commands
-
-def improve_network(apply=False):
-    cprint("\n\033[1;34m--- Running network improve diagnostic ---\033[0m\n")
-    baseline = run_speed_test(full_scan=False)
-    if not baseline:
-        cprint("Couldn't get baseline speed test; aborting improve routine.")
-        return
-    
-    ping_results = run_ping()
-    dns_servers = get_dns_servers()
-    masked_dns = [mask_ip(d) for d in dns_servers]
-
-    metrics = {
-        "download_mbps": baseline.get("download_mbps"),
-        "upload_mbps": baseline.get("upload_mbps"),
-        "ping": baseline.get("ping"),
-        "isp": baseline.get("isp"),
-        "packet_loss_percent": None,
-        "dns_servers": masked_dns
-    }
-    if ping_results and "avg_ms" in ping_results:
-        metrics["packet_loss_percent"] = ping_results.get("packet_loss_percent")
-        metrics["ping"] = ping_results.get("avg_ms") or metrics["ping"]
-
-    cprint("\033[1;32m--- Diagnostics ---\033[0m")
-    cprint(f"ISP: {metrics.get('isp')}")
-    cprint(f"Download: {metrics.get('download_mbps'):.2f} Mbps")
-    cprint(f"Upload: {metrics.get('upload_mbps'):.2f} Mbps")
-    if metrics.get("ping") is not None:
-        cprint(f"Ping (avg): {metrics.get('ping'):.2f} ms")
-    if metrics.get("packet_loss_percent") is not None:
-        cprint(f"Packet loss: {metrics.get('packet_loss_percent')}%")
-    if dns_servers:
-        cprint(f"DNS servers: {', '.join(masked_dns)}")
-    else:
-        cprint("DNS servers: Could not detect")
-    
-    cprint("\n\033[1;32m--- Suggestions to improve speeds ---\033[0m")
-    suggestions = build_suggestions(metrics)
-    for s in suggestions:
-        cprint(f"- {s}")
-
-    if apply:
-        cprint("\n\033[1;33mApply mode requested. The script will attempt common fixes (may require admin/sudo).\033[0m")
-        fixes = build_fix_commands()
-        cprint("Planned actions:")
-        for i, (desc, cmd) in enumerate(fixes, start=1):
-            cprint(f"  {i}. {desc} -> {cmd}")
-
-        confirm = input("\nProceed to run the above commands? This may temporarily disconnect your network. [y/N]: ").strip().lower()
-        if confirm != "y":
-            cprint("Aborting apply actions.")
+def cmd_network_settings(args):
+    settings = load_settings()
+    if len(args) == 2:
+        cprint("Current settings:")
+        for k, v in settings.items():
+            cprint(f"  {k}: {v}")
+        cprint("\nUsage: localtest network settings set key=value")
+    elif len(args) >= 4 and args[2] == "set":
+        kv = " ".join(args[3:]).strip()
+        if "=" not in kv:
+            cprint("Usage: localtest network settings set key=value")
+            return
+        key, value = kv.split("=", 1)
+        settings = load_settings()
+        if key not in settings:
+            cprint(f"Unknown setting: {key}")
             return
         
-        for desc, cmd in fixes:
-            cprint(f"\n\033[1;34mRunning:\033[0m {desc}\n-> {cmd}")
+        default_type = type(DEFAULT_SETTINGS[key])
+        if default_type is bool:
+            settings[key] = value.lower() in ("1", "true", "yes", "on")
+        elif default_type is int:
             try:
-                p = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=120)
-                if p.returncode == 0:
-                    cprint(f"[OK] {desc} completed.")
-                    if p.stdout:
-                        cprint(p.stdout.strip())
-                else:
-                    cprint(f"[WARN] {desc} returned non-zero exit code {p.returncode}.")
-                    if p.stdout:
-                        cprint("STDOUT:", p.stdout.strip())
-                    if p.stderr:
-                        cprint("STDERR:", p.stderr.strip())
-            except Exception as e:
-                cprint(f"[ERROR] Failed to run {desc}: {e}")
-
-        cprint("\n\033[1;32mApply actions completed. Re-running a quick speed test to show updated results...\033[0m")
-        time.sleep(2)
-        run_speed_test(full_scan=False)
+                settings[key] = int(value)
+            except ValueError:
+                cprint(f"Invalid value for {key}. Must be an integer.")
+                return
+        else:
+            settings[key] = value
+
+        save_settings(settings)
+        cprint(f"Setting '{key}' updated to {settings[key]}.")
     else:
-        cprint("\nTo automatically try common fixes, re-run with the flag \033[1;33m-a\033[0m or \033[1;33m--apply\033[0m (you will be asked to confirm before any changes).")
+        cprint("Usage:\n  localtest network settings\n  localtest network settings set threads_quick=4")
 
-def check_latest_version(package="localtest"):
+def cmd_network_serve(args):
+    from localtest.lan import DEFAULT_PORT
+    from localtest.network import run_lan_server
     try:
-        url = f"https://pypi.org/pypi/{package}/json"
-        with urllib.request.urlopen(url, timeout=10) as resp:
-            data = json.load(resp)
-        releases = list(data["releases"].keys())
-        # sort da versions :shocked: including PRERELEASES??!?!?!?!
-        from packaging.version import parse
-        latest_version = max(releases, key=parse)
-        return latest_version
-    except Exception as e:
-        cprint(f"[WARN] Could not fetch latest version from PyPI: {e}")
-        return None
-
-def get_installed_version(package="localtest"):
-    try:
-        return importlib.metadata.version(package)
-    except importlib.metadata.PackageNotFoundError:
-        return None
+        port = int(get_flag_value(args, "--port", default=DEFAULT_PORT))
+    except ValueError:
+        cprint("Invalid value for --port. Must be an integer.")
+        return
+    run_lan_server(get_flag_value(args, "--bind", default="0.0.0.0"), port)
 
-def update():
-    cprint("--- Checking for updates ---\n")
-    installed = get_installed_version("localtest")
-    latest = check_latest_version("localtest")
+def cmd_network_udp(args):
+    from localtest.network import run_udp_test
+    try:
+        rate = get_flag_value(args, "--rate")
+        rate = max(1, int(rate)) if rate else None
+        size = get_flag_value(args, "--size")
+        size = int(size) if size else None
+        duration = get_flag_value(args, "--duration")
+        duration = max(0.1, float(duration)) if duration else None
+    except ValueError:
+        cprint("Invalid value for --rate, --size or --duration.")
+        return
+    target = get_flag_value(args, "--target")
+    if target and not valid_target(target):
+        return
+    run_udp_test(target, rate=rate, size=size, duration=duration)
+
+def cmd_network_monitor(args):
+    from localtest.network import run_monitor
+    run_monitor(args)
+
+def cmd_network_dns(args):
+    from localtest.network import run_dns_benchmark
+    run_dns_benchmark(args)
+
+def cmd_network_improve(args):
+    from localtest.network import improve_network
+    apply_flag = ("-a" in args) or ("--apply" in args)
+    improve_network(apply=apply_flag)
+
+NETWORK_COMMANDS = {
+    "run": cmd_network_run,
+    "history": cmd_network_history,
+    "settings": cmd_network_settings,
+    "improve": cmd_network_improve,
+    "dns": cmd_network_dns,
+    "serve": cmd_network_serve,
+    "monitor": cmd_network_monitor,
+    "udp": cmd_network_udp,
+    "analyze": cmd_network_analyze,
+}
 
-    if not installed:
-        cprint("[ERROR] Localtest is not installed.")
+def cmd_network(args):
+    if len(args) == 1:
+        show_network_header()
+        cprint("\033[1;33mlocaltest network\033[0m")
+        cprint("    \033[90mrun\033[0m Runs the network scan. -fs is compatiable.")
+        cprint("    \033[90mhistory\033[0m Shows the history of all your scans, locally.")
+        cprint("        \033[90mcompact\033[0m Folds old history segments together.")
+        cprint("    \033[90msettings\033[0m View or change settings for the Network tool.")
+        cprint("    \033[90mimprove\033[0m Running this command will improve your network speeds. -a is compatiable.")
+        cprint("    \033[90mdns\033[0m Benchmarks your DNS resolvers against popular ones.")
+        cprint("    \033[90mserve\033[0m Runs a LAN server for 'network run --target' and 'network udp --target'.")
+        cprint("    \033[90mmonitor\033[0m Keeps probing latency and runs speed tests on a schedule.")
+        cprint("    \033[90mudp\033[0m Streams UDP packets to measure jitter, loss and reordering.")
+        cprint("    \033[90manalyze\033[0m Tracks each metric per ISP and flags when one gets worse than usual.")
         return
+    handler = NETWORK_COMMANDS.get(args[1])
+    if handler is None:
+        cprint(f"Unknown network subcommand: {args[1]}")
+        return
+    handler(args)
 
-    cprint(f"Installed version: {installed}")
-    if latest:
-        cprint(f"Latest version on PyPI: {latest}")
-    else:
-        cprint("Could not determine the latest version.")
-        latest = installed
+def cmd_hardware_cpu(args):
+    from localtest.hardware import run_cpu_benchmark
+    run_cpu_benchmark(args)
 
-    if parse_version(installed) > parse_version(latest):
-        cprint(f"\n[OK] You have a more advanced version than the latest public version ({latest}). No update needed.")
-        return
+def cmd_hardware_disk(args):
+    from localtest.hardware import run_disk_benchmark
+    run_disk_benchmark(args)
 
-    if parse_version(installed) == parse_version(latest):
-        cprint(f"\n[OK] You already have the latest version ({installed}). No update needed.")
+def cmd_hardware_history(args):
+    from localtest.hardware import show_hardware_history
+    show_hardware_history(args)
+
+HARDWARE_COMMANDS = {
+    "cpu": cmd_hardware_cpu,
+    "disk": cmd_hardware_disk,
+    "history": cmd_hardware_history,
+}
+
+def cmd_hardware(args):
+    if len(args) == 1:
+        show_hardware_header()
+        cprint("\033[1;33mlocaltest hardware\033[0m")
+        cprint("    \033[90mcpu\033[0m Benchmarks single-core, all-core and memory performance.")
+        cprint("    \033[90mdisk\033[0m Benchmarks sequential throughput and random 4K IOPS of a disk.")
+        cprint("    \033[90mhistory\033[0m Shows your hardware results, and compares nodes with --from.")
         return
+    handler = HARDWARE_COMMANDS.get(args[1])
+    if handler is None:
+        cprint(f"Unknown hardware subcommand: {args[1]}")
+        return
+    handler(args)
 
-    cprint("\n--- Updating Localtest ---\n")
-    try:
-        cmd = [sys.executable, "-m", "pip", "install", "--upgrade", "localtest"]
-        subprocess.run(cmd, check=True)
-        cprint("\n[OK] Localtest updated successfully!")
-    except subprocess.CalledProcessError as e:
-        cprint(f"[ERROR] Update failed: {e}")
+COMMANDS = {
+    "help": cmd_help,
+    "update": cmd_update,
+    "network": cmd_network,
+    "hardware": cmd_hardware,
+}
 
 def main():
     args = sys.argv[1:]
 
+    mode = get_flag_value(args, "--output")
+    if mode is not None:
+        if mode not in OUTPUT_MODES:
+            cprint(f"Unknown output mode: {mode}. Use one of: {', '.join(OUTPUT_MODES)}")
+            return
+        set_mode(mode)
+        if "--output" in args:
+            i = args.index("--output")
+            args = args[:i] + args[i + 2:]
+        else:
+            args = [a for a in args if not a.startswith("--output=")]
+
+    use_cprofile = "--cprofile" in args
+    profile = use_cprofile or "--profile" in args
+    profiler = None
+    if profile:
+        # only imported when asked for, a normal run pays nothing for this
+        from localtest.spans import span, start_profiling
+        args = [a for a in args if a not in ("--profile", "--cprofile")]
+        start_profiling()
+        if use_cprofile:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+    try:
+        if profile:
+            with span("localtest", command=" ".join(args[:2])):
+                dispatch(args)
+        else:
+            dispatch(args)
+        maybe_check_for_updates(args)
+    finally:
+        if profile:
+            finish_profiling(profiler)
+        close_output()
+
+def finish_profiling(profiler):
+    from localtest.spans import stop_profiling, TRACE_FILE, CPROFILE_FILE
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(CPROFILE_FILE)
+    count = stop_profiling(TRACE_FILE)
+    cprint(f"\033[90mProfile: {count} spans written to {TRACE_FILE} (open it in ui.perfetto.dev or chrome://tracing)"
+           + (f", cProfile stats in {CPROFILE_FILE}" if profiler is not None else "") + "\033[0m")
+
+def dispatch(args):
     if not args:
         show_banner()
         cprint("use \033[1;33mlocaltest help\033[0m to get started!")
         return
-    elif args[0] == "help":
-        if len(args) == 1:
-            show_help()
-            return
-        elif args[1] == "commands":
-            show_commands()
-            return
-        elif args[1] == "flags":
-            show_flags()
-            return
-        else:
-            cprint(f"Unknown help subcommand: {args[1]}")
-            return
-    elif args[0] == "update":
-        update()
+
+    handler = COMMANDS.get(args[0])
+    if handler is None:
+        cprint(f"Unknown command: {args[0]}")
         return
-    elif args[0] == "network":
-        if len(args) == 1:
-            show_network_header()
-            cprint("\033[1;33mlocaltest network\033[0m")
-            cprint("    \033[90mrun\033[0m Runs the network scan. -fs is compatiable.")
-            cprint("    \033[90mhistory\033[0m Shows the history of all your scans, locally.")
-            cprint("    \033[90msettings\033[0m View or change settings for the Network tool.")
-            cprint("    \033[90mimprove\033[0m Running this command will improve your network speeds. -a is compatiable.")
-            return
-        elif args[1] == "run":
-            full_scan = "-fs" in args or "--fullscan" in args
-            run_speed_test(full_scan=full_scan)
-            return
-        elif args[1] == "history":
-            history = load_history()
-            if not history:
-                cprint("No history found. Start Localhosting by using the command 'localtest network run'!")
-            else:
-                for entry in history:
-                    cprint(f"[{entry['timestamp']}] "
-                          f"{'FULL' if entry['full_scan'] else 'QUICK'} | "
-                          f"ISP: {entry['isp']} | Ping: {entry['ping']} ms | "
-                          f"↓ {entry['download_mbps']} Mbps | ↑ {entry['upload_mbps']} Mbps")
-                return
-            return
-        elif args[1] == "settings":
-            settings = load_settings()
-            if len(args) == 2:
-                cprint("Current settings:")
-                for k, v in settings.items():
-                    cprint(f"  {k}: {v}")
-                cprint("\nUsage: localtest network settings set key=value")
-            elif len(args) >= 4 and args[2] == "set":
-                kv = " ".join(args[3:]).strip()
-                if "=" not in kv:
-                    cprint("Usage: localtest network settings set key=value")
-                    return
-                key, value = kv.split("=", 1)
-                settings = load_settings()
-                if key not in settings:
-                    cprint(f"Unknown setting: {key}")
-                    return
-                
-                default_type = type(DEFAULT_SETTINGS[key])
-                if default_type is bool:
-                    settings[key] = value.lower() in ("1", "true", "yes", "on")
-                elif default_type is int:
-                    try:
-                        settings[key] = int(value)
-                    except ValueError:
-                        cprint(f"Invalid value for {key}. Must be an integer.")
-                        return
-                else:
-                    settings[key] = value
-
-                save_settings(settings)
-                cprint(f"Setting '{key}' updated to {settings[key]}.")
-            else:
-                cprint("Usage:\n  localtest network settings\n  localtest network settings set threads_quick=4")
-            return
-        elif args[1] == "improve":
-            apply_flag = ("-a" in args) or ("--apply" in args)
-            improve_network(apply=apply_flag)
-            return
-        else:
-            cprint(f"Unknown network subcommand: {args[1]}")
-            return
-    
-    cprint(f"Unknown command: {args[0]}")
\ No newline at end of file
+    handler(args)
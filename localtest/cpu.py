@@ -0,0 +1,170 @@
+import os
+import re
+import sys
+import time
+import zlib
+import random
+import hashlib
+import platform
+import subprocess
+from array import array
+
+# everything a worker process runs lives at module level so it pickles under spawn (windows/macOS) too
+BLOCK_SIZE = 1024 * 1024
+_blocks = {}
+
+def _block(kind):
+    # one reusable 1 MiB input per process, built once so allocation never lands inside a timed loop
+    if kind not in _blocks:
+        rng = random.Random(42)
+        if kind == "text":
+            words = [bytes(rng.choice(b"abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))) for _ in range(500)]
+            data = b" ".join(rng.choice(words) for _ in range(BLOCK_SIZE // 4))[:BLOCK_SIZE]
+        else:
+            data = rng.randbytes(BLOCK_SIZE) if hasattr(rng, "randbytes") else os.urandom(BLOCK_SIZE)
+        _blocks[kind] = data
+    return _blocks[kind]
+
+def _int_chunk():
+    x = 1
+    for _ in range(100_000):
+        x = (x * 1103515245 + 12345) & 0x7FFFFFFF
+    return 0.1 # million iterations
+
+def _float_chunk():
+    x = 1.0
+    for _ in range(100_000):
+        x = x * 1.000001 + 0.5
+        x = x ** 0.5
+    return 0.1
+
+def _hash_chunk():
+    hashlib.sha256(_block("random")).digest()
+    return 1.0 # MiB
+
+def _zlib_chunk():
+    zlib.compress(_block("text"), 6)
+    return 1.0
+
+KERNELS = {
+    "int": (_int_chunk, "Mops/s"),
+    "float": (_float_chunk, "Mops/s"),
+    "sha256": (_hash_chunk, "MiB/s"),
+    "zlib": (_zlib_chunk, "MiB/s"),
+}
+
+def run_kernel(name, seconds):
+    # runs for at least `seconds` and returns units of work per second, timed inside the worker
+    # so pool startup and pickling never count
+    chunk = KERNELS[name][0]
+    chunk() # warm up (and build the input block)
+    units = 0.0
+    start = time.perf_counter()
+    while True:
+        units += chunk()
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return units / elapsed
+
+def _ready(_):
+    return os.getpid()
+
+def usable_cpus():
+    try:
+        return len(os.sched_getaffinity(0)) # respects cgroup/taskset limits, cpu_count doesn't
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def make_pool(workers):
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(max_workers=workers)
+    list(pool.map(_ready, range(workers * 2))) # spin the workers up before anything is timed
+    return pool
+
+def measure_kernel(pool, name, seconds, workers):
+    single = pool.submit(run_kernel, name, seconds).result()
+    futures = [pool.submit(run_kernel, name, seconds) for _ in range(workers)]
+    total = sum(f.result() for f in futures)
+    return {
+        "unit": KERNELS[name][1],
+        "single": round(single, 2),
+        "all": round(total, 2),
+        "workers": workers,
+        "scaling_percent": round(100 * total / (single * workers), 1) if single else None,
+    }
+
+def _filled_buffer(size):
+    # bytearray() hands back untouched zero pages, reading those is suspiciously fast.
+    # doubling copies write every page once without a second big allocation
+    buf = bytearray(size)
+    view = memoryview(buf)
+    view[:255] = bytes(range(255)) # no 0xff anywhere, memory_bandwidth relies on that
+    filled = 255
+    while filled < size:
+        n = min(filled, size - filled)
+        view[filled:filled + n] = view[:n]
+        filled += n
+    return buf
+
+def memory_bandwidth(size_mb=256, rounds=5):
+    size = size_mb * 1024 * 1024
+    src = _filled_buffer(size)
+    dst = _filled_buffer(size)
+    src_view, dst_view = memoryview(src), memoryview(dst)
+    copy_best = read_best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        dst_view[:] = src_view # one big memcpy
+        copy_best = min(copy_best, time.perf_counter() - start)
+        start = time.perf_counter()
+        src.find(b"\xff") # never there, so memchr walks the whole buffer
+        read_best = min(read_best, time.perf_counter() - start)
+    return {
+        "buffer_mb": size_mb,
+        # copy counts the read and the write, same as STREAM does
+        "copy_gbps": round(2 * size / copy_best / 1e9, 2),
+        "read_gbps": round(size / read_best / 1e9, 2),
+    }
+
+def _chase(chain, steps):
+    i = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        i = chain[i]
+    return time.perf_counter() - start
+
+def _random_cycle(nodes, stride):
+    # one random cycle through every node, each node on its own cache line
+    order = list(range(1, nodes))
+    random.Random(7).shuffle(order)
+    order = [0] + order
+    chain = array("I", [0]) * (nodes * stride)
+    for a, b in zip(order, order[1:] + order[:1]):
+        chain[a * stride] = b * stride
+    return chain
+
+def memory_latency(size_mb=256, steps=1_000_000):
+    # pointer chasing through a buffer far bigger than cache vs. one that fits in L1.
+    # the interpreter costs the same in both, so the difference is (roughly) the trip to dram
+    stride = 16 # 16 * 4 bytes = one 64 byte line per node
+    big = _random_cycle(max(2, size_mb * 1024 * 1024 // 64), stride)
+    small = _random_cycle(64, stride)
+    _chase(big, steps // 10)
+    small_time = min(_chase(small, steps) for _ in range(3))
+    big_time = min(_chase(big, steps) for _ in range(3))
+    return round(max(0.0, big_time - small_time) / steps * 1e9, 1)
+
+def cpu_model():
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/cpuinfo", "r") as f:
+                match = re.search(r"^model name\s*:\s*(.+)$", f.read(), re.M)
+            if match:
+                return match.group(1).strip()
+        elif sys.platform == "darwin":
+            p = subprocess.run(["sysctl", "-n", "machdep.cpu.brand_string"], capture_output=True, text=True)
+            if p.stdout.strip():
+                return p.stdout.strip()
+    except Exception:
+        pass
+    return platform.processor() or platform.machine() or "Unknown CPU"
@@ -0,0 +1,194 @@
+import io
+import os
+import sys
+import time
+import mmap
+import random
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK_SIZE = 1024 * 1024
+PAGE_SIZE = 4096
+QUEUE_DEPTHS = (1, 4, 16, 32)
+
+def scratch_path(directory):
+    return os.path.join(directory, f".localtest-disk-{os.getpid()}.tmp")
+
+def aligned_buffer(size):
+    # anonymous mmaps are page aligned, which is what O_DIRECT wants. made once and reused for every op
+    return mmap.mmap(-1, size)
+
+def fill_buffer(buf):
+    # random so compressing/deduping filesystems can't cheat, minus 0xff so mmap_read can scan for it
+    buf[:] = os.urandom(len(buf)).replace(b"\xff", b"\xfe")
+
+def open_file(path, direct=True, sync=False):
+    # returns (fd, direct) - falls back to buffered io where O_DIRECT isn't a thing (macOS, windows, tmpfs)
+    flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+    if sync:
+        flags |= getattr(os, "O_DSYNC", 0)
+    if direct and hasattr(os, "O_DIRECT"):
+        try:
+            return os.open(path, flags | os.O_DIRECT, 0o600), True
+        except OSError:
+            pass
+    fd = os.open(path, flags, 0o600)
+    if direct and sys.platform == "darwin":
+        try:
+            import fcntl
+            fcntl.fcntl(fd, fcntl.F_NOCACHE, 1)
+            return fd, True
+        except (ImportError, AttributeError, OSError):
+            pass
+    return fd, False
+
+def _reader(fd):
+    if hasattr(os, "preadv"):
+        return lambda buf, offset: os.preadv(fd, [buf], offset)
+    f = io.FileIO(fd, "r", closefd=False)
+    def read(buf, offset):
+        f.seek(offset)
+        return f.readinto(buf)
+    return read
+
+def _writer(fd):
+    if hasattr(os, "pwritev"):
+        return lambda buf, offset: os.pwritev(fd, [buf], offset)
+    f = io.FileIO(fd, "r+", closefd=False)
+    def write(buf, offset):
+        f.seek(offset)
+        return f.write(buf)
+    return write
+
+def drop_cache(path):
+    # asks the kernel to forget the file's clean pages so reads hit the disk. returns False if it can't
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+def percentiles(latencies):
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 1)
+    return {
+        "mean_us": round(sum(ordered) / len(ordered), 1),
+        "p50_us": pick(0.50),
+        "p95_us": pick(0.95),
+        "p99_us": pick(0.99),
+        "p999_us": pick(0.999),
+        "max_us": round(ordered[-1], 1),
+    }
+
+def _sequential(path, size, direct, write):
+    fd, direct = open_file(path, direct)
+    buf = aligned_buffer(BLOCK_SIZE)
+    view = memoryview(buf)
+    if write:
+        fill_buffer(buf)
+    op = _writer(fd) if write else _reader(fd)
+    latencies = array("f")
+    clock = time.perf_counter
+    try:
+        start = clock()
+        for offset in range(0, size, BLOCK_SIZE):
+            t = clock()
+            op(view, offset)
+            latencies.append((clock() - t) * 1_000_000)
+        if write:
+            os.fsync(fd) # the data isn't written until it's on the disk
+        elapsed = clock() - start
+    finally:
+        view.release()
+        buf.close()
+        os.close(fd)
+    result = {"mbps": round(size / elapsed / 1_000_000, 1), "direct": direct}
+    result.update(percentiles(latencies))
+    return result
+
+def sequential_write(path, size, direct=True):
+    return _sequential(path, size, direct, write=True)
+
+def sequential_read(path, size, direct=True):
+    drop_cache(path)
+    return _sequential(path, size, direct, write=False)
+
+def mmap_read(path):
+    cold = drop_cache(path)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        start = time.perf_counter()
+        mm.find(b"\xff") # never in the file, so every page gets faulted in and scanned
+        elapsed = time.perf_counter() - start
+        size = len(mm)
+    finally:
+        mm.close()
+    return {"mbps": round(size / elapsed / 1_000_000, 1), "cold_cache": cold}
+
+def random_io(path, size, depth, seconds, write=False, direct=True):
+    # `depth` threads each keep one 4K op in flight, so the device sees that queue depth.
+    # preadv/pwritev drop the GIL, so the threads really do overlap
+    blocks = max(1, size // PAGE_SIZE)
+    stop = threading.Event()
+    ready = threading.Barrier(depth + 1)
+    if not write:
+        drop_cache(path)
+
+    # every fd and buffer is set up before the clock starts, the workers only do io
+    slots = []
+    try:
+        for i in range(depth):
+            fd, used_direct = open_file(path, direct, sync=write)
+            buf = aligned_buffer(PAGE_SIZE)
+            if write:
+                fill_buffer(buf)
+            slots.append((fd, buf, memoryview(buf), array("f")))
+
+        def worker(i):
+            fd, _, view, samples = slots[i]
+            op = _writer(fd) if write else _reader(fd)
+            rng = random.Random(i)
+            clock = time.perf_counter
+            ready.wait()
+            while not stop.is_set():
+                offset = rng.randrange(blocks) * PAGE_SIZE
+                t = clock()
+                op(view, offset)
+                samples.append((clock() - t) * 1_000_000)
+
+        with ThreadPoolExecutor(max_workers=depth) as pool:
+            futures = [pool.submit(worker, i) for i in range(depth)]
+            try:
+                ready.wait()
+                start = time.perf_counter()
+                time.sleep(seconds)
+            finally:
+                # ctrl+c lands in the sleep as SystemExit, the workers still have to be told to stop
+                # or leaving the with block joins them forever
+                stop.set()
+                ready.abort()
+            for f in futures:
+                f.result()
+            elapsed = time.perf_counter() - start
+    finally:
+        for fd, buf, view, _ in slots:
+            view.release()
+            buf.close()
+            os.close(fd)
+
+    merged = array("f")
+    for slot in slots:
+        merged.extend(slot[3])
+    result = {"iops": round(len(merged) / elapsed), "direct": used_direct}
+    result.update(percentiles(merged))
+    return result
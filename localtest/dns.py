@@ -0,0 +1,127 @@
+import os
+import time
+import random
+import struct
+import asyncio
+
+from localtest.probe import parse_host_port
+
+DNS_PORT = 53
+DEFAULT_NAMES = ("google.com", "cloudflare.com", "wikipedia.org", "github.com", "amazon.com")
+
+def parse_resolver(value):
+    # accepts "1.1.1.1", "127.0.0.1:5353" and "[::1]:5353"
+    try:
+        return parse_host_port(value, DNS_PORT)
+    except ValueError:
+        raise ValueError(f"'{value.strip()}' isn't a resolver, use ip, ip:port or [ipv6]:port.") from None
+
+def build_query(name, query_id, qtype=1):
+    header = struct.pack("!HHHHHH", query_id, 0x0100, 1, 0, 0, 0) # standard query, recursion desired
+    qname = b"".join(bytes([len(label)]) + label.encode("ascii") for label in name.strip(".").split(".")) + b"\0"
+    return header + qname + struct.pack("!HH", qtype, 1)
+
+def uncached_name(name):
+    # a random label nobody has asked for before forces the resolver to go upstream
+    return f"lt-{os.urandom(6).hex()}.{name}"
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.waiting = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < 12:
+            return
+        query_id, flags = struct.unpack("!HH", data[:4])
+        if not flags & 0x8000:
+            return
+        fut = self.waiting.pop(query_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result((time.perf_counter_ns(), flags & 0x000F))
+
+    def error_received(self, exc):
+        for fut in self.waiting.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self.waiting.clear()
+
+async def _query(transport, protocol, name, timeout):
+    loop = asyncio.get_running_loop()
+    query_id = random.getrandbits(16)
+    while query_id in protocol.waiting:
+        query_id = random.getrandbits(16)
+    fut = loop.create_future()
+    protocol.waiting[query_id] = fut
+    sent = time.perf_counter_ns()
+    transport.sendto(build_query(name, query_id))
+    try:
+        received, rcode = await asyncio.wait_for(fut, timeout)
+    except (asyncio.TimeoutError, OSError):
+        protocol.waiting.pop(query_id, None)
+        return None, None
+    return (received - sent) / 1_000_000, rcode
+
+def _percentile(ordered, p):
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def _summarize(samples):
+    ordered = sorted(s for s in samples if s is not None)
+    return {
+        "queries": len(samples),
+        "timeouts": sum(1 for s in samples if s is None),
+        "p50_ms": _percentile(ordered, 50),
+        "p95_ms": _percentile(ordered, 95),
+        "p99_ms": _percentile(ordered, 99),
+        "min_ms": ordered[0] if ordered else None,
+        "max_ms": ordered[-1] if ordered else None,
+    }
+
+async def benchmark_resolver(resolver, names=DEFAULT_NAMES, rounds=3, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    host, port = parse_resolver(resolver)
+    try:
+        transport, protocol = await loop.create_datagram_endpoint(_ResolverProtocol, remote_addr=(host, port))
+    except OSError as e:
+        return {"resolver": resolver, "error": str(e)}
+
+    cached, uncached, errors = [], [], 0
+    try:
+        # each batch goes out at once, so a resolver that stops answering costs one timeout per round
+        # instead of one per query, (rounds + 1) * timeout at worst
+        warm = await asyncio.gather(*(_query(transport, protocol, name, timeout) for name in names)) # not measured
+        if not any(rtt is not None for rtt, _ in warm):
+            return {"resolver": resolver, "error": "no response"}
+        for _ in range(rounds):
+            batch = await asyncio.gather(*(_query(transport, protocol, n, timeout)
+                                           for name in names for n in (name, uncached_name(name))))
+            for i, (rtt, rcode) in enumerate(batch):
+                (cached if i % 2 == 0 else uncached).append(rtt)
+                errors += rcode == 2 # SERVFAIL
+    finally:
+        transport.close()
+
+    return {"resolver": resolver, "cached": _summarize(cached), "uncached": _summarize(uncached), "servfail": errors}
+
+async def benchmark_resolvers_async(resolvers, **kwargs):
+    seen = []
+    for resolver in resolvers:
+        if resolver not in seen:
+            seen.append(resolver)
+    results = await asyncio.gather(*(benchmark_resolver(r, **kwargs) for r in seen))
+    return rank_results(results)
+
+def benchmark_resolvers(resolvers, **kwargs):
+    return asyncio.run(benchmark_resolvers_async(resolvers, **kwargs))
+
+def rank_results(results):
+    # fastest typical cached lookup first, resolvers that never answered go last
+    def key(r):
+        if "error" in r or r["cached"]["p50_ms"] is None:
+            return (1, float("inf"))
+        return (0, r["cached"]["p50_ms"] + (r["uncached"]["p50_ms"] or 0) / 10)
+    return sorted(results, key=key)
@@ -0,0 +1,230 @@
+import os
+import time
+import shutil
+import platform
+import threading
+from localtest.cli import cprint, spinner, get_flag_value
+from localtest.settings import load_settings
+from localtest.output import emit, machine_readable
+from localtest.history import append_entry, iter_entries
+from localtest.query import normalize_timestamp
+from localtest.cpu import KERNELS, cpu_model, usable_cpus, make_pool, measure_kernel, memory_bandwidth, memory_latency
+from localtest.disk import QUEUE_DEPTHS, scratch_path, sequential_write, sequential_read, mmap_read, random_io
+
+# lives right next to network_history/, same segment format
+HARDWARE_HISTORY_DIR = "hardware_history"
+
+def _with_spinner(text, func, *args):
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=(text, stop_event))
+    spinner_thread.start()
+    try:
+        return func(*args)
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+
+def node_info():
+    return {
+        "node": platform.node() or "unknown",
+        "os": f"{platform.system()} {platform.release()}",
+        "python": platform.python_version(),
+    }
+
+def run_cpu_benchmark(args):
+    settings = load_settings()
+    try:
+        seconds = float(get_flag_value(args, "--seconds", default=settings.get("cpu_kernel_seconds", 1)))
+        memory_mb = max(1, int(get_flag_value(args, "--memory-mb", default=settings.get("memory_buffer_mb", 256))))
+    except ValueError:
+        cprint("Invalid value for --seconds or --memory-mb.")
+        return None
+    workers = usable_cpus()
+    model = cpu_model()
+    cprint(f"Starting CPU benchmark on {model} ({workers} usable cores, {seconds:g}s per kernel)...\n")
+
+    pool = make_pool(workers)
+    kernels = {}
+    try:
+        for name in KERNELS:
+            result = _with_spinner(f"Running {name} on 1 core, then {workers}", measure_kernel, pool, name, seconds, workers)
+            kernels[name] = result
+            emit("cpu_kernel", kernel=name, **result)
+    finally:
+        pool.shutdown()
+
+    memory = _with_spinner(f"Copying and scanning {memory_mb} MiB buffers", memory_bandwidth, memory_mb)
+    memory["latency_ns"] = _with_spinner("Chasing pointers for memory latency", memory_latency, memory_mb)
+    emit("memory", **memory)
+
+    cprint("\033[1;32m--- CPU Results ---\033[0m")
+    cprint(f"\033[1;33mCPU:\033[0m {model} ({workers} usable / {os.cpu_count()} logical)")
+    for name, k in kernels.items():
+        cprint(f"\033[1;33m{name}:\033[0m 1 core {k['single']:.2f} {k['unit']} | "
+               f"{k['workers']} cores {k['all']:.2f} {k['unit']} | scaling {k['scaling_percent']}%")
+    cprint("\n\033[1;32m--- Memory ---\033[0m")
+    cprint(f"\033[1;33mCopy:\033[0m {memory['copy_gbps']:.2f} GB/s | \033[1;33mRead:\033[0m {memory['read_gbps']:.2f} GB/s | "
+           f"\033[1;33mLatency:\033[0m ~{memory['latency_ns']:.0f} ns\n")
+
+    scaling = [k["scaling_percent"] for k in kernels.values() if k["scaling_percent"] is not None]
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "kind": "cpu",
+        **node_info(),
+        "cpu": model,
+        "cores": workers,
+        "kernel_seconds": seconds,
+        "kernels": kernels,
+        "memory": memory,
+        "scaling_percent": round(sum(scaling) / len(scaling), 1) if scaling else None,
+    }
+    append_entry(entry, HARDWARE_HISTORY_DIR)
+    emit("result", **entry)
+    return entry
+
+def run_disk_benchmark(args):
+    settings = load_settings()
+    directory = get_flag_value(args, "--path", default=".")
+    try:
+        size_mb = max(1, int(get_flag_value(args, "--size-mb", default=settings.get("disk_file_mb", 512))))
+        seconds = float(get_flag_value(args, "--seconds", default=settings.get("disk_test_seconds", 3)))
+    except ValueError:
+        cprint("Invalid value for --size-mb or --seconds.")
+        return None
+    if not os.path.isdir(directory):
+        cprint(f"[ERROR] {directory} isn't a directory.")
+        return None
+    free_mb = shutil.disk_usage(directory).free // (1024 * 1024)
+    if free_mb < size_mb * 1.1:
+        cprint(f"[ERROR] Only {free_mb} MiB free in {directory}, the test needs {size_mb} MiB. Try a smaller --size-mb.")
+        return None
+
+    size = size_mb * 1024 * 1024
+    direct = "--buffered" not in args
+    path = scratch_path(directory)
+    cprint(f"Starting disk benchmark in {os.path.abspath(directory)} ({size_mb} MiB scratch file, {seconds:g}s per random test)...\n")
+
+    random_results = {"read": {}, "write": {}}
+    try:
+        write = _with_spinner(f"Writing {size_mb} MiB sequentially", sequential_write, path, size, direct)
+        emit("disk_test", test="seq_write", **write)
+        read = _with_spinner(f"Reading {size_mb} MiB sequentially", sequential_read, path, size, direct)
+        emit("disk_test", test="seq_read", **read)
+        mapped = _with_spinner("Reading it again through mmap", mmap_read, path)
+        emit("disk_test", test="mmap_read", **mapped)
+        for mode in ("read", "write"):
+            for depth in QUEUE_DEPTHS:
+                result = _with_spinner(f"Random 4K {mode}s at queue depth {depth}", random_io, path, size, depth, seconds, mode == "write", direct)
+                random_results[mode][str(depth)] = result
+                emit("disk_test", test=f"rand_{mode}", queue_depth=depth, **result)
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    used_direct = write["direct"]
+    cprint(f"\033[1;32m--- Disk Results ({'O_DIRECT' if used_direct else 'buffered, page cache may flatter reads'}) ---\033[0m")
+    cprint(f"\033[1;33mSequential write:\033[0m {write['mbps']:.1f} MB/s | \033[1;33mread:\033[0m {read['mbps']:.1f} MB/s | "
+           f"\033[1;33mmmap read:\033[0m {mapped['mbps']:.1f} MB/s{'' if mapped['cold_cache'] else ' (cached)'}")
+    for mode in ("read", "write"):
+        label = "Random 4K read" if mode == "read" else "Random 4K write (sync)"
+        for depth, r in random_results[mode].items():
+            cprint(f"\033[1;33m{label} QD{depth}:\033[0m {r['iops']} IOPS | "
+                   f"p50 {r.get('p50_us', 0):.0f} | p99 {r.get('p99_us', 0):.0f} | p99.9 {r.get('p999_us', 0):.0f} us")
+    cprint("")
+
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "kind": "disk",
+        **node_info(),
+        "path": os.path.abspath(directory),
+        "file_mb": size_mb,
+        "direct": used_direct,
+        "sequential": {"write": write, "read": read, "mmap_read": mapped},
+        "random": random_results,
+    }
+    append_entry(entry, HARDWARE_HISTORY_DIR)
+    emit("result", **entry)
+    return entry
+
+def format_hardware_entry(entry):
+    if entry.get("kind") == "cpu":
+        k = entry.get("kernels", {})
+        m = entry.get("memory", {})
+        return (f"[{entry['timestamp']}] CPU | {entry.get('node')} | {entry.get('cpu')} x{entry.get('cores')} | "
+                f"int {k.get('int', {}).get('single')}/{k.get('int', {}).get('all')} Mops/s | "
+                f"scaling {entry.get('scaling_percent')}% | copy {m.get('copy_gbps')} GB/s | latency {m.get('latency_ns')} ns")
+    if entry.get("kind") == "disk":
+        seq = entry.get("sequential", {})
+        rand = entry.get("random", {}).get("read", {})
+        qd1 = rand.get("1", {})
+        qd_max = rand[max(rand, key=int)] if rand else {}
+        return (f"[{entry['timestamp']}] DISK | {entry.get('node')} | {entry.get('path')} | "
+                f"seq ↑ {seq.get('write', {}).get('mbps')} ↓ {seq.get('read', {}).get('mbps')} MB/s | "
+                f"4K read QD1 {qd1.get('iops')} IOPS (p99 {qd1.get('p99_us')} us) | top QD {qd_max.get('iops')} IOPS")
+    return f"[{entry['timestamp']}] {entry.get('kind', '?').upper()} | {entry.get('node')}"
+
+def _fleet_row(entry):
+    k = entry.get("kernels", {})
+    return {
+        "node": entry.get("node"),
+        "cpu": entry.get("cpu"),
+        "cores": entry.get("cores"),
+        "single": {name: k[name]["single"] for name in k},
+        "all": {name: k[name]["all"] for name in k},
+        "copy_gbps": entry.get("memory", {}).get("copy_gbps"),
+        "latency_ns": entry.get("memory", {}).get("latency_ns"),
+    }
+
+def show_fleet(latest):
+    # latest cpu run per node, every number relative to the best node (100 = best)
+    rows = [_fleet_row(e) for e in latest.values()]
+    best_single = {name: max(r["single"].get(name, 0) for r in rows) for name in KERNELS}
+    best_all = {name: max(r["all"].get(name, 0) for r in rows) for name in KERNELS}
+
+    def relative(values, best):
+        scores = [values[name] / best[name] * 100 for name in KERNELS if best.get(name) and name in values]
+        return round(sum(scores) / len(scores)) if scores else None
+
+    cprint("\n\033[1;32m--- Fleet (latest CPU run per node, 100 = best) ---\033[0m")
+    rows.sort(key=lambda r: relative(r["all"], best_all) or 0, reverse=True)
+    for r in rows:
+        single = relative(r["single"], best_single)
+        multi = relative(r["all"], best_all)
+        emit("fleet", single_score=single, multi_score=multi, **r)
+        cprint(f"\033[1;33m{r['node']}:\033[0m single {single} | multi {multi} | copy {r['copy_gbps']} GB/s | "
+               f"latency {r['latency_ns']} ns \033[90m({r['cpu']} x{r['cores']})\033[0m")
+
+def show_hardware_history(args):
+    kind = args[2] if len(args) >= 3 and not args[2].startswith("-") else None
+    node = get_flag_value(args, "--node")
+    since = normalize_timestamp(get_flag_value(args, "--since"))
+    until = normalize_timestamp(get_flag_value(args, "--until"), end=True)
+    # other nodes' hardware_history folders (copied over, or on a share) to compare the fleet
+    directories = [HARDWARE_HISTORY_DIR] + [d for d in (get_flag_value(args, "--from") or "").split(",") if d]
+    latest = {}
+    found = False
+    machine = machine_readable()
+    for directory in directories:
+        if not os.path.isdir(directory):
+            if directory != HARDWARE_HISTORY_DIR:
+                cprint(f"[WARN] No hardware history in {directory}")
+            continue
+        for entry in iter_entries(since=since, until=until, directory=directory):
+            if kind and entry.get("kind") != kind:
+                continue
+            if node and node.lower() not in str(entry.get("node", "")).lower():
+                continue
+            found = True
+            if entry.get("kind") == "cpu":
+                latest[entry.get("node")] = entry
+            if machine:
+                emit("history", **entry)
+            else:
+                cprint(format_hardware_entry(entry))
+    if not found:
+        cprint("No hardware history found. Run 'localtest hardware cpu' or 'localtest hardware disk' first!")
+        return
+    if len(latest) > 1:
+        show_fleet(latest)
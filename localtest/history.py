@@ -0,0 +1,393 @@
+import os
+import json
+
+LEGACY_HISTORY_FILE = "network_history.json"
+HISTORY_DIR = "network_history"
+
+SEGMENT_MAX_BYTES = 4 * 1024 * 1024
+INDEX_STRIDE_BYTES = 64 * 1024
+INDEX_FILE = "index.jsonl"
+LOCK_FILE = ".lock"
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class _HistoryLock:
+    def __init__(self, directory):
+        self.path = os.path.join(directory, LOCK_FILE)
+        self.f = None
+
+    def __enter__(self):
+        self.f = open(self.path, "a+")
+        _lock(self.f)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            _unlock(self.f)
+        finally:
+            self.f.close()
+
+def _path(directory, name):
+    return os.path.join(directory, name)
+
+def _segment_name(number):
+    return f"segment-{number:06d}.jsonl"
+
+def list_segments(directory=HISTORY_DIR):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(n for n in os.listdir(directory) if n.startswith("segment-") and n.endswith(".jsonl"))
+
+def _segment_number(name):
+    return int(name[len("segment-"):-len(".jsonl")])
+
+def _dumps(entry):
+    return json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+def _write_line(f, line):
+    f.write(line.encode("utf-8"))
+    f.flush()
+    os.fsync(f.fileno())
+
+def _last_line(path):
+    # reads backwards from the end so it stays O(1) no matter how big the file gets
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            chunk = 4096
+            while True:
+                start = max(0, end - chunk)
+                f.seek(start)
+                data = f.read(end - start)
+                lines = data.rstrip(b"\n").rsplit(b"\n", 1)
+                if len(lines) == 2 or start == 0:
+                    return lines[-1].decode("utf-8") if lines[-1] else None
+                chunk *= 2
+    except FileNotFoundError:
+        return None
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+def _newest(a, b):
+    # newest of two timestamps where None means "nothing yet"
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return max(a, b)
+
+def _last_index_point(directory):
+    line = _last_line(_path(directory, INDEX_FILE))
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+def _migrate_legacy(directory):
+    # the old single-file history only ever held network scans, other histories (monitor, hardware) skip this
+    if os.path.abspath(directory) != os.path.abspath(HISTORY_DIR):
+        return
+    if list_segments(directory) or not os.path.exists(LEGACY_HISTORY_FILE):
+        return
+    try:
+        with open(LEGACY_HISTORY_FILE, "r") as f:
+            legacy = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return
+    if not isinstance(legacy, list):
+        return
+    _write_segments(directory, legacy)
+    os.replace(LEGACY_HISTORY_FILE, LEGACY_HISTORY_FILE + ".migrated")
+
+def _write_segments(directory, entries, first_number=1, max_bytes=SEGMENT_MAX_BYTES):
+    # writes entries into fresh segments starting at first_number and returns the index points
+    number = first_number
+    points = []
+    tmp_names = []
+    out = None
+    offset = 0
+    last_indexed = None
+    newest = None
+    try:
+        for entry in entries:
+            if out is None or (max_bytes is not None and offset >= max_bytes):
+                if out is not None:
+                    out.close()
+                    number += 1
+                name = _segment_name(number)
+                tmp_names.append(name)
+                out = open(_path(directory, name + ".tmp"), "wb")
+                offset = 0
+                last_indexed = None
+            if last_indexed is None or offset - last_indexed >= INDEX_STRIDE_BYTES:
+                points.append({"ts": entry.get("timestamp"), "max_before": newest, "segment": tmp_names[-1], "offset": offset})
+                last_indexed = offset
+            newest = _newest(newest, entry.get("timestamp"))
+            data = _dumps(entry).encode("utf-8")
+            out.write(data)
+            offset += len(data)
+    finally:
+        if out is not None:
+            out.flush()
+            os.fsync(out.fileno())
+            out.close()
+    for name in tmp_names:
+        os.replace(_path(directory, name + ".tmp"), _path(directory, name))
+    return points
+
+def _write_index(directory, points):
+    tmp_path = _path(directory, INDEX_FILE + ".tmp")
+    with open(tmp_path, "w") as f:
+        for point in points:
+            f.write(_dumps(point))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, _path(directory, INDEX_FILE))
+
+def open_history(directory=HISTORY_DIR):
+    os.makedirs(directory, exist_ok=True)
+    with _HistoryLock(directory):
+        _migrate_legacy(directory)
+        # missing, torn at the end, or written before points knew max_before
+        point = _last_index_point(directory)
+        if list_segments(directory) and (point is None or "max_before" not in point):
+            rebuild_index(directory)
+    return directory
+
+def append_entry(entry, directory=HISTORY_DIR):
+    append_entries([entry], directory)
+    return entry
+
+def append_entries(entries, directory=HISTORY_DIR):
+    # a whole batch costs one lock, one write and one fsync
+    if not entries:
+        return 0
+    open_history(directory)
+    with _HistoryLock(directory):
+        segments = list_segments(directory)
+        name = segments[-1] if segments else _segment_name(1)
+        path = _path(directory, name)
+        if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_MAX_BYTES:
+            name = _segment_name(_segment_number(name) + 1)
+            path = _path(directory, name)
+
+        with open(path, "ab") as f:
+            offset = f.tell()
+            if offset and not _ends_with_newline(path):
+                _write_line(f, "\n") # seal off a torn line so this entry doesn't get glued onto it
+                offset = f.tell()
+            point = _last_index_point(directory)
+            last_indexed = point.get("offset", 0) if point and point.get("segment") == name else None
+            new_points = []
+            chunks = []
+            written = False # newest timestamp already on disk, only looked up when a new point needs it
+            batch_newest = None
+            for entry in entries:
+                data = _dumps(entry).encode("utf-8")
+                if last_indexed is None or offset - last_indexed >= INDEX_STRIDE_BYTES:
+                    if written is False:
+                        written = _newest_since(directory, point)
+                    new_points.append(_dumps({"ts": entry.get("timestamp"), "max_before": _newest(written, batch_newest),
+                                              "segment": name, "offset": offset}))
+                    last_indexed = offset
+                batch_newest = _newest(batch_newest, entry.get("timestamp"))
+                chunks.append(data)
+                offset += len(data)
+            if new_points:
+                with open(_path(directory, INDEX_FILE), "ab") as idx:
+                    _write_line(idx, "".join(new_points))
+            f.write(b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+    return len(entries)
+
+def _iter_segment(path, offset=0):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break # half-written line from a crashed run, ignore it
+            try:
+                yield json.loads(raw)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+
+def _newest_since(directory, point):
+    # newest timestamp on disk: what the last point saw before it, plus the (at most one stride) tail after it
+    if point is None:
+        return None
+    newest = point.get("max_before")
+    try:
+        for entry in _iter_segment(_path(directory, point["segment"]), point.get("offset", 0)):
+            newest = _newest(newest, entry.get("timestamp"))
+    except OSError:
+        pass
+    return newest
+
+def _seek_point(directory, since):
+    # the clock can step backwards (ntp, dst on a badly set box), so a point is only safe to start from
+    # when everything before it is older than since, not just the entry it points at
+    if since is None:
+        return None
+    best = None
+    try:
+        with open(_path(directory, INDEX_FILE), "r") as f:
+            for line in f:
+                try:
+                    point = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if "max_before" not in point:
+                    break
+                if point["max_before"] is None or point["max_before"] < since:
+                    best = point
+                else:
+                    break
+    except FileNotFoundError:
+        pass
+    return best
+
+def iter_entries(since=None, until=None, directory=HISTORY_DIR):
+    # timestamps are "%Y-%m-%d %H:%M:%S" strings, so plain string compares keep them in order
+    try:
+        open_history(directory)
+    except OSError:
+        pass # read-only share (someone else's --from folder), read what's there without migrating or indexing
+    segments = list_segments(directory)
+    point = _seek_point(directory, since)
+    if point and point.get("segment") in segments:
+        start = segments.index(point["segment"])
+        offset = point.get("offset", 0)
+    else:
+        start, offset = 0, 0
+
+    for i, name in enumerate(segments[start:]):
+        for entry in _iter_segment(_path(directory, name), offset if i == 0 else 0):
+            ts = entry.get("timestamp", "")
+            if since is not None and ts < since:
+                continue
+            if until is not None and ts > until:
+                continue # not return, an older entry can still follow one from before a clock step
+            yield entry
+
+def cursor_is_valid(cursor, directory=HISTORY_DIR):
+    # compaction deletes folded segments, so a cursor into one of those can't be trusted anymore
+    if not cursor:
+        return False
+    path = _path(directory, cursor.get("segment", ""))
+    offset = cursor.get("offset", 0)
+    try:
+        if os.path.getsize(path) < offset:
+            return False
+        if offset == 0:
+            return True
+        with open(path, "rb") as f:
+            f.seek(offset - 1)
+            return f.read(1) == b"\n"
+    except OSError:
+        return False
+
+def iter_after(cursor=None, directory=HISTORY_DIR):
+    # yields (entry, cursor) for everything written after cursor, where each cursor points just past its entry.
+    # unlike a timestamp, a position doesn't skip entries saved in the same second or after the clock went back.
+    # doesn't take the lock, callers that need a stable view hold _HistoryLock themselves
+    segments = list_segments(directory)
+    start, offset = 0, 0
+    if cursor and cursor.get("segment") in segments:
+        start = segments.index(cursor["segment"])
+        offset = cursor.get("offset", 0)
+    for i, name in enumerate(segments[start:]):
+        position = offset if i == 0 else 0
+        with open(_path(directory, name), "rb") as f:
+            f.seek(position)
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break # half-written line, picked up next time once it's finished
+                position += len(raw)
+                try:
+                    entry = json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                yield entry, {"segment": name, "offset": position}
+
+def load_history(directory=HISTORY_DIR):
+    return list(iter_entries(directory=directory))
+
+def rebuild_index(directory=HISTORY_DIR):
+    points = []
+    newest = None
+    for name in list_segments(directory):
+        offset = 0
+        last_indexed = None
+        with open(_path(directory, name), "rb") as f:
+            for raw in f:
+                try:
+                    ts = json.loads(raw).get("timestamp") if raw.endswith(b"\n") else None
+                except (json.JSONDecodeError, UnicodeDecodeError, AttributeError):
+                    ts = None
+                if ts is not None and (last_indexed is None or offset - last_indexed >= INDEX_STRIDE_BYTES):
+                    points.append({"ts": ts, "max_before": newest, "segment": name, "offset": offset})
+                    last_indexed = offset
+                newest = _newest(newest, ts)
+                offset += len(raw)
+    _write_index(directory, points)
+    return points
+
+def compact_history(directory=HISTORY_DIR):
+    # folds every closed segment (all but the active one) into a single segment and drops broken lines
+    open_history(directory)
+    with _HistoryLock(directory):
+        segments = list_segments(directory)
+        closed = segments[:-1]
+        if len(closed) < 2:
+            return {"segments_before": len(segments), "segments_after": len(segments), "entries": None}
+
+        def closed_entries():
+            for name in closed:
+                yield from _iter_segment(_path(directory, name))
+
+        tmp_dir = _path(directory, ".compact")
+        os.makedirs(tmp_dir, exist_ok=True)
+        for stale in os.listdir(tmp_dir):
+            os.unlink(_path(tmp_dir, stale))
+        count = [0]
+
+        def counted():
+            for entry in closed_entries():
+                count[0] += 1
+                yield entry
+
+        _write_segments(tmp_dir, counted(), first_number=_segment_number(closed[0]), max_bytes=None)
+        # replace first, then unlink: a crash in between duplicates entries instead of losing them
+        folded = list_segments(tmp_dir)
+        for name in folded:
+            os.replace(_path(tmp_dir, name), _path(directory, name))
+        for name in closed:
+            if name not in folded:
+                os.unlink(_path(directory, name))
+        os.rmdir(tmp_dir)
+        rebuild_index(directory)
+        return {"segments_before": len(segments), "segments_after": len(list_segments(directory)), "entries": count[0]}
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import socket
+import tempfile
+import threading
+import socketserver
+
+from localtest.probe import parse_host_port
+
+DEFAULT_PORT = 5201
+DIRECTIONS = ("download", "upload", "both", "bidir")
+BUFFER_SIZE = 256 * 1024
+SENDFILE_CHUNK = 256 * 1024
+PAYLOAD_FILE_SIZE = 8 * 1024 * 1024
+
+# one buffer for the whole process, every stream sends slices of it
+_PAYLOAD = memoryview(os.urandom(BUFFER_SIZE))
+
+def _payload_file():
+    # sendfile needs a real file, so keep a random blob on disk for the life of the server
+    f = tempfile.TemporaryFile()
+    block = bytes(_PAYLOAD)
+    for _ in range(PAYLOAD_FILE_SIZE // len(block)):
+        f.write(block)
+    f.flush()
+    return f
+
+def _read_line(sock, limit=4096):
+    data = b""
+    while not data.endswith(b"\n"):
+        chunk = sock.recv(1)
+        if not chunk:
+            return None
+        data += chunk
+        if len(data) > limit:
+            return None
+    return data
+
+def _send_for(sock, duration, payload_file=None):
+    sent = 0
+    deadline = time.monotonic() + duration
+    use_sendfile = payload_file is not None and hasattr(os, "sendfile")
+    offset = 0
+    while time.monotonic() < deadline:
+        if use_sendfile:
+            n = os.sendfile(sock.fileno(), payload_file.fileno(), offset, SENDFILE_CHUNK)
+            if n == 0:
+                break
+            offset = (offset + n) % PAYLOAD_FILE_SIZE
+        else:
+            n = sock.send(_PAYLOAD)
+        sent += n
+    return sent
+
+def _recv_all(sock, buf):
+    received = 0
+    view = memoryview(buf)
+    while True:
+        n = sock.recv_into(view)
+        if not n:
+            return received
+        received += n
+
+class _StreamHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        try:
+            line = _read_line(sock)
+            if not line:
+                return # probe or port scan, nothing to do
+            request = json.loads(line)
+            duration = min(float(request.get("duration", 10)), self.server.max_duration)
+            if request.get("mode") == "download":
+                sock.sendall(b'{"ok":true}\n')
+                _send_for(sock, duration, self.server.payload_file)
+                sock.shutdown(socket.SHUT_WR)
+            elif request.get("mode") == "upload":
+                sock.sendall(b'{"ok":true}\n')
+                start = time.perf_counter()
+                received = _recv_all(sock, bytearray(BUFFER_SIZE))
+                elapsed = time.perf_counter() - start
+                sock.sendall(json.dumps({"bytes": received, "seconds": elapsed}).encode() + b"\n")
+        except (OSError, ValueError):
+            pass
+
+class LanServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, max_duration=60):
+        super().__init__(address, _StreamHandler)
+        self.max_duration = max_duration
+        self.payload_file = _payload_file() if hasattr(os, "sendfile") else None
+
+    def server_close(self):
+        super().server_close()
+        if self.payload_file is not None:
+            self.payload_file.close()
+
+def start_server(host="0.0.0.0", port=DEFAULT_PORT):
+    # returns a running server on a background thread, handy for loopback runs
+    server = LanServer((host, port))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+def _open_stream(host, port, mode, duration, timeout):
+    sock = socket.create_connection((host, port), timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.sendall(json.dumps({"mode": mode, "duration": duration}).encode() + b"\n")
+    if _read_line(sock) is None:
+        sock.close()
+        raise ConnectionError("LAN server closed the connection during handshake")
+    return sock
+
+def _download_stream(host, port, duration, timeout, out, i):
+    sock = _open_stream(host, port, "download", duration, timeout)
+    try:
+        sock.settimeout(duration + timeout)
+        start = time.perf_counter()
+        received = _recv_all(sock, bytearray(BUFFER_SIZE))
+        out[i] = (received, time.perf_counter() - start)
+    finally:
+        sock.close()
+
+def _upload_stream(host, port, duration, timeout, out, i):
+    sock = _open_stream(host, port, "upload", duration, timeout)
+    try:
+        sock.settimeout(duration + timeout)
+        _send_for(sock, duration)
+        sock.shutdown(socket.SHUT_WR)
+        reply = _read_line(sock)
+        report = json.loads(reply) if reply else {}
+        out[i] = (report.get("bytes", 0), report.get("seconds") or duration)
+    finally:
+        sock.close()
+
+def _run_streams(target, count, args, errors):
+    out = [None] * count
+
+    def worker(i):
+        try:
+            target(*args, out, i)
+        except (OSError, ValueError) as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    return out, threads
+
+def _summarize(out):
+    streams = []
+    total_bytes = 0
+    longest = 0.0
+    for item in out:
+        if item is None:
+            continue
+        received, seconds = item
+        streams.append(round(received * 8 / seconds / 1_000_000, 2) if seconds else 0.0)
+        total_bytes += received
+        longest = max(longest, seconds)
+    aggregate = total_bytes * 8 / longest / 1_000_000 if longest else 0.0
+    return {"streams_mbps": streams, "aggregate_mbps": round(aggregate, 2), "bytes": total_bytes}
+
+def run_client(host, port=DEFAULT_PORT, streams=4, duration=10, direction="both", timeout=5):
+    # direction is "download", "upload", "both" (one after another) or "bidir" (at the same time)
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction: {direction}")
+    errors = []
+    phases = []
+    if direction in ("download", "both", "bidir"):
+        phases.append(("download", _download_stream))
+    if direction in ("upload", "both", "bidir"):
+        phases.append(("upload", _upload_stream))
+
+    results = {}
+    batches = [phases] if direction == "bidir" else [[p] for p in phases]
+    for batch in batches:
+        running = []
+        for name, target in batch:
+            out, threads = _run_streams(target, streams, (host, port, duration, timeout), errors)
+            running.append((name, out, threads))
+        for _, _, threads in running:
+            for t in threads:
+                t.start()
+        for _, _, threads in running:
+            for t in threads:
+                t.join()
+        for name, out, _ in running:
+            results[name] = _summarize(out)
+
+    results["errors"] = errors
+    return results
+
+def parse_target(value):
+    return parse_host_port(value, DEFAULT_PORT)
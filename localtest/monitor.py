@@ -0,0 +1,103 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import deque
+
+from localtest.history import append_entries
+from localtest.probe import probe_hosts_async
+
+MONITOR_HISTORY_DIR = "network_monitor"
+
+class SampleBuffer:
+    # fixed-size ring of recent samples that remembers how many haven't been written out yet
+    def __init__(self, capacity):
+        self.samples = deque(maxlen=capacity)
+        self.pending = 0
+
+    def add(self, sample):
+        self.samples.append(sample)
+        self.pending = min(self.pending + 1, self.samples.maxlen)
+
+    def take_pending(self):
+        if not self.pending:
+            return []
+        batch = list(itertools.islice(self.samples, len(self.samples) - self.pending, None))
+        self.pending = 0
+        return batch
+
+    def recent(self, key):
+        return [s[key] for s in self.samples if s.get(key) is not None]
+
+class Scheduler:
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.jobs = []
+        self._seq = 0
+
+    def every(self, interval, func, jitter=0.0, delay=None):
+        first = self.clock() + (interval if delay is None else delay)
+        self._seq += 1
+        heapq.heappush(self.jobs, (first, self._seq, interval, jitter, func))
+
+    def run_pending(self):
+        due, seq, interval, jitter, func = heapq.heappop(self.jobs)
+        wait = due - self.clock()
+        if wait > 0:
+            self.sleep(wait)
+        func()
+        spread = interval * jitter
+        next_due = max(due + interval + random.uniform(-spread, spread), self.clock())
+        heapq.heappush(self.jobs, (next_due, seq, interval, jitter, func))
+
+    def run_forever(self, should_stop=lambda: False):
+        while self.jobs and not should_stop():
+            self.run_pending()
+
+class Monitor:
+    def __init__(self, hosts, probe_interval=5, probe_count=3, buffer_size=720, flush_every=60,
+                 directory=MONITOR_HISTORY_DIR, on_sample=None, method="auto", port=443):
+        self.hosts = hosts
+        self.probe_interval = probe_interval
+        self.probe_count = probe_count
+        self.buffer = SampleBuffer(buffer_size)
+        # pending tops out at the buffer size, so a bigger flush_every would never be reached
+        self.flush_every = max(1, min(flush_every, buffer_size))
+        self.directory = directory
+        self.on_sample = on_sample
+        self.method = method
+        self.port = port
+        # one event loop for the whole run instead of spinning one up for every probe
+        self.loop = asyncio.new_event_loop()
+
+    def probe(self):
+        results = self.loop.run_until_complete(probe_hosts_async(
+            self.hosts, count=self.probe_count, interval=0.05, timeout=1.0, method=self.method, port=self.port))
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        for host, r in results.items():
+            sample = {
+                "timestamp": timestamp,
+                "host": host,
+                "method": r.get("method"),
+                "avg_ms": r.get("avg_ms"),
+                "min_ms": r.get("min_ms"),
+                "max_ms": r.get("max_ms"),
+                "jitter_ms": r.get("jitter_ms"),
+                "packet_loss_percent": r.get("packet_loss_percent", 100.0 if "error" in r else None),
+            }
+            self.buffer.add(sample)
+            if self.on_sample:
+                self.on_sample(sample)
+        if self.buffer.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        return append_entries(self.buffer.take_pending(), self.directory)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self.loop.close()
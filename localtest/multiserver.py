@@ -0,0 +1,88 @@
+import copy
+import inspect
+import threading
+from localtest.upload import upload as fast_upload
+from localtest.servers import unreachable
+
+def clone_speedtest(st):
+    # shares config, server list and the http opener, but gets its own results and best server,
+    # which saves a config download per extra server
+    clone = copy.copy(st)
+    clone._best = {}
+    clone.results = type(st.results)(client=st.config.get("client"), opener=st._opener, secure=st._secure)
+    return clone
+
+def pick_best_servers(st, count, candidates=None):
+    closest = st.get_closest_servers(limit=candidates or max(count * 3, 5))
+    measured = []
+    lock = threading.Lock()
+
+    def measure(server):
+        clone = clone_speedtest(st)
+        try:
+            clone.get_best_server([server])
+        except Exception:
+            return # unreachable server, just leave it out
+        if unreachable(clone.results.ping):
+            return
+        with lock:
+            measured.append(clone)
+
+    threads = [threading.Thread(target=measure, args=(server,)) for server in closest]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if not measured:
+        raise RuntimeError("None of the closest servers responded.")
+    measured.sort(key=lambda clone: clone.results.ping)
+    return measured[:count]
+
+def call_phase(inst, phase):
+    # newer speedtest-cli takes the stream count as threads=, older ones only look at _threads
+    threads = getattr(inst, "_threads", None)
+    if phase == "upload" and getattr(inst, "_fast_upload", False):
+        return fast_upload(inst, threads)
+    method = getattr(inst, phase)
+    if threads and "threads" in inspect.signature(method).parameters:
+        return method(threads=threads)
+    return method()
+
+def run_phase(instances, phase):
+    # runs download() or upload() on every instance at the same time, returns the summed bits/s
+    if len(instances) == 1:
+        return call_phase(instances[0], phase)
+
+    results = [None] * len(instances)
+    errors = [None] * len(instances)
+
+    def worker(i, inst):
+        try:
+            results[i] = call_phase(inst, phase)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, inst)) for i, inst in enumerate(instances)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if all(r is None for r in results):
+        raise errors[0]
+    return sum(r or 0 for r in results)
+
+def server_breakdown(instances):
+    breakdown = []
+    for inst in instances:
+        server = inst.results.server or {}
+        breakdown.append({
+            "id": server.get("id"),
+            "sponsor": server.get("sponsor"),
+            "name": server.get("name"),
+            "ping": round(inst.results.ping, 2),
+            "download_mbps": round(inst.results.download / 1_000_000, 2),
+            "upload_mbps": round(inst.results.upload / 1_000_000, 2),
+        })
+    return breakdown
@@ -0,0 +1,855 @@
+import os
+import re
+import time
+import random
+import signal
+import socket
+import platform
+import threading
+import subprocess
+from localtest.cli import cprint, spinner, get_flag_value, handle_exit
+from localtest.settings import load_settings
+from localtest.output import emit, flush as flush_output
+from localtest.spans import span, profiling
+
+# the subsystems (and speedtest-cli) are imported inside the functions that use them,
+# so 'network dns' or 'network serve' never load the speed test machinery
+
+# i leaked my ip in devlogs twice... this is why i'm masking ips
+def mask_ip(ip):
+    parts = ip.split(".")
+    if len(parts) == 4:
+        return ".".join(parts[:1] + ["x" * len(parts[1]), "x" * len(parts[2]), "x" * len(parts[3])])
+    return ".".join("x" * len(part) for part in parts)
+
+def measure_phase(instances, phase, text, adaptive=None, label=None, timings=None):
+    # runs download/upload while a sampler reads the byte counter every 100ms for the live meter.
+    # with adaptive settings the phase is cut short once the estimate settles (see adaptive.py)
+    from localtest.adaptive import ConvergenceWatcher
+    from localtest.multiserver import run_phase
+    from localtest.sampling import SAMPLE_INTERVAL, ByteCounter, ThroughputSampler, attach_counter, live_meter
+    label = label or phase
+    counter = ByteCounter()
+    watcher = None
+    original_events = [inst._shutdown_event for inst in instances]
+    if adaptive:
+        watcher = ConvergenceWatcher(SAMPLE_INTERVAL, **adaptive)
+        for inst in instances:
+            inst._shutdown_event = watcher.stop_event
+    for inst in instances:
+        attach_counter(inst, counter)
+
+    def on_sample(mbps):
+        emit("sample", phase=label, mbps=round(mbps, 2))
+        if watcher:
+            watcher.update(mbps, counter.value)
+
+    sampler = ThroughputSampler(counter, on_sample=on_sample).start()
+    emit("phase_start", phase=label)
+
+    result = [None]
+    stop_event = threading.Event()
+    def worker():
+        try:
+            result[0] = run_phase(instances, phase)
+        finally:
+            stop_event.set()
+
+    with span(label, timings, streams=getattr(instances[0], "_threads", None)) as phase_span:
+        phase_thread = threading.Thread(target=worker)
+        meter_thread = threading.Thread(target=live_meter, args=(text, stop_event, sampler))
+        phase_thread.start()
+        meter_thread.start()
+        phase_thread.join()
+        meter_thread.join()
+    samples = sampler.stop()
+    for inst, event in zip(instances, original_events):
+        inst._shutdown_event = event
+
+    report = None
+    if watcher:
+        report = watcher.report()
+        # the trailing-window estimate skips the ramp-up that speedtest-cli's whole-phase average includes
+        if watcher.estimate_bps() is not None:
+            result[0] = watcher.estimate_bps()
+    emit("phase_end", phase=label, seconds=round(phase_span.seconds, 3),
+         mbps=round((result[0] or 0) / 1_000_000, 2), adaptive=report)
+    return result[0], samples, report
+
+def format_stability(samples):
+    from localtest.sampling import summarize_samples
+    stats = summarize_samples(samples)
+    if not stats:
+        return ""
+    return f" \033[90m(peak {stats['peak_mbps']:.2f}, median {stats['median_mbps']:.2f}, worst 10% {stats['p10_mbps']:.2f})\033[0m"
+
+def adaptive_options(settings):
+    return {
+        "tolerance": settings.get("adaptive_tolerance_percent", 5) / 100,
+        "max_seconds": settings.get("adaptive_max_seconds", 15),
+        "max_bytes": settings.get("adaptive_max_mb", 500) * 1_000_000,
+    }
+
+def tune_concurrency(instances, client_key, max_streams):
+    # short bursts at 1, 2, 4... streams until more streams stop helping, remembered per host + server
+    from localtest.tuning import ramp, recall, remember, memory_key, starting_point
+    key = memory_key(client_key, instances[0].results.server)
+    burst_options = {"min_seconds": 0.5, "window_seconds": 1.0, "max_seconds": 2.5}
+    tuned = {}
+    for phase, arrow in (("download", "↓"), ("upload", "↑")):
+        def burst(streams):
+            for inst in instances:
+                inst._threads = streams
+            rate, _, _ = measure_phase(instances, phase, f"Tuning {arrow} {streams} streams", burst_options, label=f"tune_{phase}")
+            return rate
+
+        start = starting_point(recall(key, phase))
+        best, tried = ramp(burst, start=min(start, max_streams), max_streams=max_streams)
+        remember(key, phase, best)
+        tuned[phase] = {"streams": best, "ramp": tried}
+        emit("concurrency", phase=phase, streams=best, ramp=tried)
+    return tuned
+
+def find_servers(settings, refresh_server=False, server_count=1, server=None):
+    # config download + server pick, on its own so improve can overlap it with the other diagnostics.
+    # server= skips the pick and just re-pings a server we already chose earlier
+    import speedtest
+    from localtest.multiserver import pick_best_servers
+    from localtest.servers import choose_server, use_server
+    timings = {}
+    with span("speedtest_config", timings):
+        st = speedtest.Speedtest()
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=("Finding best server", stop_event))
+    spinner_thread.start()
+    emit("phase_start", phase="server_discovery")
+    try:
+        with span("server_discovery", timings) as discovery:
+            if server is not None:
+                try:
+                    use_server(st, server)
+                    server_source = "reused"
+                except ConnectionError:
+                    # the earlier pick died in the meantime, pick again like a normal run would
+                    ttl = settings.get("server_cache_ttl_hours", 24) * 3600
+                    _, _, server_source = choose_server(st, speedtest.Speedtest, ttl, refresh=refresh_server)
+                instances = [st]
+            elif server_count > 1:
+                # several servers at once so a single slow server isn't what we end up measuring
+                instances = pick_best_servers(st, server_count)
+                server_source = "discovered"
+            else:
+                ttl = settings.get("server_cache_ttl_hours", 24) * 3600
+                _, _, server_source = choose_server(st, speedtest.Speedtest, ttl, refresh=refresh_server)
+                instances = [st]
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+    emit("phase_end", phase="server_discovery", seconds=round(discovery.seconds, 3), source=server_source)
+    return {"st": st, "instances": instances, "source": server_source, "timings": timings}
+
+def start_latency_probe(settings, timings):
+    from localtest.probe import LatencyProbe
+    probe = LatencyProbe(settings.get("ping_test_host", "8.8.8.8"), interval=settings.get("bufferbloat_probe_ms", 100) / 1000,
+                         method=settings.get("ping_method", "auto"), port=settings.get("ping_tcp_port", 443)).start()
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=("Measuring idle latency", stop_event))
+    spinner_thread.start()
+    try:
+        with span("idle_latency", timings):
+            time.sleep(settings.get("bufferbloat_idle_seconds", 2))
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+    return probe
+
+def loaded_latency_report(probe, series):
+    # how much worse latency gets once the link is full, graded on the worst phase's median increase
+    from localtest.probe import latency_stats, bufferbloat_grade
+    from localtest.sampling import encode_samples
+    idle = latency_stats(series.get("idle", []))
+    report = {"host": probe.host, "method": probe.used_method, "interval_ms": round(probe.interval * 1000), "idle": idle}
+    worst = None
+    for phase in ("download", "upload"):
+        stats = latency_stats(series.get(phase, []))
+        if stats.get("p50_ms") is not None and idle.get("p50_ms") is not None:
+            stats["increase_ms"] = round(stats["p50_ms"] - idle["p50_ms"], 2)
+            worst = max(worst if worst is not None else 0.0, stats["increase_ms"])
+        report[phase] = stats
+    report["grade"] = bufferbloat_grade(worst)
+    # lost probes are stored as NaN so the series keeps its timing
+    report["series"] = {phase: encode_samples([rtt if rtt is not None else float("nan") for rtt in samples])
+                        for phase, samples in series.items() if phase in ("idle", "download", "upload")}
+    return report
+
+def show_loaded_latency(report):
+    cprint("\033[1;32m--- Latency Under Load ---\033[0m")
+    if report["grade"] is None:
+        reason = f" ({report['error']})" if report.get("error") else ""
+        cprint(f"Couldn't measure latency to {report['host']}{reason}.\n")
+        return
+    labels = {"idle": "Idle", "download": "↓ Download", "upload": "↑ Upload"}
+    for phase in ("idle", "download", "upload"):
+        stats = report[phase]
+        if stats.get("p50_ms") is None:
+            cprint(f"\033[1;33m{labels[phase]}:\033[0m no replies")
+            continue
+        increase = f" ({stats['increase_ms']:+.1f})" if stats.get("increase_ms") is not None else ""
+        cprint(f"\033[1;33m{labels[phase]}:\033[0m p50 {stats['p50_ms']:.1f}{increase} | p90 {stats['p90_ms']:.1f} | "
+               f"p99 {stats['p99_ms']:.1f} ms | loss {stats['packet_loss_percent']}%")
+    cprint(f"\033[1;33mBufferbloat grade:\033[0m {report['grade']}")
+    if report["grade"] in ("C", "D", "F"):
+        cprint("\033[90mYour router is queueing too much when the link is busy. Turning on SQM / Smart Queue (fq_codel or cake) usually fixes this.\033[0m")
+    cprint("")
+
+def show_analysis_events(events):
+    labels = {"download_mbps": "Download", "upload_mbps": "Upload", "ping": "Ping"}
+    for isp, metric, event, tracker in events:
+        if event == "change_point":
+            continue # shows up in 'network analyze', not worth interrupting a run for
+        emit("analysis_event", isp=isp, metric=metric, change=event, **tracker.summary())
+        if event == "regression":
+            r = tracker.regression
+            cprint(f"\033[1;31m[WARN]\033[0m {labels[metric]} on {isp} is {r['drop_percent']}% worse than usual "
+                   f"({r['level']} vs {r['baseline']}). See 'localtest network analyze'.")
+        elif event == "recovered":
+            cprint(f"\033[1;32m[OK]\033[0m {labels[metric]} on {isp} is back to normal.")
+        elif event == "accepted":
+            cprint(f"\033[90m{labels[metric]} on {isp} has been different for a while, treating {tracker.baseline:.2f} as the new normal.\033[0m")
+
+# runs speed test :shocked:
+def run_speed_test(full_scan=False, refresh_server=False, server_count=1, adaptive=False, auto_threads=False,
+                   prepared=None, server=None, bufferbloat=False):
+    import speedtest
+    from localtest.history import append_entry
+    from localtest.analysis import update as update_analysis
+    from localtest.multiserver import server_breakdown
+    from localtest.sampling import SAMPLE_INTERVAL, encode_samples
+    from localtest.servers import revalidate_in_background, cache_key as server_cache_key
+    cprint(f"Starting {'full' if full_scan else 'quick'} network speed test...\n")
+    settings = load_settings()
+    if prepared is None:
+        prepared = find_servers(settings, refresh_server, server_count, server)
+    st, instances, server_source, timings = prepared["st"], prepared["instances"], prepared["source"], prepared["timings"]
+
+    if len(instances) > 1:
+        cprint(f"Using {len(instances)} servers concurrently.")
+    for inst in instances:
+        inst._fast_upload = settings.get("fast_upload", True)
+    fixed_threads = settings.get("threads_full" if full_scan else "threads_quick", 16 if full_scan else 2)
+    concurrency = None
+    if auto_threads or settings.get("threads_auto", False):
+        with span("tune_concurrency", timings):
+            concurrency = tune_concurrency(instances, server_cache_key(st.config.get("client")), settings.get("threads_max", 64))
+        cprint(f"Auto concurrency: ↓ {concurrency['download']['streams']} streams, ↑ {concurrency['upload']['streams']} streams.")
+
+    options = adaptive_options(settings) if adaptive else None
+    # started after tuning so its bursts don't end up in the idle baseline
+    probe = start_latency_probe(settings, timings) if bufferbloat or settings.get("bufferbloat_test", False) else None
+    try:
+        for inst in instances:
+            inst._threads = concurrency["download"]["streams"] if concurrency else fixed_threads
+        if probe:
+            probe.set_phase("download")
+        download_result, download_samples, download_report = measure_phase(instances, "download", "Testing ↓ download speed", options, timings=timings)
+        for inst in instances:
+            inst._threads = concurrency["upload"]["streams"] if concurrency else fixed_threads
+        if probe:
+            probe.set_phase("upload")
+        upload_result, upload_samples, upload_report = measure_phase(instances, "upload", "Testing ↑ upload speed", options, timings=timings)
+    finally:
+        series = probe.stop() if probe else None
+    loaded_latency = None
+    if probe:
+        loaded_latency = loaded_latency_report(probe, series)
+        if probe.error:
+            loaded_latency["error"] = probe.error
+        emit("loaded_latency", **{k: v for k, v in loaded_latency.items() if k != "series"})
+
+    results = instances[0].results.dict()
+    download_mbps = (download_result or 0) / 1_000_000
+    upload_mbps = (upload_result or 0) / 1_000_000
+    ping = results['ping']
+    isp = results.get('client', {}).get('isp', 'Unknown ISP')
+
+    cprint("\n\033[1;32m--- Speed Test Results ---\033[0m")
+    cprint(f"\033[1;33mISP:\033[0m {isp}")
+    cprint(f"\033[1;33mPing:\033[0m {ping:.2f} ms")
+    cprint(f"\033[1;33mDownload:\033[0m {download_mbps:.2f} Mbps{format_stability(download_samples)}")
+    cprint(f"\033[1;33mUpload:\033[0m {upload_mbps:.2f} Mbps{format_stability(upload_samples)}\n")
+    if profiling():
+        cprint("\033[90mTook: " + " | ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()) + "\033[0m\n")
+    if adaptive:
+        for label, report in (("Download", download_report), ("Upload", upload_report)):
+            accuracy = f"±{report['ci95_percent']:.1f}%" if report["ci95_percent"] is not None else "unknown accuracy"
+            cprint(f"\033[90m{label}: {accuracy} after {report['seconds']:.1f}s / {report['megabytes']:.0f} MB ({report['stopped']})\033[0m")
+        cprint("")
+
+    if loaded_latency:
+        show_loaded_latency(loaded_latency)
+
+    breakdown = server_breakdown(instances) if len(instances) > 1 else None
+    if breakdown:
+        cprint("\033[1;32m--- Per Server ---\033[0m")
+        for srv in breakdown:
+            cprint(f"\033[1;33m{srv['sponsor']} ({srv['name']}):\033[0m Ping {srv['ping']:.2f} ms | "
+                   f"↓ {srv['download_mbps']:.2f} Mbps | ↑ {srv['upload_mbps']:.2f} Mbps")
+        cprint("")
+
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "full_scan": full_scan,
+        "isp": isp,
+        "ping": round(ping, 2),
+        "download_mbps": round(download_mbps, 2),
+        "upload_mbps": round(upload_mbps, 2)
+    }
+    if breakdown:
+        entry["servers"] = breakdown
+    if concurrency:
+        entry["concurrency"] = concurrency
+    if adaptive:
+        entry["adaptive"] = {"download": download_report, "upload": upload_report}
+    if loaded_latency:
+        entry["loaded_latency"] = loaded_latency
+    entry["samples"] = {
+        "interval_ms": int(SAMPLE_INTERVAL * 1000),
+        "download": encode_samples(download_samples),
+        "upload": encode_samples(upload_samples),
+    }
+    # where the time went, saved with the entry (and in the trace with --profile).
+    # saving is the one span that can't be in its own entry, it still shows up in --profile traces
+    entry["timings"] = timings
+
+    with span("save_history"):
+        append_entry(entry)
+    emit("result", **entry)
+    with span("analyze"):
+        try:
+            _, events = update_analysis(settings)
+        except (OSError, ValueError, KeyError) as e:
+            cprint(f"[WARN] Couldn't update the history analysis: {e}")
+            events = []
+    show_analysis_events(events)
+
+    if server_source == "cache-stale":
+        revalidate_in_background(speedtest.Speedtest, server_cache_key(st.config.get("client")))
+
+    return entry
+
+def run_lan_test(target, streams=4, duration=10, direction="both"):
+    from localtest.probe import probe_hosts
+    from localtest.lan import run_client as run_lan_client, parse_target as parse_lan_target
+    from localtest.history import append_entry
+    host, port = parse_lan_target(target)
+    cprint(f"Starting LAN throughput test against {target} ({streams} streams, {duration}s per phase)...\n")
+    latency = probe_hosts([host], count=4, interval=0.05, method="tcp", port=port)[host]
+
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=("Pushing bytes over the LAN", stop_event))
+    spinner_thread.start()
+    try:
+        results = run_lan_client(host, port, streams=streams, duration=duration, direction=direction)
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+
+    if results["errors"] and not any(k in results for k in ("download", "upload")):
+        cprint(f"\033[1;31m[ERROR]\033[0m LAN test failed: {results['errors'][0]}")
+        return None
+
+    download = results.get("download", {})
+    upload = results.get("upload", {})
+    ping = latency.get("avg_ms")
+
+    cprint("\n\033[1;32m--- LAN Test Results ---\033[0m")
+    cprint(f"\033[1;33mTarget:\033[0m {target}")
+    if ping is not None:
+        cprint(f"\033[1;33mPing:\033[0m {ping:.2f} ms")
+    for label, phase in (("Download", download), ("Upload", upload)):
+        if phase:
+            per_stream = ", ".join(f"{m:.0f}" for m in phase["streams_mbps"])
+            cprint(f"\033[1;33m{label}:\033[0m {phase['aggregate_mbps']:.2f} Mbps \033[90m(per stream: {per_stream})\033[0m")
+    for err in results["errors"]:
+        cprint(f"[WARN] {err}")
+    cprint("")
+
+    entry = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "full_scan": False,
+        "isp": "LAN",
+        "ping": round(ping, 2) if ping is not None else None,
+        "download_mbps": download.get("aggregate_mbps"),
+        "upload_mbps": upload.get("aggregate_mbps"),
+        "lan": {
+            "target": target,
+            "streams": streams,
+            "duration": duration,
+            "direction": direction,
+            "download_streams_mbps": download.get("streams_mbps"),
+            "upload_streams_mbps": upload.get("streams_mbps"),
+        },
+    }
+    append_entry(entry)
+    emit("result", **entry)
+    return entry
+
+def run_udp_test(target=None, rate=None, size=None, duration=None):
+    from localtest.lan import parse_target as parse_lan_target
+    from localtest.udp import UdpReflector, run_stream as run_udp_stream
+    settings = load_settings()
+    rate = rate or settings.get("udp_rate_pps", 1000)
+    size = size or settings.get("udp_packet_bytes", 200)
+    duration = duration or settings.get("udp_seconds", 10)
+    reflector = None
+    if target:
+        host, port = parse_lan_target(target)
+    else:
+        # no target, so bounce off our own reflector over loopback
+        reflector = UdpReflector("127.0.0.1", 0).start()
+        host, port = reflector.address
+        target = "loopback"
+    cprint(f"Starting UDP stream test against {target} ({rate} packets/s, {size} bytes each, {duration}s)...\n")
+
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=(f"Sending {int(rate * duration)} packets", stop_event))
+    spinner_thread.start()
+    try:
+        result = run_udp_stream(host, port, rate=rate, size=size, duration=duration)
+    except OSError as e:
+        result = {"error": str(e)}
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+        if reflector:
+            reflector.close()
+
+    if "error" in result:
+        cprint(f"\033[1;31m[ERROR]\033[0m UDP test failed: {result['error']}")
+        return None
+    if not result["received"]:
+        cprint(f"\033[1;31m[ERROR]\033[0m Nothing came back from {target}. Is 'localtest network serve' running there, and is UDP port {port} open?")
+        return None
+
+    cprint("\n\033[1;32m--- UDP Stream Results ---\033[0m")
+    cprint(f"\033[1;33mTarget:\033[0m {target}")
+    cprint(f"\033[1;33mPackets:\033[0m {result['sent']} sent, {result['received']} back | "
+           f"loss {result['loss_percent']}% (on the way there: {result['upstream_loss_percent']}%)")
+    cprint(f"\033[1;33mJitter:\033[0m ↑ {result['jitter_up_ms']:.3f} ms | ↓ {result['jitter_down_ms']:.3f} ms")
+    cprint(f"\033[1;33mRound trip:\033[0m p50 {result['rtt_p50_ms']:.3f} | p90 {result['rtt_p90_ms']:.3f} | "
+           f"p99 {result['rtt_p99_ms']:.3f} | max {result['rtt_max_ms']:.3f} ms")
+    cprint(f"\033[1;33mReordered:\033[0m {result['reordered']} ({result['reordered_percent']}%) | \033[1;33mDuplicates:\033[0m {result['duplicates']}")
+    if result["send_errors"]:
+        cprint(f"[WARN] {result['send_errors']} packets couldn't be sent (local buffers full), try a lower --rate.")
+    # roughly where calls start breaking up
+    if result["loss_percent"] > 1 or max(result["jitter_up_ms"], result["jitter_down_ms"]) > 30:
+        cprint("\033[90mThat much loss or jitter is enough for calls and games to stutter.\033[0m")
+    cprint("")
+
+    entry = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"), "target": target, **result}
+    emit("result", **entry)
+    return entry
+
+def run_lan_server(host="0.0.0.0", port=None):
+    from localtest.lan import LanServer, DEFAULT_PORT
+    from localtest.udp import UdpReflector
+    port = DEFAULT_PORT if port is None else port
+    server = LanServer((host, port))
+    reflector = UdpReflector(host, port).start() # same port number, over udp
+    cprint(f"\033[1;32mLAN test server listening on {host}:{port} (tcp and udp)\033[0m (Ctrl+C to stop)")
+    cprint(f"Run \033[1;33mlocaltest network run --target <this-ip>:{port}\033[0m or \033[1;33mlocaltest network udp --target <this-ip>:{port}\033[0m on another machine.")
+    try:
+        server.serve_forever()
+    finally:
+        reflector.close()
+        server.server_close()
+
+def run_monitor(args):
+    from localtest.monitor import Monitor, Scheduler
+    settings = load_settings()
+    hosts = [settings.get("ping_test_host", "8.8.8.8")]
+    extra = get_flag_value(args, "--hosts")
+    if extra:
+        hosts += [h.strip() for h in extra.split(",") if h.strip() and h.strip() not in hosts]
+
+    probe_interval = max(1, settings.get("monitor_probe_interval", 5))
+    speed_interval = settings.get("monitor_speed_interval_minutes", 60) * 60
+
+    def show_sample(sample):
+        emit("probe", **sample)
+        recent = sorted(monitor.buffer.recent("avg_ms"))
+        median = recent[len(recent) // 2] if recent else None
+        avg = f"{sample['avg_ms']:.2f} ms" if sample["avg_ms"] is not None else "timeout"
+        jitter = f"{sample['jitter_ms']:.2f} ms" if sample["jitter_ms"] is not None else "n/a"
+        median_text = f"{median:.2f} ms" if median is not None else "n/a"
+        cprint(f"[{sample['timestamp']}] {sample['host']} | ping {avg} | jitter {jitter} | "
+               f"loss {sample['packet_loss_percent']}% \033[90m(median of last {len(recent)}: {median_text})\033[0m")
+
+    def speed_job():
+        try:
+            run_speed_test(full_scan=False)
+        except Exception as e:
+            cprint(f"[WARN] Scheduled speed test failed: {e}")
+
+    monitor = Monitor(hosts, probe_interval=probe_interval, probe_count=3,
+                      buffer_size=settings.get("monitor_buffer_size", 720),
+                      flush_every=settings.get("monitor_flush_every", 60),
+                      on_sample=show_sample, method=settings.get("ping_method", "auto"),
+                      port=settings.get("ping_tcp_port", 443))
+    scheduler = Scheduler()
+    scheduler.every(probe_interval, monitor.probe, delay=0)
+    if speed_interval > 0:
+        scheduler.every(speed_interval, speed_job, jitter=0.2, delay=random.uniform(0, min(speed_interval, 60)))
+
+    cprint(f"\033[1;32mMonitoring {', '.join(hosts)} every {probe_interval}s\033[0m"
+           + (f", speed test about every {speed_interval // 60} min" if speed_interval > 0 else "")
+           + ". Ctrl+C to stop.\n")
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_exit) # service managers stop us with SIGTERM, still flush the buffer
+    try:
+        scheduler.run_forever()
+    finally:
+        monitor.close()
+
+def run_ping(host=None, count=None): # oh no google's going to googsteale your data
+    from localtest.probe import probe_hosts
+    settings = load_settings()
+    host = host or settings.get("ping_test_host", "8.8.8.8")
+    count = count or settings.get("ping_count", 4)
+
+    try:
+        return probe_hosts([host], count=count, method=settings.get("ping_method", "auto"), port=settings.get("ping_tcp_port", 443))[host]
+    except Exception as e:
+        return {"error": str(e)}
+
+def get_default_gateway():
+    os_name = platform.system().lower()
+    try:
+        if os_name == "linux" and os.path.exists("/proc/net/route"):
+            with open("/proc/net/route", "r") as f:
+                for line in f.readlines()[1:]:
+                    fields = line.split()
+                    # default route with the gateway flag set, address is little-endian hex
+                    if len(fields) > 3 and fields[1] == "00000000" and int(fields[3], 16) & 2:
+                        return ".".join(str(b) for b in int(fields[2], 16).to_bytes(4, "little"))
+        elif os_name == "windows":
+            p = subprocess.run(["ipconfig"], capture_output=True, text=True)
+            match = re.search(r"Default Gateway[.\s:]*(\d+\.\d+\.\d+\.\d+)", p.stdout)
+            if match:
+                return match.group(1)
+        else:
+            p = subprocess.run(["route", "-n", "get", "default"], capture_output=True, text=True)
+            match = re.search(r"gateway:\s*(\S+)", p.stdout)
+            if match:
+                return match.group(1)
+    except Exception:
+        pass
+    return None
+
+def ping_gateway():
+    gateway = get_default_gateway()
+    if not gateway:
+        return None
+    result = run_ping(host=gateway)
+    result["gateway"] = gateway
+    return result
+
+def wait_for_network(host, port, timeout=30):
+    # after the fixes bounce the interface, poll until the internet answers instead of sleeping and hoping
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return True
+        except ConnectionRefusedError:
+            return True # something answered, good enough
+        except OSError:
+            time.sleep(0.25)
+    return False
+
+def get_dns_servers():
+    os_name = platform.system().lower()
+    servers = []
+    try:
+        if os_name == "windows":
+            p = subprocess.run(["ipconfig", "/all"], capture_output=True, text=True)
+            matches = re.findall(r"DNS Servers[.\s:]*([\d\.\s\r\n:]+)", p.stdout)
+            if matches:
+                raw = matches[0].strip().splitlines() # please do not screenshot that out of context i beg
+                for line in raw:
+                    ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", line)
+                    if ip_match:
+                        servers.append(ip_match.group(1))
+            else:
+                lines = p.stdout.splitlines()
+                for i, line in enumerate(lines):
+                    if "DNS Servers" in line:
+                        j = i + 1
+                        while j < len(lines) and lines[j].strip():
+                            ip_match = re.search(r"(\d+\.\d+\.\d+\.\d+)", lines[j])
+                            if ip_match:
+                                servers.append(ip_match.group(1))
+                            j += 1
+        else:
+            if os.path.exists("/etc/resolv.conf"):
+                with open("/etc/resolv.conf", "r") as f:
+                    for ln in f:
+                        if ln.strip().startswith("nameserver"):
+                            parts = ln.split()
+                            if len(parts) >= 2:
+                                servers.append(parts[1].strip())
+            if not servers:
+                p = subprocess.run(["resolvectl", "status"], capture_output=True, text=True)
+                if p.returncode == 0:
+                    servers += re.findall(r"Current DNS Server: (\d+\.\d+\.\d+\.\d+)", p.stdout)
+    except Exception:
+        pass
+    return servers
+
+def build_suggestions(metrics):
+    suggestions = []
+    download = metrics.get("download_mbps")
+    upload = metrics.get("upload_mbps")
+    ping = metrics.get("ping")
+    packet_loss = metrics.get("packet_loss_percent")
+
+    suggestions.append("1) Used a wired (Ethernet) connection where possible. It's the best way to reduce latency.")
+    suggestions.append("2) Reboot your modem or router if possible. Most issues are resolved by a quick reboot of network gear.")
+    suggestions.append("3) Ensure other devices or apps aren't eating your connection (cloud backups, torrents, streaming).")
+
+    if download is not None:
+        if download < 5:
+            suggestions.append("Download speed is very low - check if you're on the correct ISP plan or contact your ISP. Also check for heavy background uploads.")
+        elif download < 50:
+            suggestions.append("Download speed is moderate - if you expected higher, try moving closer to the router, switching Wi-Fi bands (5GHz), or using Ethernet.")
+        else:
+            suggestions.append("Download speed looks good.")
+
+    if ping is not None:
+        if ping > 150:
+            suggestions.append("High ping detected - try switching to a closer server, use wired connection, or check for VPNs and background processes causing latency.")
+        elif ping > 60:
+            suggestions.append("Moderate latency - wired connection and moving your router to an open area may help.")
+        else:
+            suggestions.append("Latency is good.")
+
+    if packet_loss is not None:
+        if packet_loss > 1:
+            suggestions.append(f"Packet loss detected ({packet_loss}%) - this often indicates Wi-Fi interference, bad cabling, or upstream ISP issues.")
+        else:
+            suggestions.append("No significant packet loss detected.")
+
+    gateway = metrics.get("gateway_ping_ms")
+    if gateway is not None and gateway > 20:
+        suggestions.append(f"Your router takes {gateway:.1f} ms to answer - that part is your own network (usually Wi-Fi), not your ISP.")
+
+    jitter = metrics.get("jitter_ms")
+    if jitter is not None and jitter > 30:
+        suggestions.append(f"High jitter detected ({jitter:.1f} ms) - calls and games will stutter. This is usually Wi-Fi congestion or a busy uplink.")
+
+    dns = metrics.get("dns_servers", [])
+    if dns:
+        masked_dns = [mask_ip(d) for d in dns]
+        suggestions.append(f"Your DNS servers: {', '.join(masked_dns)} - run 'localtest network dns' to see if 1.1.1.1 (Cloudflare), 8.8.8.8 (Google) or another resolver is actually faster for you.")
+    
+    suggestions.append("Advanced: Make sure you update router firmware, ensure drivers for your network network adapter are up-to-date, consider changing QoS settings on your router, or try changing your router channel to reduce Wi-Fi interference.")
+    suggestions.append("If multiple tests show consistent low throughput, contact your ISP and provide the speed test timestamps and results.")
+
+    return suggestions
+
+def run_dns_benchmark(args):
+    from localtest.dns import benchmark_resolvers, parse_resolver
+    settings = load_settings()
+    detected = get_dns_servers()
+    candidates = [c.strip() for c in settings.get("dns_candidates", "").split(",") if c.strip()]
+    extra = get_flag_value(args, "--resolvers")
+    if extra:
+        candidates += [c.strip() for c in extra.split(",") if c.strip()]
+
+    resolvers = detected + [c for c in candidates if c not in detected]
+    try:
+        for resolver in resolvers:
+            parse_resolver(resolver)
+    except ValueError as e:
+        cprint(f"\033[1;31m[ERROR]\033[0m {e}")
+        return []
+    if not resolvers:
+        cprint("No resolvers to test. Add some with --resolvers 1.1.1.1,8.8.8.8")
+        return []
+
+    cprint(f"Benchmarking {len(resolvers)} DNS resolvers...\n")
+    stop_event = threading.Event()
+    spinner_thread = threading.Thread(target=spinner, args=("Sending DNS queries", stop_event))
+    spinner_thread.start()
+    try:
+        results = benchmark_resolvers(resolvers, rounds=settings.get("dns_rounds", 3))
+    finally:
+        stop_event.set()
+        spinner_thread.join()
+
+    cprint("\033[1;32m--- DNS Resolver Results (fastest first) ---\033[0m")
+    for i, r in enumerate(results, start=1):
+        emit("dns_result", rank=i, yours=r["resolver"] in detected, **r)
+        name = mask_ip(r["resolver"]) + " (yours)" if r["resolver"] in detected else r["resolver"]
+        if "error" in r:
+            cprint(f"{i}. \033[1;31m{name}\033[0m - {r['error']}")
+            continue
+        c, u = r["cached"], r["uncached"]
+        cprint(f"{i}. \033[1;33m{name}\033[0m")
+        cprint(f"    cached:   p50 {_ms(c['p50_ms'])} | p95 {_ms(c['p95_ms'])} | p99 {_ms(c['p99_ms'])} | timeouts {c['timeouts']}/{c['queries']}")
+        cprint(f"    uncached: p50 {_ms(u['p50_ms'])} | p95 {_ms(u['p95_ms'])} | p99 {_ms(u['p99_ms'])} | timeouts {u['timeouts']}/{u['queries']}")
+
+    best = results[0]
+    if "error" not in best:
+        if best["resolver"] in detected:
+            cprint("\n[OK] Your current DNS resolver is already the fastest one tested.")
+        else:
+            cprint(f"\nFastest resolver here is \033[1;32m{best['resolver']}\033[0m - consider switching to it.")
+    return results
+
+def _ms(value):
+    return f"{value:.2f} ms" if value is not None else "n/a"
+
+def build_fix_commands():
+    os_name = platform.system().lower()
+    commands = []
+    if os_name == "windows":
+        commands = [
+            ("Flush DNS cache (Windows)", "ipconfig /flushdns"),
+            ("Release DHCP (Windows)", "ipconfig /release"),
+            ("Renew DHCP (Windows)", "ipconfig /renew"),
+        ] # afaik these are safe to run? ima get sued :skulk:
+    elif os_name == "darwin":
+        # stinky macOS
+        commands = [
+            ("Flush DNS (macOS)", "sudo dscacheutil -flushcache; sudo killall -HUP mDNSResponder"),
+            ("Restart network service (macOS)", "sudo ifconfig en0 down; sleep 1; sudo ifconfig en0 up"),
+        ]
+    else:
+        # assume Linux-ish os
+        commands = [
+            ("Flush DNS (systemd-resolved)", "sudo systemd-resolve --flush-caches"),
+            ("Restart NetworkManager (Linux)", "sudo systemctl restart NetworkManager"),
+            ("Restart network interface (Linux) - may vary", "sudo ip link set $(ip route get 8.8.8.8 | awk '{cprint $5; exit}') down; sleep 1; sudo ip link set $(ip route get 8.8.8.8 | awk 'cprintt $5; exit}') up"),
+        ]
+    return commands
+
+def improve_network(apply=False):
+    from localtest.tasks import run_graph
+    cprint("\n\033[1;34m--- Running network improve diagnostic ---\033[0m\n")
+    settings = load_settings()
+    timings = {}
+
+    def timed(func):
+        def task(done):
+            with span(func.__name__, timings):
+                return func()
+        return task
+
+    def measure(done):
+        # throughput goes last so the pings above aren't measuring our own download
+        if isinstance(done["servers"], Exception):
+            raise done["servers"]
+        return run_speed_test(full_scan=False, prepared=done["servers"])
+
+    # dns lookup and both pings overlap with picking the server, the speed test waits for all of them
+    tasks = {
+        "servers": (lambda done: find_servers(settings), ()),
+        "get_dns_servers": (timed(get_dns_servers), ()),
+        "run_ping": (timed(run_ping), ()),
+        "ping_gateway": (timed(ping_gateway), ()),
+        "speed": (measure, ("servers", "run_ping", "ping_gateway")),
+    }
+
+    def show(name, result):
+        # printed the moment each one lands, \r\033[K clears whatever spinner is on the line
+        emit("task_done", task=name, seconds=timings.get(name), error=str(result) if isinstance(result, Exception) else None)
+        if isinstance(result, Exception):
+            cprint(f"\r\033[K\033[1;31m[WARN]\033[0m {name} failed: {result}")
+        elif name == "get_dns_servers":
+            cprint(f"\r\033[KDNS servers: {', '.join(mask_ip(d) for d in result) if result else 'Could not detect'}")
+        elif name == "run_ping":
+            if result.get("avg_ms") is not None:
+                cprint(f"\r\033[KPing (avg): {result['avg_ms']:.2f} ms | min/max {result['min_ms']:.2f} / {result['max_ms']:.2f} ms ({result['method']})\n"
+                       f"Jitter: {result['jitter_ms']:.2f} ms | Std dev: {result['stddev_ms']:.2f} ms | Packet loss: {result['packet_loss_percent']}%")
+            else:
+                cprint(f"\r\033[KPing: no replies ({result.get('error', 'timed out')})")
+        elif name == "ping_gateway":
+            if result is None:
+                cprint("\r\033[KRouter: could not detect the default gateway")
+            elif result.get("avg_ms") is not None:
+                cprint(f"\r\033[KRouter {mask_ip(result['gateway'])}: {result['avg_ms']:.2f} ms avg, {result['packet_loss_percent']}% loss")
+            else:
+                cprint(f"\r\033[KRouter {mask_ip(result['gateway'])}: no replies")
+        elif name == "servers":
+            server = result["st"].results.server or {}
+            cprint(f"\r\033[KServer: {server.get('sponsor', '?')} ({server.get('name', '?')}) [{result['source']}]")
+
+    cprint("\033[1;32m--- Diagnostics ---\033[0m")
+    done = run_graph(tasks, on_done=show)
+    baseline = done["speed"]
+    if not baseline or isinstance(baseline, Exception):
+        cprint("Couldn't get baseline speed test; aborting improve routine.")
+        return
+
+    ping_results = done["run_ping"] if isinstance(done["run_ping"], dict) else {}
+    gateway_results = done["ping_gateway"] if isinstance(done["ping_gateway"], dict) else None
+    dns_servers = done["get_dns_servers"] if isinstance(done["get_dns_servers"], list) else []
+    metrics = {
+        "download_mbps": baseline.get("download_mbps"),
+        "upload_mbps": baseline.get("upload_mbps"),
+        "ping": baseline.get("ping"),
+        "isp": baseline.get("isp"),
+        "packet_loss_percent": None,
+        "jitter_ms": None,
+        "gateway_ping_ms": gateway_results.get("avg_ms") if gateway_results else None,
+        "dns_servers": [mask_ip(d) for d in dns_servers]
+    }
+    if ping_results.get("avg_ms") is not None:
+        metrics["packet_loss_percent"] = ping_results.get("packet_loss_percent")
+        metrics["ping"] = ping_results.get("avg_ms") or metrics["ping"]
+        metrics["jitter_ms"] = ping_results.get("jitter_ms")
+
+    cprint("\n\033[1;32m--- Suggestions to improve speeds ---\033[0m")
+    suggestions = build_suggestions(metrics)
+    emit("diagnostics", metrics=metrics, ping=ping_results, gateway=gateway_results, suggestions=suggestions, timings=timings)
+    for s in suggestions:
+        cprint(f"- {s}")
+
+    if apply:
+        cprint("\n\033[1;33mApply mode requested. The script will attempt common fixes (may require admin/sudo).\033[0m")
+        fixes = build_fix_commands()
+        cprint("Planned actions:")
+        for i, (desc, cmd) in enumerate(fixes, start=1):
+            cprint(f"  {i}. {desc} -> {cmd}")
+
+        flush_output()
+        confirm = input("\nProceed to run the above commands? This may temporarily disconnect your network. [y/N]: ").strip().lower()
+        if confirm != "y":
+            cprint("Aborting apply actions.")
+            return
+        
+        for desc, cmd in fixes:
+            cprint(f"\n\033[1;34mRunning:\033[0m {desc}\n-> {cmd}")
+            try:
+                p = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=120)
+                if p.returncode == 0:
+                    cprint(f"[OK] {desc} completed.")
+                    if p.stdout:
+                        cprint(p.stdout.strip())
+                else:
+                    cprint(f"[WARN] {desc} returned non-zero exit code {p.returncode}.")
+                    if p.stdout:
+                        cprint(f"STDOUT: {p.stdout.strip()}")
+                    if p.stderr:
+                        cprint(f"STDERR: {p.stderr.strip()}")
+            except Exception as e:
+                cprint(f"[ERROR] Failed to run {desc}: {e}")
+
+        cprint("\n\033[1;32mApply actions completed. Re-running a quick speed test to show updated results...\033[0m")
+        if not wait_for_network(settings.get("ping_test_host", "8.8.8.8"), settings.get("ping_tcp_port", 443)):
+            cprint("[WARN] Network still isn't answering after 30s, trying the re-test anyway.")
+        # same server as the baseline so the numbers compare, and no full server discovery again
+        run_speed_test(full_scan=False, server=done["servers"]["st"].results.server)
+    else:
+        cprint("\nTo automatically try common fixes, re-run with the flag \033[1;33m-a\033[0m or \033[1;33m--apply\033[0m (you will be asked to confirm before any changes).")
@@ -0,0 +1,102 @@
+import sys
+import json
+import time
+import atexit
+import threading
+
+from localtest.settings import ANSI_ESCAPE
+
+OUTPUT_MODES = ("text", "json", "ndjson")
+
+class BufferedWriter:
+    # every line of output goes through here; pipes get big batched writes, terminals still see each line
+    def __init__(self, stream, limit=64 * 1024):
+        self.stream = stream
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.lock = threading.RLock()
+        try:
+            self.line_buffered = stream.isatty()
+        except (AttributeError, ValueError):
+            self.line_buffered = False
+
+    def write(self, text):
+        with self.lock:
+            self.parts.append(text)
+            self.size += len(text)
+            if self.line_buffered or self.size >= self.limit:
+                self._flush()
+
+    def _flush(self):
+        if self.parts:
+            self.stream.write("".join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.stream.flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+_state = {"mode": "text", "stdout": None, "stderr": None, "events": 0, "closed": False}
+
+def _stdout():
+    if _state["stdout"] is None:
+        _state["stdout"] = BufferedWriter(sys.stdout)
+        atexit.register(close)
+    return _state["stdout"]
+
+def _stderr():
+    if _state["stderr"] is None:
+        _state["stderr"] = BufferedWriter(sys.stderr)
+    return _state["stderr"]
+
+def set_mode(mode):
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {mode}")
+    _state["mode"] = mode
+
+def get_mode():
+    return _state["mode"]
+
+def machine_readable():
+    return _state["mode"] != "text"
+
+def write_text(text):
+    # in json/ndjson mode stdout belongs to the events, so human text goes to stderr without colors
+    if _state["mode"] == "text":
+        _stdout().write(text + "\n")
+    else:
+        _stderr().write(ANSI_ESCAPE.sub("", text) + "\n")
+
+def emit(event, **fields):
+    mode = _state["mode"]
+    if mode == "text":
+        return
+    record = {"event": event, "ts": round(time.time(), 3)}
+    record.update(fields)
+    line = json.dumps(record, separators=(",", ":"), ensure_ascii=False)
+    writer = _stdout()
+    if mode == "ndjson":
+        writer.write(line + "\n")
+    else:
+        # one JSON array, written as we go so huge outputs never sit in memory
+        with writer.lock:
+            prefix = "[\n" if _state["events"] == 0 else ",\n"
+            _state["events"] += 1
+            writer.write(prefix + line)
+
+def flush():
+    if _state["stdout"] is not None:
+        _state["stdout"].flush()
+    if _state["stderr"] is not None:
+        _state["stderr"].flush()
+
+def close():
+    if _state["closed"]:
+        return
+    _state["closed"] = True
+    if _state["mode"] == "json":
+        _stdout().write("[]\n" if _state["events"] == 0 else "\n]\n")
+    flush()
@@ -0,0 +1,308 @@
+import os
+import time
+import math
+import socket
+import struct
+import asyncio
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMPV6_ECHO_REQUEST = 128
+ICMPV6_ECHO_REPLY = 129
+
+DEFAULT_TCP_PORT = 443
+
+def parse_host_port(value, default_port):
+    # "host", "host:port", "[ipv6]" or "[ipv6]:port" (a bare ipv6 keeps default_port), ValueError for anything else
+    value = value.strip()
+    host, port = value, str(default_port)
+    if value.startswith("["):
+        host, _, rest = value[1:].partition("]")
+        if rest:
+            if not rest.startswith(":"):
+                raise ValueError(f"Bad address: {value}")
+            port = rest[1:]
+    elif value.count(":") == 1:
+        host, port = value.split(":")
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"Bad address: {value}")
+    return host, int(port)
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _echo_packet(family, ident, seq, payload):
+    kind = ICMPV6_ECHO_REQUEST if family == socket.AF_INET6 else ICMP_ECHO_REQUEST
+    header = struct.pack("!BBHHH", kind, 0, 0, ident, seq)
+    if family == socket.AF_INET6:
+        return header + payload # the kernel fills in the ICMPv6 checksum
+    return struct.pack("!BBHHH", kind, 0, _checksum(header + payload), ident, seq) + payload
+
+def icmp_available(family=socket.AF_INET):
+    # unprivileged "ping sockets" (linux with net.ipv4.ping_group_range, macOS) don't need root
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        s = socket.socket(family, socket.SOCK_DGRAM, proto)
+    except OSError:
+        return False
+    s.close()
+    return True
+
+class _EchoProtocol(asyncio.DatagramProtocol):
+    def __init__(self, family):
+        self.family = family
+        self.waiting = {}
+
+    def datagram_received(self, data, addr):
+        # macOS hands back the IPv4 header too, linux doesn't
+        if self.family == socket.AF_INET and len(data) >= 20 and data[0] >> 4 == 4:
+            data = data[(data[0] & 0x0F) * 4:]
+        if len(data) < 8:
+            return
+        kind, _, _, _, seq = struct.unpack("!BBHHH", data[:8])
+        if kind not in (ICMP_ECHO_REPLY, ICMPV6_ECHO_REPLY):
+            return
+        fut = self.waiting.pop(seq, None)
+        if fut is not None and not fut.done():
+            fut.set_result(time.perf_counter_ns())
+
+    def error_received(self, exc):
+        for fut in self.waiting.values():
+            if not fut.done():
+                fut.set_exception(exc)
+        self.waiting.clear()
+
+async def _resolve(host, family=socket.AF_UNSPEC):
+    loop = asyncio.get_running_loop()
+    infos = await loop.getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM)
+    infos.sort(key=lambda info: info[0] != socket.AF_INET) # prefer IPv4, it's what everyone's ping does
+    family, _, _, _, sockaddr = infos[0]
+    return family, sockaddr[0]
+
+async def _icmp_samples(family, address, count, interval, timeout):
+    loop = asyncio.get_running_loop()
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+    sock.setblocking(False)
+    transport, protocol = await loop.create_datagram_endpoint(lambda: _EchoProtocol(family), sock=sock)
+    samples = []
+    ident = os.getpid() & 0xFFFF
+    payload = b"localtest" + bytes(23)
+    try:
+        for seq in range(1, count + 1):
+            fut = loop.create_future()
+            protocol.waiting[seq] = fut
+            sent = time.perf_counter_ns()
+            transport.sendto(_echo_packet(family, ident, seq, payload), (address, 0))
+            try:
+                received = await asyncio.wait_for(fut, timeout)
+                samples.append((received - sent) / 1_000_000)
+            except (asyncio.TimeoutError, OSError):
+                protocol.waiting.pop(seq, None)
+                samples.append(None)
+            if seq < count:
+                await asyncio.sleep(interval)
+    finally:
+        transport.close()
+    return samples
+
+async def _tcp_samples(family, address, port, count, interval, timeout):
+    samples = []
+    for seq in range(1, count + 1):
+        sent = time.perf_counter_ns()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(address, port, family=family), timeout)
+            rtt = (time.perf_counter_ns() - sent) / 1_000_000
+            writer.close()
+            samples.append(rtt)
+        except ConnectionRefusedError:
+            # an RST still took a full round trip, so it's a perfectly good sample
+            samples.append((time.perf_counter_ns() - sent) / 1_000_000)
+        except (asyncio.TimeoutError, OSError):
+            samples.append(None)
+        if seq < count:
+            await asyncio.sleep(interval)
+    return samples
+
+def summarize(samples):
+    rtts = [s for s in samples if s is not None]
+    sent = len(samples)
+    result = {
+        "sent": sent,
+        "received": len(rtts),
+        "packet_loss_percent": round(100 * (sent - len(rtts)) / sent, 2) if sent else None,
+        "min_ms": None,
+        "avg_ms": None,
+        "max_ms": None,
+        "stddev_ms": None,
+        "jitter_ms": None,
+        "samples_ms": [round(s, 3) if s is not None else None for s in samples],
+    }
+    if not rtts:
+        return result
+    avg = sum(rtts) / len(rtts)
+    result["min_ms"] = round(min(rtts), 3)
+    result["avg_ms"] = round(avg, 3)
+    result["max_ms"] = round(max(rtts), 3)
+    result["stddev_ms"] = round(math.sqrt(sum((r - avg) ** 2 for r in rtts) / len(rtts)), 3)
+    diffs = [abs(b - a) for a, b in zip(rtts, rtts[1:])]
+    result["jitter_ms"] = round(sum(diffs) / len(diffs), 3) if diffs else 0.0
+    return result
+
+async def probe_host(host, count=4, interval=0.2, timeout=1.0, method="auto", port=DEFAULT_TCP_PORT):
+    try:
+        family, address = await _resolve(host)
+    except OSError as e:
+        return {"host": host, "error": str(e)}
+
+    if method not in ("auto", "icmp", "tcp"):
+        raise ValueError(f"Unknown probe method: {method}")
+    use_icmp = method == "icmp" or (method == "auto" and icmp_available(family))
+    try:
+        if use_icmp:
+            samples = await _icmp_samples(family, address, count, interval, timeout)
+        else:
+            samples = await _tcp_samples(family, address, port, count, interval, timeout)
+    except OSError as e:
+        if method != "auto" or not use_icmp:
+            return {"host": host, "error": str(e)}
+        use_icmp = False
+        samples = await _tcp_samples(family, address, port, count, interval, timeout)
+
+    result = summarize(samples)
+    result["host"] = host
+    result["address"] = address
+    result["method"] = "icmp" if use_icmp else f"tcp:{port}"
+    return result
+
+async def probe_hosts_async(hosts, **kwargs):
+    results = await asyncio.gather(*(probe_host(host, **kwargs) for host in hosts))
+    return {r["host"]: r for r in results}
+
+def probe_hosts(hosts, **kwargs):
+    return asyncio.run(probe_hosts_async(hosts, **kwargs))
+
+# (grade, worst median increase in ms) - same buckets the popular bufferbloat tests use
+BUFFERBLOAT_GRADES = (("A+", 5), ("A", 30), ("B", 60), ("C", 200), ("D", 400))
+
+def bufferbloat_grade(increase_ms):
+    if increase_ms is None:
+        return None
+    for grade, limit in BUFFERBLOAT_GRADES:
+        if increase_ms < limit:
+            return grade
+    return "F"
+
+def _percentile(ordered, p):
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+def latency_stats(samples):
+    rtts = sorted(s for s in samples if s is not None)
+    stats = {
+        "sent": len(samples),
+        "received": len(rtts),
+        "packet_loss_percent": round(100 * (len(samples) - len(rtts)) / len(samples), 2) if samples else None,
+    }
+    if rtts:
+        stats.update({"p50_ms": _percentile(rtts, 0.5), "p90_ms": _percentile(rtts, 0.9),
+                      "p99_ms": _percentile(rtts, 0.99), "max_ms": round(rtts[-1], 2)})
+    return stats
+
+class LatencyProbe:
+    # pings one host at a fixed rate on its own thread + event loop while the speed test runs,
+    # filing each sample under whatever phase was current when it was sent.
+    # probes don't wait for each other, so a 500ms bloated reply doesn't slow the probe rate down
+    def __init__(self, host, interval=0.1, timeout=2.0, method="auto", port=DEFAULT_TCP_PORT):
+        self.host = host
+        self.interval = interval
+        self.timeout = timeout
+        self.method = method
+        self.port = port
+        self.phase = "idle"
+        self.series = {}
+        self.used_method = None
+        self.error = None
+        self._stopping = False
+        self._thread = None
+
+    def start(self):
+        import threading
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._run()), daemon=True)
+        self._thread.start()
+        return self
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def stop(self):
+        self._stopping = True
+        if self._thread is not None:
+            self._thread.join()
+        # each sample is (send index, rtt), put them back in send order
+        return {phase: [rtt for _, rtt in sorted(samples)] for phase, samples in self.series.items()}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            family, address = await _resolve(self.host)
+        except OSError as e:
+            self.error = str(e)
+            return
+        use_icmp = self.method == "icmp" or (self.method == "auto" and icmp_available(family))
+        transport = protocol = None
+        if use_icmp:
+            proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+            sock = socket.socket(family, socket.SOCK_DGRAM, proto)
+            sock.setblocking(False)
+            transport, protocol = await loop.create_datagram_endpoint(lambda: _EchoProtocol(family), sock=sock)
+        self.used_method = "icmp" if use_icmp else f"tcp:{self.port}"
+
+        ident = os.getpid() & 0xFFFF
+        payload = b"localtest" + bytes(23)
+
+        async def one(index, phase):
+            sent = time.perf_counter_ns()
+            rtt = None
+            try:
+                if use_icmp:
+                    seq = index & 0xFFFF
+                    fut = loop.create_future()
+                    protocol.waiting[seq] = fut
+                    transport.sendto(_echo_packet(family, ident, seq, payload), (address, 0))
+                    try:
+                        received = await asyncio.wait_for(fut, self.timeout)
+                        rtt = (received - sent) / 1_000_000
+                    finally:
+                        protocol.waiting.pop(seq, None)
+                else:
+                    try:
+                        _, writer = await asyncio.wait_for(asyncio.open_connection(address, self.port, family=family), self.timeout)
+                        rtt = (time.perf_counter_ns() - sent) / 1_000_000
+                        writer.close()
+                    except ConnectionRefusedError:
+                        rtt = (time.perf_counter_ns() - sent) / 1_000_000
+            except (asyncio.TimeoutError, OSError):
+                pass
+            self.series.setdefault(phase, []).append((index, rtt))
+
+        pending = set()
+        index = 0
+        next_tick = loop.time()
+        try:
+            while not self._stopping:
+                index += 1
+                task = loop.create_task(one(index, self.phase))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                next_tick += self.interval
+                await asyncio.sleep(max(0.0, next_tick - loop.time()))
+            if pending:
+                await asyncio.wait(pending)
+        finally:
+            if transport is not None:
+                transport.close()
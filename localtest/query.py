@@ -0,0 +1,276 @@
+import os
+import json
+import math
+import datetime
+
+from localtest.history import HISTORY_DIR, _HistoryLock, open_history, iter_entries, iter_after, cursor_is_valid
+
+METRICS = ("download_mbps", "upload_mbps", "ping")
+WINDOWS = ("hour", "day", "week", "month", "all")
+PERCENTILES = (50, 95, 99)
+
+ROLLUP_FILE = "rollups.json"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# log-spaced buckets, so percentiles come out within ~1% and memory doesn't grow with the history
+SKETCH_ACCURACY = 0.01
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+class Sketch:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.zeros = 0
+        self.bins = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+        else:
+            key = math.ceil(math.log(value) / _LOG_GAMMA)
+            self.bins[key] = self.bins.get(key, 0) + 1
+
+    def merge(self, other):
+        if not other.count:
+            return self
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self.zeros += other.zeros
+        for key, n in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + n
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        rank = p / 100 * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                value = 2 * _GAMMA ** key / (_GAMMA + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self):
+        out = {"count": self.count, "min": self.min, "max": self.max, "mean": self.mean()}
+        for p in PERCENTILES:
+            out[f"p{p}"] = self.percentile(p)
+        return out
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.total, "min": self.min, "max": self.max,
+                "zeros": self.zeros, "bins": {str(k): n for k, n in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls()
+        sketch.count = data["count"]
+        sketch.total = data["sum"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.zeros = data["zeros"]
+        sketch.bins = {int(k): n for k, n in data["bins"].items()}
+        return sketch
+
+def _new_bucket():
+    return {metric: Sketch() for metric in METRICS}
+
+def _add_entry(bucket, entry):
+    for metric in METRICS:
+        value = entry.get(metric)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            bucket[metric].add(float(value))
+
+def normalize_timestamp(value, end=False):
+    # lets people type "2024-05-01" instead of the full "2024-05-01 00:00:00"
+    if value is None:
+        return None
+    value = value.strip()
+    if len(value) == 10:
+        return value + (" 23:59:59" if end else " 00:00:00")
+    if len(value) == 16:
+        return value + (":59" if end else ":00")
+    return value
+
+def window_key(timestamp, window):
+    if window == "all":
+        return "all"
+    if window == "hour":
+        return timestamp[:13]
+    if window == "day":
+        return timestamp[:10]
+    if window == "month":
+        return timestamp[:7]
+    if window == "week":
+        year, week, _ = datetime.datetime.strptime(timestamp[:10], "%Y-%m-%d").isocalendar()
+        return f"{year}-W{week:02d}"
+    raise ValueError(f"Unknown window: {window}")
+
+def window_bounds(key, window):
+    if window == "hour":
+        start = datetime.datetime.strptime(key, "%Y-%m-%d %H")
+        end = start + datetime.timedelta(hours=1)
+    elif window == "day":
+        start = datetime.datetime.strptime(key, "%Y-%m-%d")
+        end = start + datetime.timedelta(days=1)
+    elif window == "week":
+        start = datetime.datetime.strptime(key + "-1", "%G-W%V-%u")
+        end = start + datetime.timedelta(weeks=1)
+    elif window == "month":
+        start = datetime.datetime.strptime(key, "%Y-%m")
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        return None, None
+    return start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT)
+
+def matches(entry, isp=None, scan=None):
+    if isp is not None and isp.lower() not in str(entry.get("isp", "")).lower():
+        return False
+    if scan == "full" and not entry.get("full_scan"):
+        return False
+    if scan == "quick" and entry.get("full_scan"):
+        return False
+    return True
+
+def query_entries(since=None, until=None, isp=None, scan=None, directory=HISTORY_DIR):
+    for entry in iter_entries(since=since, until=until, directory=directory):
+        if matches(entry, isp, scan):
+            yield entry
+
+def _rollup_path(directory):
+    return os.path.join(directory, ROLLUP_FILE)
+
+def _load_rollups(directory):
+    try:
+        with open(_rollup_path(directory), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_rollups(directory, rollups):
+    # callers hold the history lock, the pid in the name keeps a stray writer from sharing the tmp file anyway
+    tmp_path = _rollup_path(directory) + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(rollups, f, separators=(",", ":"))
+    os.replace(tmp_path, _rollup_path(directory))
+
+def _scan(buckets, window, since, until, isp, scan, directory):
+    for entry in query_entries(since, until, isp, scan, directory):
+        ts = entry.get("timestamp")
+        if not ts:
+            continue
+        key = window_key(ts, window)
+        if key not in buckets:
+            buckets[key] = _new_bucket()
+        _add_entry(buckets[key], entry)
+
+def _refresh(cached, window, isp, scan, directory):
+    # feeds everything written after the cached cursor into the cached windows, returns whether anything moved.
+    # only windows that got new entries are decoded and summarized again, the rest stay as stored
+    start = cached["cursor"]
+    touched = {}
+    for entry, cursor in iter_after(start, directory):
+        cached["cursor"] = cursor
+        ts = entry.get("timestamp")
+        if not ts or not matches(entry, isp, scan):
+            continue
+        key = window_key(ts, window)
+        if key not in touched:
+            stored = cached["buckets"].get(key)
+            touched[key] = {metric: Sketch.from_dict(stored[metric]) for metric in METRICS} if stored else _new_bucket()
+        _add_entry(touched[key], entry)
+    for key, bucket in touched.items():
+        cached["buckets"][key] = {metric: bucket[metric].to_dict() for metric in METRICS}
+        cached["summaries"][key] = {metric: bucket[metric].summary() for metric in METRICS}
+    return cached["cursor"] != start
+
+def _cached_summaries(cache_key, window, isp, scan, bounded, directory):
+    # the cache holds every window up to a history position (like analysis.py), so it stays right when
+    # entries share a second or the clock steps back, and a warm query only reads what came after it
+    try:
+        open_history(directory)
+        with _HistoryLock(directory):
+            rollups = _load_rollups(directory)
+            cached = rollups.get(cache_key)
+            if cached is None or "summaries" not in cached or not cursor_is_valid(cached["cursor"], directory):
+                if bounded:
+                    return None # not worth reading the whole history just to answer a range, a plain scan does it
+                cached = {"cursor": None, "buckets": {}, "summaries": {}}
+            if _refresh(cached, window, isp, scan, directory):
+                rollups[cache_key] = cached
+                _save_rollups(directory, rollups)
+            return cached["summaries"]
+    except OSError:
+        return None # read-only share, nowhere to keep a cache
+
+# returns {window_key: {metric: summary}} from one streaming pass; windows are cached as rollups
+# so repeated queries only read entries saved since the last one
+def aggregate(window="day", since=None, until=None, isp=None, scan=None, use_cache=True, directory=HISTORY_DIR):
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window: {window}")
+    buckets = {}
+
+    if window == "all" or not use_cache:
+        _scan(buckets, window, since, until, isp, scan, directory)
+        return _summarize(buckets)
+
+    cache_key = f"{window}|{(isp or '').lower()}|{scan or ''}"
+    summaries = _cached_summaries(cache_key, window, isp, scan, since is not None or until is not None, directory)
+    if summaries is None:
+        _scan(buckets, window, since, until, isp, scan, directory)
+        return _summarize(buckets)
+
+    # any cached window fully inside [since, until] is reused as is and only the edges need a raw scan,
+    # the edges never share a window with the cached ones so the two just sit side by side
+    until_end = _after(until) if until is not None else None
+    usable = []
+    for key in summaries:
+        start, end = window_bounds(key, window)
+        if (since is None or start >= since) and (until_end is None or end <= until_end):
+            usable.append(key)
+    usable.sort()
+
+    if usable:
+        if since is not None:
+            _scan(buckets, window, since, _before(window_bounds(usable[0], window)[0]), isp, scan, directory)
+        if until is not None:
+            _scan(buckets, window, window_bounds(usable[-1], window)[1], until, isp, scan, directory)
+    else:
+        _scan(buckets, window, since, until, isp, scan, directory)
+    result = _summarize(buckets)
+    result.update((key, summaries[key]) for key in usable)
+    return {key: result[key] for key in sorted(result)}
+
+def _shift(timestamp, seconds):
+    moment = datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT) + datetime.timedelta(seconds=seconds)
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+def _before(timestamp):
+    return _shift(timestamp, -1)
+
+def _after(timestamp):
+    return _shift(timestamp, 1)
+
+def _summarize(buckets):
+    return {key: {metric: buckets[key][metric].summary() for metric in METRICS} for key in sorted(buckets)}
+
+def clear_rollups(directory=HISTORY_DIR):
+    try:
+        os.unlink(_rollup_path(directory))
+    except FileNotFoundError:
+        pass
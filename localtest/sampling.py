@@ -0,0 +1,142 @@
+import sys
+import time
+import base64
+import threading
+from array import array
+
+SAMPLE_INTERVAL = 0.1
+
+class ByteCounter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.value += n
+
+class _CountingResponse:
+    def __init__(self, response, counter):
+        self._response = response
+        self._counter = counter
+
+    def read(self, *args):
+        data = self._response.read(*args)
+        self._counter.add(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+class CountingOpener:
+    # sits in front of speedtest-cli's urllib opener and counts bytes as they move,
+    # so we can watch throughput while download()/upload() are still running
+    def __init__(self, opener, counter=None):
+        self._opener = opener
+        self.counter = counter or ByteCounter()
+
+    def open(self, request, *args, **kwargs):
+        counter = self.counter
+        data = getattr(request, "data", None)
+        if data is not None and hasattr(data, "read"):
+            # an upload: count the body going out, never the reply, and wrap a reused body only once
+            if not getattr(data, "_localtest_counted", False):
+                read = data.read
+
+                def counting_read(*a):
+                    chunk = read(*a)
+                    counter.add(len(chunk))
+                    return chunk
+
+                data.read = counting_read
+                data._localtest_counted = True
+            return self._opener.open(request, *args, **kwargs)
+        return _CountingResponse(self._opener.open(request, *args, **kwargs), counter)
+
+    def __getattr__(self, name):
+        return getattr(self._opener, name)
+
+def attach_counter(st, counter):
+    if not isinstance(st._opener, CountingOpener):
+        st._opener = CountingOpener(st._opener)
+    st._opener.counter = counter
+
+class ThroughputSampler:
+    def __init__(self, counter, interval=SAMPLE_INTERVAL, clock=time.perf_counter, on_sample=None):
+        self.counter = counter
+        self.on_sample = on_sample
+        self.interval = interval
+        self.clock = clock
+        self.samples = array("f")
+        self.current_mbps = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        last_bytes = self.counter.value
+        last_time = self.clock()
+        next_tick = last_time + self.interval
+        while not self._stop.wait(max(0.0, next_tick - self.clock())):
+            now = self.clock()
+            current = self.counter.value
+            elapsed = now - last_time
+            if elapsed > 0:
+                self.current_mbps = (current - last_bytes) * 8 / elapsed / 1_000_000
+                self.samples.append(self.current_mbps)
+                if self.on_sample:
+                    self.on_sample(self.current_mbps)
+            last_bytes, last_time = current, now
+            next_tick += self.interval
+            if next_tick < now:
+                next_tick = now + self.interval # we fell behind, don't try to catch up in a burst
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+def live_meter(text, stop_event, sampler):
+    from localtest.output import machine_readable, flush
+    if machine_readable():
+        stop_event.wait()
+        return
+    flush()
+    spinner_cycle = "|/-\\"
+    i = 0
+    width = 0
+    while not stop_event.is_set():
+        line = f"\r{text} {sampler.current_mbps:9.2f} Mbps {spinner_cycle[i % 4]}"
+        width = max(width, len(line))
+        sys.stdout.write(line)
+        sys.stdout.flush()
+        i += 1
+        time.sleep(0.1)
+    sys.stdout.write("\r" + " " * width + "\r")
+
+def encode_samples(samples):
+    # float32 little-endian, base64'd, so a 15s phase at 100ms is well under a KB in the history line
+    data = array("f", samples)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return base64.b64encode(data.tobytes()).decode("ascii")
+
+def decode_samples(text):
+    data = array("f")
+    data.frombytes(base64.b64decode(text))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+def summarize_samples(samples):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "peak_mbps": round(ordered[-1], 2),
+        "p10_mbps": round(ordered[len(ordered) // 10], 2),
+        "median_mbps": round(ordered[len(ordered) // 2], 2),
+    }
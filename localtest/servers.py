@@ -0,0 +1,123 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+SERVER_CACHE_FILE = "network_server_cache.json"
+
+# past the TTL a cached server is still used once more while a fresh pick happens in the background;
+# only after STALE_FACTOR * TTL do we block on a full discovery again
+STALE_FACTOR = 7
+
+# speedtest-cli doesn't raise for a dead server, it scores every failed attempt as 3600 s,
+# which averages out to this. anything at or over it never answered
+UNREACHABLE_MS = 1800000
+
+# how long a finished run waits at exit for a background revalidation before leaving it behind
+REVALIDATE_WAIT_SECONDS = 5
+
+_lock = threading.Lock()
+
+def ip_prefix(ip):
+    if not ip:
+        return "unknown"
+    if ":" in ip:
+        return ":".join(ip.split(":")[:4]) + "::/64"
+    parts = ip.split(".")
+    if len(parts) == 4:
+        return ".".join(parts[:3]) + ".0/24"
+    return ip
+
+def cache_key(client):
+    client = client or {}
+    return f"{client.get('isp', 'Unknown ISP')}|{ip_prefix(client.get('ip'))}"
+
+def load_cache():
+    try:
+        with open(SERVER_CACHE_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_cache(cache):
+    tmp_path = SERVER_CACHE_FILE + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, SERVER_CACHE_FILE)
+
+def lookup(key, ttl_seconds):
+    # returns (server, latency, state) where state is "fresh", "stale" or None when unusable
+    if ttl_seconds <= 0:
+        return None, None, None
+    entry = load_cache().get(key)
+    if not entry or not isinstance(entry.get("server"), dict):
+        return None, None, None
+    age = time.time() - entry.get("saved_at", 0)
+    if age < ttl_seconds:
+        return entry["server"], entry.get("latency"), "fresh"
+    if age < ttl_seconds * STALE_FACTOR:
+        return entry["server"], entry.get("latency"), "stale"
+    return None, None, None
+
+def store(key, server, latency):
+    with _lock:
+        cache = load_cache()
+        cache[key] = {"server": server, "latency": latency, "saved_at": time.time()}
+        _save_cache(cache)
+
+def forget(key=None):
+    with _lock:
+        cache = load_cache()
+        if key is None:
+            cache = {}
+        else:
+            cache.pop(key, None)
+        _save_cache(cache)
+
+def unreachable(latency):
+    return latency is None or latency >= UNREACHABLE_MS
+
+def use_server(st, server):
+    # only latency-tests the one server we already know instead of pulling the whole list
+    best = st.get_best_server([server])
+    if unreachable(st.results.ping):
+        raise ConnectionError(f"Cached server {server.get('url')} did not answer.")
+    return best, st.results.ping
+
+def discover(st, key):
+    best = st.get_best_server()
+    if not unreachable(st.results.ping):
+        store(key, best, st.results.ping) # don't pin a dead pick for a whole TTL
+    return best, st.results.ping
+
+def revalidate_in_background(make_speedtest, key):
+    # a daemon so a hung speedtest.net can't keep the process alive forever, but a one-shot run
+    # still waits a few seconds at exit so the fresh pick usually makes it into the cache
+    def worker():
+        try:
+            discover(make_speedtest(), key)
+        except Exception:
+            pass
+    thread = threading.Thread(target=worker, name="localtest-server-revalidate", daemon=True)
+    thread.start()
+    atexit.register(thread.join, REVALIDATE_WAIT_SECONDS)
+    return thread
+
+def choose_server(st, make_speedtest, ttl_seconds, refresh=False):
+    # returns (server, latency, source) where source is "cache", "cache-stale" or "discovered"
+    key = cache_key(st.config.get("client"))
+    if not refresh:
+        server, _, state = lookup(key, ttl_seconds)
+        if server is not None:
+            try:
+                best, latency = use_server(st, server)
+            except Exception:
+                forget(key) # server went away, fall through to a full discovery
+            else:
+                if state == "stale":
+                    return best, latency, "cache-stale"
+                return best, latency, "cache"
+    best, latency = discover(st, key)
+    return best, latency, "discovered"
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+
+SETTINGS_FILE = "network_settings.json"
+
+DEFAULT_SETTINGS = {
+    "threads_quick": 2,
+    "threads_full": 16,
+    "threads_auto": False,
+    "threads_max": 64,
+    "fast_upload": True,
+    "ping_test_host": "8.8.8.8",
+    "ping_count": 4,
+    "ping_method": "auto",
+    "ping_tcp_port": 443,
+    "dns_candidates": "1.1.1.1,8.8.8.8,9.9.9.9,208.67.222.222",
+    "dns_rounds": 3,
+    "server_cache_ttl_hours": 24,
+    "monitor_probe_interval": 5,
+    "monitor_speed_interval_minutes": 60,
+    "monitor_buffer_size": 720,
+    "monitor_flush_every": 60,
+    "adaptive_tolerance_percent": 5,
+    "adaptive_max_seconds": 15,
+    "adaptive_max_mb": 500,
+    "bufferbloat_test": False,
+    "bufferbloat_probe_ms": 100,
+    "bufferbloat_idle_seconds": 2,
+    "analysis_fast_runs": 5,
+    "analysis_baseline_runs": 30,
+    "analysis_window_runs": 50,
+    "analysis_min_runs": 5,
+    "analysis_regression_percent": 15,
+    "udp_rate_pps": 1000,
+    "udp_packet_bytes": 200,
+    "udp_seconds": 10,
+    "cpu_kernel_seconds": 1,
+    "memory_buffer_mb": 256,
+    "disk_file_mb": 512,
+    "disk_test_seconds": 3,
+    "update_check": False,
+    "update_check_ttl_hours": 24,
+    "update_index_url": "https://pypi.org/simple",
+    "update_timeout_seconds": 3,
+    "colors": True,
+}
+
+ANSI_ESCAPE = re.compile(r'\x1B[@-_][0-?]*[ -/]*[@-~]')
+
+# settings are loaded once per process and only re-read when the file's mtime changes
+_cache = {"stamp": None, "settings": None, "formatter": None}
+
+def _stamp():
+    try:
+        st = os.stat(SETTINGS_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _valid(key, value):
+    default_type = type(DEFAULT_SETTINGS[key])
+    if default_type is bool:
+        return isinstance(value, bool)
+    if default_type is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, default_type)
+
+def _strip_ansi(text):
+    return ANSI_ESCAPE.sub('', text)
+
+def _keep_ansi(text):
+    return text
+
+def _remember(settings):
+    _cache["stamp"] = _stamp()
+    _cache["settings"] = settings
+    _cache["formatter"] = _keep_ansi if settings.get("colors", True) else _strip_ansi
+
+def _read():
+    try:
+        with open(SETTINGS_FILE, "r") as f:
+            return json.load(f), False
+    except FileNotFoundError:
+        return None, False
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}, True
+
+def load_settings():
+    if _cache["settings"] is not None and _cache["stamp"] == _stamp():
+        return dict(_cache["settings"])
+
+    user_settings, corrupted = _read()
+    if user_settings is None:
+        save_settings(DEFAULT_SETTINGS)
+        return dict(DEFAULT_SETTINGS)
+    if corrupted or not isinstance(user_settings, dict):
+        from localtest.output import write_text # imported here, output.py imports this module
+        write_text("[WARN] Corrupted settings file. Restoring defaults.")
+        user_settings = {}
+
+    updated = False
+    for key in [key for key in user_settings if key not in DEFAULT_SETTINGS]:
+        del user_settings[key]
+        updated = True
+
+    for key, default_value in DEFAULT_SETTINGS.items():
+        if key not in user_settings or not _valid(key, user_settings[key]):
+            user_settings[key] = default_value
+            updated = True
+
+    if updated:
+        save_settings(user_settings)
+    else:
+        _remember(user_settings)
+
+    return dict(user_settings)
+
+def save_settings(settings):
+    merged = {**DEFAULT_SETTINGS, **settings}
+    merged = {key: merged[key] if _valid(key, merged[key]) else DEFAULT_SETTINGS[key] for key in DEFAULT_SETTINGS}
+    tmp_path = f"{SETTINGS_FILE}.{os.getpid()}.tmp" # same directory, so the rename stays atomic
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(merged, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, SETTINGS_FILE)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    _remember(merged)
+
+def get_formatter():
+    # cprint calls this for every line, so it only touches the disk the very first time
+    if _cache["formatter"] is None:
+        load_settings()
+    return _cache["formatter"]
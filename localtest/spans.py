@@ -0,0 +1,75 @@
+import os
+import time
+import threading
+
+TRACE_FILE = "localtest_trace.json"
+CPROFILE_FILE = "localtest_profile.pstats"
+
+_state = {"recorder": None}
+
+class Recorder:
+    # only exists while --profile is on, otherwise spans just time themselves and move on
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, args):
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": round((start - self.origin) * 1_000_000, 1),
+            "dur": round((end - start) * 1_000_000, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def dump(self, path=TRACE_FILE):
+        import json
+        with self.lock:
+            events = list(self.events)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+class span:
+    # with span("download", timings): ... puts the seconds in timings["download"]
+    __slots__ = ("name", "timings", "args", "start", "seconds")
+
+    def __init__(self, name, timings=None, **args):
+        self.name = name
+        self.timings = timings
+        self.args = args
+        self.seconds = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.seconds = end - self.start
+        if self.timings is not None:
+            self.timings[self.name] = round(self.seconds, 3)
+        recorder = _state["recorder"]
+        if recorder is not None:
+            recorder.add(self.name, self.start, end, self.args)
+        return False
+
+def start_profiling():
+    _state["recorder"] = Recorder()
+    return _state["recorder"]
+
+def stop_profiling(path=TRACE_FILE):
+    recorder = _state["recorder"]
+    _state["recorder"] = None
+    if recorder is None:
+        return 0
+    return recorder.dump(path)
+
+def profiling():
+    return _state["recorder"] is not None
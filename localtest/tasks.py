@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+def run_graph(tasks, on_done=None):
+    # tasks is {name: (func, deps)}. each func(results) starts as soon as everything in deps has finished,
+    # on_done(name, result) runs on the calling thread in the order things finish.
+    # a task that raises gets its exception as its result, whatever depends on it still runs and can check.
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(tasks))) as pool:
+        while pending or running:
+            for name, (func, deps) in list(pending.items()):
+                if all(dep in results for dep in deps):
+                    running[pool.submit(func, results)] = name
+                    del pending[name]
+            if not running:
+                raise ValueError(f"Tasks can never start (missing or circular deps): {', '.join(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = e
+                if on_done:
+                    on_done(name, results[name])
+    return results
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+
+CONCURRENCY_FILE = "network_concurrency.json"
+
+MAX_STREAMS = 64
+MIN_GAIN = 0.10 # a doubling has to buy at least 10% more throughput to be worth it
+
+def load_memory():
+    try:
+        with open(CONCURRENCY_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def remember(key, phase, streams):
+    memory = load_memory()
+    entry = memory.setdefault(key, {})
+    entry[phase] = streams
+    entry["saved_at"] = time.time()
+    tmp_path = CONCURRENCY_FILE + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(memory, f, indent=2)
+    os.replace(tmp_path, CONCURRENCY_FILE)
+
+def recall(key, phase):
+    value = load_memory().get(key, {}).get(phase)
+    return value if isinstance(value, int) and value > 0 else None
+
+def memory_key(client_key, server):
+    return f"{client_key}|{(server or {}).get('id', 'unknown')}"
+
+def ramp(measure, start=1, max_streams=MAX_STREAMS, min_gain=MIN_GAIN):
+    # doubles the stream count until aggregate throughput stops improving.
+    # measure(streams) returns bits/s for a short burst at that concurrency.
+    tried = []
+    best_streams, best_rate = None, 0.0
+    streams = max(1, start)
+    while streams <= max_streams:
+        rate = measure(streams) or 0.0
+        tried.append({"streams": streams, "mbps": round(rate / 1_000_000, 2)})
+        if best_streams is not None and rate < best_rate * (1 + min_gain):
+            break
+        if rate > best_rate or best_streams is None:
+            best_streams, best_rate = streams, rate
+        streams *= 2
+
+    # if the remembered value was already past the knee, walk back down while fewer streams keep up
+    lower = best_streams // 2 if best_streams == start else 0
+    while lower >= 1:
+        rate = measure(lower) or 0.0
+        tried.append({"streams": lower, "mbps": round(rate / 1_000_000, 2)})
+        if rate * (1 + min_gain) < best_rate:
+            break
+        best_streams = lower
+        lower //= 2
+    return best_streams, tried
+
+def starting_point(remembered):
+    # start one step below what worked last time so the ramp only needs a couple of bursts
+    return max(1, remembered // 2) if remembered else 1
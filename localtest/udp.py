@@ -0,0 +1,228 @@
+import time
+import errno
+import socket
+import struct
+import threading
+import selectors
+from array import array
+
+DEFAULT_PORT = 5201 # same number as the LAN server, udp and tcp ports don't clash
+MAGIC = b"LTU1"
+# client half: magic, sequence number, send time. the reflector fills in the second half
+# (how many packets it has had from this client, its receive time) and echoes the datagram back
+CLIENT_HEADER = struct.Struct("!4sId")
+REFLECTOR_HEADER = struct.Struct("!Id")
+HEADER = struct.Struct("!4sIdId")
+HEADER_SIZE = HEADER.size
+MAX_DATAGRAM = 65507
+SOCKET_BUFFER = 4 * 1024 * 1024
+DRAIN_SECONDS = 1.0 # how long to wait for stragglers after the last packet is sent
+
+def _big_buffers(sock):
+    # at high packet rates the default receive buffer overflows between drains and shows up as fake loss
+    for opt in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, opt, SOCKET_BUFFER)
+        except OSError:
+            pass
+
+class UdpReflector:
+    # stamps and echoes every localtest datagram it gets, one thread, drains the socket in batches
+    def __init__(self, host="0.0.0.0", port=DEFAULT_PORT):
+        family = socket.AF_INET6 if ":" in host else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        _big_buffers(self.sock)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.address = self.sock.getsockname()[:2]
+        self.counts = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def serve_forever(self):
+        buf = bytearray(MAX_DATAGRAM)
+        view = memoryview(buf)
+        counts = self.counts
+        clock = time.perf_counter
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.sock, selectors.EVENT_READ)
+            while not self._stop.is_set():
+                if not selector.select(0.2):
+                    continue
+                while True:
+                    try:
+                        n, addr = self.sock.recvfrom_into(buf)
+                    except (BlockingIOError, InterruptedError):
+                        break
+                    except OSError:
+                        if self._stop.is_set():
+                            return
+                        break # e.g. windows reporting an earlier icmp port unreachable, keep going
+                    if n < HEADER_SIZE or buf[:4] != MAGIC:
+                        continue
+                    count = counts.get(addr, 0) + 1
+                    counts[addr] = count
+                    REFLECTOR_HEADER.pack_into(buf, CLIENT_HEADER.size, count, clock())
+                    try:
+                        self.sock.sendto(view[:n], addr)
+                    except OSError:
+                        pass # full send buffer, the client will count it as lost
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sock.close()
+
+def _send_paced(sock, count, rate, size, send_times):
+    # sends on a fixed schedule. sleep() is only good to ~1ms so anything that's due gets sent in a burst
+    buf = bytearray(size)
+    buf[:4] = MAGIC
+    view = memoryview(buf)
+    clock = time.perf_counter
+    send_errors = 0
+    start = clock()
+    seq = 0
+    while seq < count:
+        due = min(count, int((clock() - start) * rate) + 1)
+        while seq < due:
+            now = clock()
+            CLIENT_HEADER.pack_into(buf, 0, MAGIC, seq, now)
+            send_times[seq] = now
+            try:
+                sock.send(view)
+            except BlockingIOError:
+                send_errors += 1
+            except OSError as e:
+                if e.errno not in (errno.ENOBUFS, errno.ECONNREFUSED):
+                    raise
+                send_errors += 1
+            seq += 1
+        wait = start + seq / rate - clock()
+        if wait > 0:
+            time.sleep(min(wait, 0.001))
+    return seq, send_errors
+
+def _receive(sock, done, raw, arrivals):
+    # the hot loop only copies the header and the arrival time, everything is parsed after the run
+    buf = bytearray(MAX_DATAGRAM)
+    head = memoryview(buf)[:HEADER_SIZE]
+    clock = time.perf_counter
+    deadline = None
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        while True:
+            if deadline is None and done.is_set():
+                deadline = clock() + DRAIN_SECONDS
+            if deadline is not None and clock() >= deadline:
+                return
+            if not selector.select(0.05):
+                continue
+            while True:
+                try:
+                    n = sock.recv_into(buf)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except ConnectionRefusedError:
+                    break # nothing listening (yet), shows up as loss
+                now = clock()
+                if n >= HEADER_SIZE:
+                    raw.extend(head)
+                    arrivals.append(now)
+
+def _rfc3550_jitter(pairs):
+    # pairs of (sent, received) in arrival order. J += (|D| - J) / 16 from RFC 3550 section 6.4.1,
+    # it only looks at differences so the two clocks don't have to agree
+    jitter = 0.0
+    previous = None
+    for sent, received in pairs:
+        if previous is not None:
+            d = (received - previous[1]) - (sent - previous[0])
+            jitter += (abs(d) - jitter) / 16
+        previous = (sent, received)
+    return jitter * 1000
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+def analyze(sent, send_times, raw, arrivals):
+    seen = bytearray(sent)
+    duplicates = 0
+    reordered = 0
+    highest = -1
+    rtts = []
+    upstream = []
+    downstream = []
+    reflector_count = 0
+    for (magic, seq, _, count, reflected), arrival in zip(HEADER.iter_unpack(raw), arrivals):
+        if magic != MAGIC or seq >= sent:
+            continue
+        if seen[seq]:
+            duplicates += 1
+            continue
+        seen[seq] = 1
+        if seq < highest:
+            reordered += 1
+        highest = max(highest, seq)
+        sent_at = send_times[seq]
+        rtts.append((arrival - sent_at) * 1000)
+        upstream.append((count, sent_at, reflected))
+        downstream.append((reflected, arrival))
+        reflector_count = max(reflector_count, count)
+
+    received = len(rtts)
+    upstream.sort() # the reflector's count is the order packets reached it in
+    result = {
+        "sent": sent,
+        "received": received,
+        "loss_percent": round((sent - received) / sent * 100, 3) if sent else None,
+        # the reflector counts what it got, so loss can be split by direction
+        "upstream_loss_percent": round(max(0, sent - reflector_count) / sent * 100, 3) if sent and received else None,
+        "duplicates": duplicates,
+        "reordered": reordered,
+        "reordered_percent": round(reordered / received * 100, 3) if received else None,
+        "jitter_up_ms": round(_rfc3550_jitter((s, r) for _, s, r in upstream), 3) if received else None,
+        "jitter_down_ms": round(_rfc3550_jitter(downstream), 3) if received else None,
+    }
+    if rtts:
+        rtts.sort()
+        result.update({
+            "rtt_min_ms": round(rtts[0], 3),
+            "rtt_p50_ms": round(_percentile(rtts, 0.50), 3),
+            "rtt_p90_ms": round(_percentile(rtts, 0.90), 3),
+            "rtt_p99_ms": round(_percentile(rtts, 0.99), 3),
+            "rtt_max_ms": round(rtts[-1], 3),
+        })
+    return result
+
+def run_stream(host, port=DEFAULT_PORT, rate=1000, size=200, duration=10):
+    # rate in packets per second, size in bytes per datagram (header included)
+    size = max(HEADER_SIZE, min(MAX_DATAGRAM, size))
+    count = max(1, int(rate * duration))
+    family = socket.getaddrinfo(host, port, 0, socket.SOCK_DGRAM)[0][0]
+    sock = socket.socket(family, socket.SOCK_DGRAM)
+    _big_buffers(sock)
+    sock.connect((host, port))
+    sock.setblocking(False)
+
+    send_times = array("d", bytes(8 * count))
+    raw = bytearray()
+    arrivals = array("d")
+    done = threading.Event()
+    receiver = threading.Thread(target=_receive, args=(sock, done, raw, arrivals), daemon=True)
+    receiver.start()
+    try:
+        sent, send_errors = _send_paced(sock, count, rate, size, send_times)
+    finally:
+        done.set()
+        receiver.join()
+        sock.close()
+
+    result = analyze(sent, send_times, raw, arrivals)
+    result.update({"rate_pps": rate, "packet_bytes": size, "duration": duration, "send_errors": send_errors})
+    return result
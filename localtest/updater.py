@@ -0,0 +1,200 @@
+import os
+import re
+import sys
+import json
+import time
+import subprocess
+import urllib.error
+import urllib.request
+import importlib.metadata
+from localtest.cli import cprint
+from localtest.settings import load_settings
+
+UPDATE_CACHE_FILE = "localtest_update_cache.json"
+DEFAULT_INDEX_URL = "https://pypi.org/simple"
+# PEP 691 json, a few KB, instead of the full /pypi/<name>/json with every release's metadata
+SIMPLE_JSON = "application/vnd.pypi.simple.v1+json"
+ARCHIVE_SUFFIXES = (".tar.gz", ".tar.bz2", ".zip", ".whl")
+
+def load_cache():
+    try:
+        with open(UPDATE_CACHE_FILE, "r") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_cache(cache):
+    tmp_path = UPDATE_CACHE_FILE + f".{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(tmp_path, UPDATE_CACHE_FILE)
+
+def project_url(index_url, package="localtest"):
+    # PEP 503 normalized name
+    return f"{index_url.rstrip('/')}/{re.sub(r'[-_.]+', '-', package).lower()}/"
+
+def is_fresh(cache, url, ttl_hours):
+    # a failed or still-running check counts too, so an offline machine doesn't retry on every run
+    last = max(cache.get("checked_at", 0), cache.get("attempted_at", 0))
+    return cache.get("url") == url and time.time() - last < ttl_hours * 3600
+
+def version_from_filename(filename, package="localtest"):
+    name = "[-_.]+".join(re.escape(part) for part in re.split(r"[-_.]+", package))
+    for suffix in ARCHIVE_SUFFIXES:
+        if filename.lower().endswith(suffix):
+            stem = filename[:-len(suffix)]
+            break
+    else:
+        return None
+    match = re.match(rf"(?i){name}-([^-]+)", stem)
+    return match.group(1) if match else None
+
+def parse_index(body, content_type, package="localtest"):
+    if "json" in content_type:
+        data = json.loads(body)
+        if data.get("versions"):
+            return list(data["versions"])
+        filenames = [f.get("filename", "") for f in data.get("files", [])]
+    else:
+        # plain PEP 503 html, which is all some mirrors and devpi-style indexes speak
+        filenames = re.findall(r"<a\b[^>]*>([^<]+)</a>", body)
+    versions = {version_from_filename(name.strip(), package) for name in filenames}
+    versions.discard(None)
+    return sorted(versions)
+
+def latest_of(versions):
+    from packaging.version import parse, InvalidVersion
+
+    def key(v):
+        try:
+            return (1, parse(v))
+        except InvalidVersion:
+            return (0, parse("0"))
+
+    # sort da versions :shocked: including PRERELEASES??!?!?!?!
+    return max(versions, key=key) if versions else None
+
+def refresh(force=False, settings=None, package="localtest"):
+    # returns the cache, revalidated if it's past the TTL. a 304 costs one tiny round trip
+    settings = settings or load_settings()
+    url = project_url(settings.get("update_index_url", DEFAULT_INDEX_URL), package)
+    cache = load_cache()
+    if not force and is_fresh(cache, url, settings.get("update_check_ttl_hours", 24)):
+        return cache
+
+    headers = {"Accept": f"{SIMPLE_JSON}, text/html;q=0.1", "User-Agent": "localtest-updater"}
+    if cache.get("url") == url and cache.get("latest"):
+        if cache.get("etag"):
+            headers["If-None-Match"] = cache["etag"]
+        if cache.get("last_modified"):
+            headers["If-Modified-Since"] = cache["last_modified"]
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=settings.get("update_timeout_seconds", 3)) as resp:
+            body = resp.read().decode("utf-8", "replace")
+            versions = parse_index(body, resp.headers.get("Content-Type", ""), package)
+            cache = {
+                "url": url,
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "latest": latest_of(versions),
+                "releases": len(versions),
+            }
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            return _failed(cache, url, f"HTTP {e.code}")
+        # not modified, what we have is still right
+    except (OSError, ValueError) as e:
+        return _failed(cache, url, str(getattr(e, "reason", e)))
+    cache["checked_at"] = time.time()
+    cache.pop("error", None)
+    cache.pop("attempted_at", None)
+    _save_cache(cache)
+    return cache
+
+def _failed(cache, url, error):
+    # remembered even with nothing cached yet, otherwise an offline machine waits out the timeout on every run
+    if cache.get("url") != url:
+        cache = {"url": url}
+    cache["error"] = error
+    cache["attempted_at"] = time.time()
+    _save_cache(cache)
+    return cache
+
+def check_latest_version(package="localtest", force=False):
+    cache = refresh(force=force, package=package)
+    if cache.get("error"):
+        cprint(f"[WARN] Could not reach the package index: {cache['error']}. Use 'localtest update --refresh' to try again now.")
+    return cache.get("latest")
+
+def get_installed_version(package="localtest"):
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+def background_check(settings):
+    # opt-in (update_check). never waits on the network: a stale cache gets refreshed by a detached
+    # process and whatever is cached right now decides whether to mention an update
+    url = project_url(settings.get("update_index_url", DEFAULT_INDEX_URL))
+    cache = load_cache()
+    if not is_fresh(cache, url, settings.get("update_check_ttl_hours", 24)):
+        if cache.get("url") != url:
+            cache = {"url": url} # index changed, nothing cached applies to it
+        cache["attempted_at"] = time.time() # claims this TTL so parallel runs don't all spawn
+        _save_cache(cache)
+        kwargs = {"stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+        if os.name == "nt":
+            kwargs["creationflags"] = getattr(subprocess, "DETACHED_PROCESS", 0)
+        else:
+            kwargs["start_new_session"] = True
+        try:
+            subprocess.Popen([sys.executable, "-c", "from localtest.updater import refresh; refresh(force=True)"], **kwargs)
+        except OSError:
+            pass
+
+    latest = cache.get("latest")
+    installed = get_installed_version()
+    if latest and installed and newer(latest, installed):
+        cprint(f"\033[90mLocaltest {latest} is out (you have {installed}). Run 'localtest update' to get it.\033[0m")
+
+def newer(latest, installed):
+    from packaging.version import parse, InvalidVersion
+    try:
+        return parse(latest) > parse(installed)
+    except InvalidVersion:
+        return False
+
+def update(force_refresh=False):
+    from packaging.version import parse as parse_version
+
+    cprint("--- Checking for updates ---\n")
+    installed = get_installed_version("localtest")
+    if not installed:
+        cprint("[ERROR] Localtest is not installed.")
+        return
+
+    latest = check_latest_version("localtest", force=force_refresh)
+    cprint(f"Installed version: {installed}")
+    if latest:
+        cprint(f"Latest version on PyPI: {latest}")
+    else:
+        cprint("Could not determine the latest version.")
+        latest = installed
+
+    if parse_version(installed) > parse_version(latest):
+        cprint(f"\n[OK] You have a more advanced version than the latest public version ({latest}). No update needed.")
+        return
+
+    if parse_version(installed) == parse_version(latest):
+        cprint(f"\n[OK] You already have the latest version ({installed}). No update needed.")
+        return
+
+    cprint("\n--- Updating Localtest ---\n")
+    try:
+        cmd = [sys.executable, "-m", "pip", "install", "--upgrade", "localtest"]
+        subprocess.run(cmd, check=True)
+        cprint("\n[OK] Localtest updated successfully!")
+    except subprocess.CalledProcessError as e:
+        cprint(f"[ERROR] Update failed: {e}")
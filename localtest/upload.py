@@ -0,0 +1,135 @@
+import time
+import threading
+import http.client
+from urllib.parse import urlsplit
+
+# speedtest-cli builds a fresh BytesIO body for every request up front (hundreds of MB on a full run)
+# and urllib then sends it 8 KiB at a time. this sends every request on every thread from one
+# small shared buffer, in big memoryview slices, over connections that stay open between requests
+CHUNK_SIZE = 256 * 1024
+DEFAULT_REQUEST_BYTES = 7340032 # speedtest-cli's biggest upload size
+PREFIX = b"content1="
+FILLER = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+_payload = {}
+
+def shared_payload():
+    # "content1=" plus CHUNK_SIZE filler bytes. the first slice of a body starts at 0,
+    # every slice after that skips the prefix, so nothing is ever copied
+    if "view" not in _payload:
+        filler = (FILLER * (CHUNK_SIZE // len(FILLER) + 1))[:CHUNK_SIZE]
+        _payload["view"] = memoryview(PREFIX + filler)
+    return _payload["view"]
+
+def _is_set(event):
+    # speedtest-cli's FakeShutdownEvent only has the old isSet() name
+    return event.is_set() if hasattr(event, "is_set") else event.isSet()
+
+def _user_agent():
+    try:
+        import speedtest
+        return speedtest.build_user_agent()
+    except Exception:
+        return "Mozilla/5.0 localtest"
+
+def upload_url(st):
+    server = st._best or st.results.server or {}
+    url = server.get("url")
+    if not url:
+        raise ValueError("No upload URL, pick a server first.")
+    if url.startswith(":"):
+        url = ("https" if st._secure else "http") + url
+    elif st._secure and url.startswith("http://"):
+        url = "https://" + url[len("http://"):]
+    return url
+
+class _Uploader:
+    def __init__(self, url, size, deadline, shutdown_event, counter=None, timeout=10, source_address=None):
+        parts = urlsplit(url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = parts.path or "/"
+        self.size = size
+        self.deadline = deadline
+        self.shutdown_event = shutdown_event
+        self.counter = counter
+        self.timeout = timeout
+        self.source_address = (source_address, 0) if source_address else None
+        self.headers = (("User-Agent", _user_agent()), ("Cache-Control", "no-cache"), ("Content-Length", str(size)))
+        self.lock = threading.Lock()
+        self.total = 0
+        self.errors = []
+
+    def keep_going(self):
+        return time.perf_counter() < self.deadline and not _is_set(self.shutdown_event)
+
+    def connect(self):
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout, source_address=self.source_address)
+
+    def post(self, conn, bump):
+        # returns True if the connection can be used for the next request
+        view = shared_payload()
+        conn.putrequest("POST", f"{self.path}?x={int(time.time() * 1000)}.{bump}", skip_accept_encoding=True)
+        for name, value in self.headers:
+            conn.putheader(name, value)
+        conn.endheaders()
+        sent = 0
+        while sent < self.size:
+            if not self.keep_going():
+                return False # out of time halfway through a body, this connection is done
+            n = min(CHUNK_SIZE, self.size - sent)
+            conn.send(view[:n] if sent == 0 else view[len(PREFIX):len(PREFIX) + n])
+            sent += n
+            with self.lock:
+                self.total += n
+            if self.counter is not None:
+                self.counter.add(n)
+        response = conn.getresponse()
+        response.read()
+        return not response.will_close
+
+    def run(self, i):
+        conn = None
+        bump = 0
+        try:
+            while self.keep_going():
+                if conn is None:
+                    conn = self.connect()
+                try:
+                    reusable = self.post(conn, bump)
+                except (OSError, http.client.HTTPException) as e:
+                    self.errors.append(e)
+                    reusable = False
+                    time.sleep(0.05) # don't spin on a server that's refusing us
+                bump += 1
+                if not reusable:
+                    conn.close()
+                    conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+
+def upload(st, threads=None):
+    # drop-in for Speedtest.upload(): fills in results.upload / bytes_sent and returns bits/s
+    sizes = st.config.get("sizes", {}).get("upload") or [DEFAULT_REQUEST_BYTES]
+    length = st.config.get("length", {}).get("upload", 10)
+    threads = threads or st.config.get("threads", {}).get("upload", 2)
+    counter = getattr(st._opener, "counter", None)
+
+    start = time.perf_counter()
+    uploader = _Uploader(upload_url(st), max(sizes), start + length, st._shutdown_event, counter,
+                         getattr(st, "_timeout", 10), getattr(st, "_source_address", None))
+    workers = [threading.Thread(target=uploader.run, args=(i,), daemon=True) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    if not uploader.total and uploader.errors:
+        raise uploader.errors[0]
+    st.results.bytes_sent = uploader.total
+    st.results.upload = uploader.total * 8 / elapsed if elapsed else 0.0
+    return st.results.upload
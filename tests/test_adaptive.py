@@ -0,0 +1,38 @@
+from localtest.adaptive import ConvergenceWatcher
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def run(watcher, clock, rates, interval=0.1):
+    for i, mbps in enumerate(rates):
+        clock.now += interval
+        watcher.update(mbps, (i + 1) * 1_000_000)
+        if watcher.stop_event.is_set():
+            break
+
+def test_steady_throughput_converges_after_min_seconds():
+    clock = Clock()
+    watcher = ConvergenceWatcher(0.1, min_seconds=1.0, window_seconds=0.5, clock=clock)
+    run(watcher, clock, [100.0 + (i % 2) for i in range(200)])
+    assert watcher.reason == "converged"
+    assert 1.0 <= clock.now < 2.0
+    assert abs(watcher.estimate_bps() - 100.5e6) < 1e6
+    assert watcher.report()["stopped"] == "converged"
+
+def test_noisy_throughput_hits_the_time_cap():
+    clock = Clock()
+    watcher = ConvergenceWatcher(0.1, min_seconds=1.0, max_seconds=3.0, clock=clock)
+    run(watcher, clock, [10.0 if i % 2 else 500.0 for i in range(200)])
+    assert watcher.reason == "time_cap"
+    assert round(clock.now, 1) == 3.0
+
+def test_byte_cap():
+    clock = Clock()
+    watcher = ConvergenceWatcher(0.1, max_bytes=5_000_000, clock=clock)
+    run(watcher, clock, [10.0 if i % 2 else 500.0 for i in range(200)])
+    assert watcher.reason == "byte_cap"
+    assert watcher.report()["megabytes"] == 5.0
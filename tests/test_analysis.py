@@ -0,0 +1,63 @@
+import threading
+
+from localtest import analysis, history
+
+def entry(ts, download=100.0):
+    return {"timestamp": ts, "isp": "Test ISP", "download_mbps": download, "upload_mbps": 20.0, "ping": 10.0}
+
+def runs(state):
+    return state["trackers"][analysis.tracker_key("Test ISP", "download_mbps")].count
+
+def test_same_second_entries_are_all_counted(tmp_path):
+    directory = str(tmp_path)
+    history.append_entry(entry("2026-01-01 10:00:00"), directory)
+    state, _ = analysis.update({}, directory)
+    assert runs(state) == 1
+
+    history.append_entry(entry("2026-01-01 10:00:00"), directory)
+    state, _ = analysis.update({}, directory)
+    assert runs(state) == 2
+
+def test_clock_going_back_is_not_skipped(tmp_path):
+    # e.g. the repeated hour when DST ends, local timestamps run backwards
+    directory = str(tmp_path)
+    history.append_entry(entry("2026-10-25 02:59:59"), directory)
+    analysis.update({}, directory)
+    history.append_entry(entry("2026-10-25 02:00:01"), directory)
+    state, _ = analysis.update({}, directory)
+    assert runs(state) == 2
+    assert analysis.load_state(directory)["trackers"][analysis.tracker_key("Test ISP", "ping")].count == 2
+
+def test_nothing_new_is_a_no_op(tmp_path):
+    directory = str(tmp_path)
+    history.append_entries([entry(f"2026-01-01 10:00:0{i}") for i in range(3)], directory)
+    analysis.update({}, directory)
+    state, events = analysis.update({}, directory)
+    assert runs(state) == 3
+    assert events == []
+
+def test_compaction_starts_over_cleanly(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    monkeypatch.setattr(history, "SEGMENT_MAX_BYTES", 200) # two entries per segment
+    for i in range(4):
+        history.append_entry(entry(f"2026-01-01 10:00:0{i}"), directory)
+    analysis.update({}, directory)
+    for i in range(4, 8):
+        history.append_entry(entry(f"2026-01-01 10:00:0{i}"), directory)
+    assert len(history.list_segments(directory)) == 4
+    history.compact_history(directory)
+    assert analysis.load_state(directory)["cursor"]["segment"] not in history.list_segments(directory)
+
+    state, _ = analysis.update({}, directory)
+    assert runs(state) == 8
+
+def test_parallel_updates_apply_each_run_once(tmp_path):
+    directory = str(tmp_path)
+    history.append_entries([entry(f"2026-01-01 10:00:{i:02d}") for i in range(20)], directory)
+    threads = [threading.Thread(target=analysis.update, args=({}, directory)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert runs(analysis.load_state(directory)) == 20
+    assert not [name for name in tmp_path.iterdir() if name.suffix == ".tmp"]
@@ -0,0 +1,30 @@
+import pytest
+
+from localtest import cpu
+
+def test_random_cycle_visits_every_node_once():
+    nodes, stride = 500, 16
+    chain = cpu._random_cycle(nodes, stride)
+    seen = set()
+    i = 0
+    for _ in range(nodes):
+        assert i % stride == 0
+        seen.add(i)
+        i = chain[i]
+    assert i == 0 # back at the start after exactly one lap
+    assert len(seen) == nodes
+
+def test_filled_buffer_has_no_ff_or_zero_pages():
+    buf = cpu._filled_buffer(1024 * 1024 + 7)
+    assert len(buf) == 1024 * 1024 + 7
+    assert buf.find(b"\xff") == -1
+    assert buf.count(0) < len(buf) // 200 # only the 0x00 of each 255 byte run
+
+@pytest.mark.parametrize("name", sorted(cpu.KERNELS))
+def test_kernels_report_work(name):
+    assert cpu.run_kernel(name, 0.01) > 0
+
+def test_memory_bandwidth_small_buffer():
+    result = cpu.memory_bandwidth(size_mb=4, rounds=2)
+    assert result["buffer_mb"] == 4
+    assert result["copy_gbps"] > 0 and result["read_gbps"] > 0
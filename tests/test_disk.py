@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+
+import pytest
+
+from localtest import disk
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def make_file(path, size):
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+
+def test_sequential_round_trip(tmp_path):
+    path = str(tmp_path / "scratch")
+    size = 4 * disk.BLOCK_SIZE
+    write = disk.sequential_write(path, size, direct=False)
+    read = disk.sequential_read(path, size, direct=False)
+    assert os.path.getsize(path) == size
+    assert write["mbps"] > 0 and read["mbps"] > 0
+    assert write["p50_us"] <= write["max_us"]
+
+def test_random_io_stops_after_its_time(tmp_path):
+    path = str(tmp_path / "scratch")
+    make_file(path, 64 * disk.PAGE_SIZE)
+    start = time.perf_counter()
+    result = disk.random_io(path, 64 * disk.PAGE_SIZE, depth=4, seconds=0.2, direct=False)
+    assert time.perf_counter() - start < 5
+    assert result["iops"] > 0
+
+def test_random_io_unwinds_when_the_sleep_is_interrupted(tmp_path, monkeypatch):
+    # what cli's SIGINT handler does: SystemExit raised out of the main thread's sleep
+    path = str(tmp_path / "scratch")
+    make_file(path, 64 * disk.PAGE_SIZE)
+
+    def interrupted(seconds):
+        raise SystemExit(0)
+    monkeypatch.setattr(disk.time, "sleep", interrupted)
+    raised = []
+
+    def run():
+        try:
+            disk.random_io(path, 64 * disk.PAGE_SIZE, depth=4, seconds=30, direct=False)
+        except SystemExit as e:
+            raised.append(e)
+    # on its own thread so a regression shows up as a failure instead of hanging the suite
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "workers were never stopped"
+    assert raised
+
+@pytest.mark.skipif(os.name == "nt", reason="needs SIGINT delivered to a child process")
+def test_ctrl_c_exits_and_removes_the_scratch_file(tmp_path):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.Popen([sys.executable, "-c", "import sys; from localtest.cli import main; "
+                             "sys.argv = ['localtest', 'hardware', 'disk', '--size-mb', '8', '--seconds', '5', '--buffered']; main()"],
+                            cwd=str(tmp_path), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 20
+    while not any(name.startswith(".localtest-disk-") for name in os.listdir(tmp_path)):
+        assert time.monotonic() < deadline and proc.poll() is None
+        time.sleep(0.05)
+    time.sleep(1) # into the random io part
+    proc.send_signal(signal.SIGINT)
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        pytest.fail("hung after ctrl+c")
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".localtest-disk-")]
@@ -0,0 +1,87 @@
+import time
+import socket
+import struct
+import threading
+
+import pytest
+
+from localtest import dns
+
+class StubResolver:
+    # answers queries on 127.0.0.1 with an empty NOERROR reply: all of them, none, or only the first N
+    def __init__(self, answer=True):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.1)
+        self.address = f"127.0.0.1:{self.sock.getsockname()[1]}"
+        self.answer = answer
+        self.queries = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.serve, daemon=True)
+        self._thread.start()
+
+    def serve(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            self.queries += 1
+            if (self.answer is True or self.queries <= self.answer) and len(data) >= 12:
+                query_id = struct.unpack("!H", data[:2])[0]
+                self.sock.sendto(struct.pack("!HHHHHH", query_id, 0x8180, 1, 0, 0, 0) + data[12:], addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+@pytest.fixture
+def stub():
+    resolvers = []
+    def make(answer=True):
+        resolvers.append(StubResolver(answer))
+        return resolvers[-1]
+    yield make
+    for resolver in resolvers:
+        resolver.close()
+
+def test_stub_resolver_answers(stub):
+    resolver = stub()
+    [result] = dns.benchmark_resolvers([resolver.address], names=("example.com",), rounds=2, timeout=1.0)
+    assert "error" not in result
+    assert result["cached"]["queries"] == 2
+    assert result["cached"]["timeouts"] == 0
+    assert result["uncached"]["timeouts"] == 0
+    assert result["cached"]["p50_ms"] >= 0
+    assert resolver.queries == 5 # one warm-up, then a cached and an uncached query per round
+
+def test_silent_resolver_times_out(stub):
+    answering, silent = stub(), stub(answer=False)
+    results = dns.benchmark_resolvers([silent.address, answering.address], names=("example.com",), rounds=1, timeout=0.2)
+    assert results[0]["resolver"] == answering.address # ranked ahead of the one that never answered
+    assert results[1] == {"resolver": silent.address, "error": "no response"}
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.1.1.1", ("1.1.1.1", 53)),
+    ("127.0.0.1:5353", ("127.0.0.1", 5353)),
+    ("[::1]:5353", ("::1", 5353)),
+    ("::1", ("::1", 53)),
+])
+def test_parse_resolver(value, expected):
+    assert dns.parse_resolver(value) == expected
+
+@pytest.mark.parametrize("value", ["1.1.1.1:abc", "1.1.1.1:70000", ":53", "[::1]53"])
+def test_parse_resolver_rejects_bad_input(value):
+    with pytest.raises(ValueError):
+        dns.parse_resolver(value)
+
+def test_resolver_that_goes_quiet_is_time_bounded(stub):
+    names = ("a.example", "b.example", "c.example", "d.example", "e.example")
+    resolver = stub(answer=len(names)) # answers the warm-up, then nothing
+    start = time.perf_counter()
+    [result] = dns.benchmark_resolvers([resolver.address], names=names, rounds=3, timeout=0.3)
+    # one query at a time this took rounds * names * 2 * timeout = 9s
+    assert time.perf_counter() - start < 3
+    assert result["cached"]["timeouts"] == 15
+    assert result["uncached"]["timeouts"] == 15
@@ -0,0 +1,25 @@
+import os
+import stat
+
+from localtest import history, hardware
+
+def test_history_from_a_read_only_folder(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lines = []
+    monkeypatch.setattr(hardware, "cprint", lines.append)
+    other = tmp_path / "other_node"
+    history.append_entry({"timestamp": "2026-01-01 10:00:00", "kind": "disk", "node": "nas-2"}, str(other))
+    os.remove(other / history.INDEX_FILE) # a missing index would normally get rebuilt on open
+    other.chmod(stat.S_IRUSR | stat.S_IXUSR)
+    if getattr(os, "geteuid", lambda: 0)() == 0:
+        # root ignores the permission bits, so fail the way a read-only mount does
+        def read_only(*args, **kwargs):
+            raise OSError(30, "Read-only file system")
+        monkeypatch.setattr(history.os, "makedirs", read_only)
+        monkeypatch.setattr(history._HistoryLock, "__enter__", read_only)
+    try:
+        hardware.show_hardware_history(["hardware", "history", "--from", str(other)])
+    finally:
+        other.chmod(stat.S_IRWXU)
+    assert any("DISK | nas-2" in line for line in lines)
+    assert not (other / history.INDEX_FILE).exists()
@@ -0,0 +1,97 @@
+import pytest
+
+from localtest import history
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(history, "INDEX_STRIDE_BYTES", 1) # a point per entry so seeks actually skip things
+    return "hist"
+
+def entry(ts):
+    return {"timestamp": f"2026-03-01 {ts}", "download_mbps": 100.0}
+
+def times(entries):
+    return [e["timestamp"][-8:] for e in entries]
+
+# 12:00 was written before the clock got stepped back an hour
+STEPPED = ["10:00:00", "12:00:00", "11:00:00", "11:30:00", "13:00:00"]
+
+def test_since_after_clock_step(directory):
+    for ts in STEPPED:
+        history.append_entry(entry(ts), directory) # one write each, so the tail read between points is used
+    found = history.iter_entries(since="2026-03-01 11:45:00", directory=directory)
+    assert times(found) == ["12:00:00", "13:00:00"]
+
+def test_until_after_clock_step(directory):
+    history.append_entries([entry(ts) for ts in STEPPED], directory)
+    found = history.iter_entries(until="2026-03-01 11:15:00", directory=directory)
+    assert times(found) == ["10:00:00", "11:00:00"]
+
+def test_rebuilt_index_matches_appended_one(directory):
+    for ts in STEPPED:
+        history.append_entry(entry(ts), directory)
+    appended = list(history._iter_segment(history._path(directory, history.INDEX_FILE)))
+    assert history.rebuild_index(directory) == appended
+    assert [p["max_before"] for p in appended] == [None] + ["2026-03-01 " + t for t in ["10:00:00", "12:00:00", "12:00:00", "12:00:00"]]
+
+def test_old_index_without_max_before_gets_rebuilt(directory):
+    history.append_entries([entry(ts) for ts in STEPPED], directory)
+    index = history._path(directory, history.INDEX_FILE)
+    with open(index, "w") as f:
+        f.write('{"ts":"2026-03-01 11:30:00","segment":"segment-000001.jsonl","offset":0}\n')
+    found = history.iter_entries(since="2026-03-01 11:45:00", directory=directory)
+    assert times(found) == ["12:00:00", "13:00:00"]
+    assert "max_before" in history._last_index_point(directory)
+
+def many(count, start_minute=0):
+    return [entry(f"{10 + (start_minute + i) // 60:02d}:{(start_minute + i) % 60:02d}:00") for i in range(count)]
+
+def test_segments_roll_over_when_full(directory, monkeypatch):
+    monkeypatch.setattr(history, "SEGMENT_MAX_BYTES", 150)
+    for e in many(12):
+        history.append_entry(e, directory)
+    segments = history.list_segments(directory)
+    assert len(segments) > 2
+    assert segments == sorted(segments)
+    assert times(history.load_history(directory)) == times(many(12))
+
+def test_compaction_folds_closed_segments(directory, monkeypatch):
+    monkeypatch.setattr(history, "SEGMENT_MAX_BYTES", 150)
+    for e in many(12):
+        history.append_entry(e, directory)
+    before = history.list_segments(directory)
+    with open(history._path(directory, before[1]), "ab") as f:
+        f.write(b"not json\n")
+
+    stats = history.compact_history(directory)
+    after = history.list_segments(directory)
+    assert stats["segments_before"] == len(before)
+    assert after == [before[0], before[-1]] # the active segment is left alone
+    assert stats["entries"] == 12 - sum(1 for _ in history._iter_segment(history._path(directory, before[-1])))
+    assert times(history.load_history(directory)) == times(many(12))
+    assert not history.compact_history(directory)["entries"] # nothing left to fold
+
+def test_since_seeks_past_earlier_segments(directory, monkeypatch):
+    monkeypatch.setattr(history, "SEGMENT_MAX_BYTES", 150)
+    for e in many(30):
+        history.append_entry(e, directory)
+    since = "2026-03-01 10:20:00"
+    point = history._seek_point(directory, since)
+    assert point["segment"] != history.list_segments(directory)[0]
+    assert point["max_before"] < since
+
+    opened = []
+    real = history._iter_segment
+    monkeypatch.setattr(history, "_iter_segment", lambda path, offset=0: opened.append(path) or real(path, offset))
+    assert times(history.iter_entries(since=since, directory=directory)) == times(many(10, start_minute=20))
+    assert len(opened) < len(history.list_segments(directory))
+
+def test_torn_line_is_skipped_and_sealed(directory):
+    history.append_entry(entry("10:00:00"), directory)
+    segment = history._path(directory, history.list_segments(directory)[-1])
+    with open(segment, "ab") as f:
+        f.write(b'{"timestamp":"2026-03-01 10:0') # crashed mid-write
+    assert times(history.load_history(directory)) == ["10:00:00"]
+    history.append_entry(entry("10:01:00"), directory)
+    assert times(history.load_history(directory)) == ["10:00:00", "10:01:00"]
@@ -0,0 +1,63 @@
+import pytest
+
+from localtest import lan
+
+@pytest.fixture
+def server():
+    server = lan.start_server("127.0.0.1", 0)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_loopback_both_directions(server):
+    host, port = server.server_address[:2]
+    results = lan.run_client(host, port, streams=2, duration=0.5, direction="both")
+    assert results["errors"] == []
+    for phase in ("download", "upload"):
+        assert len(results[phase]["streams_mbps"]) == 2
+        assert results[phase]["bytes"] > 0
+        assert results[phase]["aggregate_mbps"] > 0
+
+def test_loopback_bidir(server):
+    host, port = server.server_address[:2]
+    results = lan.run_client(host, port, streams=1, duration=0.5, direction="bidir")
+    assert results["errors"] == []
+    assert results["download"]["bytes"] > 0 and results["upload"]["bytes"] > 0
+
+def test_nothing_listening_is_an_error_not_a_crash():
+    with lan.socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    results = lan.run_client("127.0.0.1", port, streams=2, duration=0.5, direction="download", timeout=1)
+    assert "download" in results and results["download"]["bytes"] == 0
+    assert len(results["errors"]) == 2
+
+@pytest.mark.parametrize("value, expected", [
+    ("192.168.1.20", ("192.168.1.20", lan.DEFAULT_PORT)),
+    ("192.168.1.20:6000", ("192.168.1.20", 6000)),
+    ("[::1]:6000", ("::1", 6000)),
+    ("[::1]", ("::1", lan.DEFAULT_PORT)),
+])
+def test_parse_target(value, expected):
+    assert lan.parse_target(value) == expected
+
+@pytest.mark.parametrize("value", ["host:abc", "host:0", "host:65536", ":5201", "[::1]5201"])
+def test_parse_target_rejects_bad_ports(value):
+    with pytest.raises(ValueError):
+        lan.parse_target(value)
+
+def test_unknown_direction_is_rejected(server):
+    with pytest.raises(ValueError):
+        lan.run_client("127.0.0.1", server.server_address[1], duration=0.5, direction="sideways")
+
+def test_cli_rejects_unknown_direction(monkeypatch):
+    from localtest import cli, network
+    ran = []
+    printed = []
+    monkeypatch.setattr(network, "run_lan_test", lambda *a, **kw: ran.append(kw))
+    monkeypatch.setattr(cli, "cprint", printed.append)
+    cli.cmd_network_run(["network", "run", "--target", "127.0.0.1", "--direction", "sideways"])
+    assert not ran
+    assert "--direction" in printed[0]
+    cli.cmd_network_run(["network", "run", "--target", "127.0.0.1", "--direction", "upload"])
+    assert ran[0]["direction"] == "upload"
@@ -0,0 +1,37 @@
+import json
+
+from localtest import history, monitor
+
+def sample(i):
+    return {"timestamp": f"2026-01-01 10:00:{i:02d}", "host": "127.0.0.1", "avg_ms": float(i)}
+
+def test_monitor_history_leaves_the_legacy_file_alone(tmp_path, monkeypatch):
+    # the old network_history.json only ever held speed tests, it belongs to network_history/
+    monkeypatch.chdir(tmp_path)
+    legacy = [{"timestamp": "2025-01-01 10:00:00", "isp": "Old ISP", "download_mbps": 50.0}]
+    (tmp_path / history.LEGACY_HISTORY_FILE).write_text(json.dumps(legacy))
+
+    history.append_entry(sample(0), monitor.MONITOR_HISTORY_DIR)
+    assert [e["host"] for e in history.iter_entries(directory=monitor.MONITOR_HISTORY_DIR)] == ["127.0.0.1"]
+    assert (tmp_path / history.LEGACY_HISTORY_FILE).exists()
+
+    assert [e["isp"] for e in history.iter_entries()] == ["Old ISP"]
+    assert not (tmp_path / history.LEGACY_HISTORY_FILE).exists()
+
+def test_small_buffer_still_flushes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    async def fake_probe(hosts, **kwargs):
+        return {h: {"method": "tcp:443", "avg_ms": 1.0, "packet_loss_percent": 0.0} for h in hosts}
+    monkeypatch.setattr(monitor, "probe_hosts_async", fake_probe)
+
+    m = monitor.Monitor(["127.0.0.1"], buffer_size=3, flush_every=10, directory="mon")
+    try:
+        for _ in range(7):
+            m.probe()
+        # two full buffers went to disk without waiting for close()
+        assert len(list(history.iter_entries(directory="mon"))) == 6
+        assert m.buffer.pending == 1
+    finally:
+        m.close()
+    assert len(list(history.iter_entries(directory="mon"))) == 7
@@ -0,0 +1,93 @@
+import time
+import socket
+import asyncio
+import struct
+
+import pytest
+
+from localtest import probe
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(256) # never accepted, the backlog has to hold every probe
+    yield sock.getsockname()[1]
+    sock.close()
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def test_auto_uses_tcp_without_icmp(listener, monkeypatch):
+    monkeypatch.setattr(probe, "icmp_available", lambda family=socket.AF_INET: False)
+    result = probe.probe_hosts(["127.0.0.1"], count=3, interval=0.01, method="auto", port=listener)["127.0.0.1"]
+    assert result["method"] == f"tcp:{listener}"
+    assert result["received"] == 3
+    assert result["packet_loss_percent"] == 0
+
+def test_auto_falls_back_to_tcp_when_icmp_fails(listener, monkeypatch):
+    # e.g. a ping socket that opens but isn't allowed to send
+    async def refused(*args):
+        raise PermissionError("Operation not permitted")
+    monkeypatch.setattr(probe, "icmp_available", lambda family=socket.AF_INET: True)
+    monkeypatch.setattr(probe, "_icmp_samples", refused)
+    result = probe.probe_hosts(["127.0.0.1"], count=2, interval=0.01, method="auto", port=listener)["127.0.0.1"]
+    assert result["method"] == f"tcp:{listener}"
+    assert result["received"] == 2
+
+def test_forced_icmp_failure_is_reported(monkeypatch):
+    async def refused(*args):
+        raise PermissionError("Operation not permitted")
+    monkeypatch.setattr(probe, "_icmp_samples", refused)
+    result = probe.probe_hosts(["127.0.0.1"], count=2, method="icmp")["127.0.0.1"]
+    assert result["error"] == "Operation not permitted"
+
+def test_refused_connection_still_counts_as_a_reply():
+    port = closed_port()
+    result = probe.probe_hosts(["127.0.0.1"], count=2, interval=0.01, method="tcp", port=port)["127.0.0.1"]
+    assert result["received"] == 2
+
+def test_error_received_fails_every_waiting_probe():
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        protocol = probe._EchoProtocol(socket.AF_INET)
+        futures = [loop.create_future() for _ in range(3)]
+        protocol.waiting = dict(enumerate(futures, start=1))
+        protocol.error_received(OSError("Network is unreachable"))
+        assert protocol.waiting == {}
+        for fut in futures:
+            with pytest.raises(OSError):
+                fut.result()
+    asyncio.run(scenario())
+
+def test_echo_reply_with_ipv4_header_is_matched():
+    # macOS includes the IP header in what it hands back, linux doesn't
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        protocol = probe._EchoProtocol(socket.AF_INET)
+        protocol.waiting[7] = fut = loop.create_future()
+        reply = struct.pack("!BBHHH", probe.ICMP_ECHO_REPLY, 0, 0, 1, 7)
+        protocol.datagram_received(bytes([0x45]) + bytes(19) + reply, ("127.0.0.1", 0))
+        assert fut.done() and not protocol.waiting
+    asyncio.run(scenario())
+
+def test_latency_probe_over_tcp(listener):
+    lp = probe.LatencyProbe("127.0.0.1", interval=0.01, method="tcp", port=listener).start()
+    time.sleep(0.1)
+    lp.set_phase("download")
+    time.sleep(0.1)
+    series = lp.stop()
+    assert lp.used_method == f"tcp:{listener}"
+    assert series["idle"] and series["download"]
+    assert all(rtt is not None for rtt in series["idle"] + series["download"])
+
+@pytest.mark.parametrize("value, expected", [
+    ("example.com", ("example.com", 7)),
+    (" 10.0.0.1:8080 ", ("10.0.0.1", 8080)),
+    ("[fe80::1]", ("fe80::1", 7)),
+    ("fe80::1", ("fe80::1", 7)),
+])
+def test_parse_host_port(value, expected):
+    assert probe.parse_host_port(value, 7) == expected
@@ -0,0 +1,65 @@
+import pytest
+
+from localtest import history, query
+
+@pytest.fixture
+def directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return "hist"
+
+def entry(ts, mbps, isp="Fiber Co"):
+    return {"timestamp": ts, "isp": isp, "download_mbps": mbps, "upload_mbps": mbps / 10, "ping": 10.0}
+
+@pytest.fixture
+def read_counter(monkeypatch):
+    # counts entries the cache had to read from the history
+    seen = []
+    real = query.iter_after
+    def counting(cursor=None, directory=history.HISTORY_DIR):
+        for item in real(cursor, directory):
+            seen.append(item)
+            yield item
+    monkeypatch.setattr(query, "iter_after", counting)
+    return seen
+
+def fill(directory):
+    for day in range(1, 6):
+        history.append_entries([entry(f"2026-02-0{day} {h:02d}:00:00", 100.0 + day + h) for h in (8, 12, 20)], directory)
+
+def test_warm_rollup_reads_only_new_entries(directory, read_counter):
+    fill(directory)
+    cold = query.aggregate("day", directory=directory)
+    assert len(read_counter) == 15
+    assert query.aggregate("day", directory=directory) == cold
+    assert len(read_counter) == 15
+
+    # same second as the last entry, then one from before a clock step: a timestamp key would skip both
+    history.append_entry(entry("2026-02-05 20:00:00", 500.0), directory)
+    history.append_entry(entry("2026-02-03 09:00:00", 1.0), directory)
+    warm = query.aggregate("day", directory=directory)
+    assert len(read_counter) == 17
+    assert warm == query.aggregate("day", use_cache=False, directory=directory)
+    assert warm["2026-02-03"]["download_mbps"]["count"] == 4
+
+def test_cached_range_matches_a_plain_scan(directory):
+    fill(directory)
+    query.aggregate("day", directory=directory)
+    history.append_entry(entry("2026-02-06 07:00:00", 90.0), directory)
+    args = dict(since="2026-02-02 10:00:00", until="2026-02-06 23:59:59", directory=directory)
+    assert query.aggregate("day", **args) == query.aggregate("day", use_cache=False, **args)
+
+def test_rollups_survive_compaction(directory, monkeypatch):
+    monkeypatch.setattr(history, "SEGMENT_MAX_BYTES", 200) # a new segment every couple of entries
+    for day in range(1, 8):
+        history.append_entry(entry(f"2026-02-0{day} 12:00:00", 100.0 + day), directory)
+    query.aggregate("week", directory=directory)
+    history.compact_history(directory)
+    history.append_entry(entry("2026-02-09 12:00:00", 50.0), directory)
+    assert query.aggregate("week", directory=directory) == query.aggregate("week", use_cache=False, directory=directory)
+
+def test_isp_filters_get_their_own_cache(directory):
+    fill(directory)
+    history.append_entry(entry("2026-02-01 13:00:00", 5.0, isp="Cable Inc"), directory)
+    assert query.aggregate("month", isp="fiber", directory=directory)["2026-02"]["download_mbps"]["count"] == 15
+    assert query.aggregate("month", isp="cable", directory=directory)["2026-02"]["download_mbps"]["count"] == 1
+    assert query.aggregate("month", directory=directory)["2026-02"]["download_mbps"]["count"] == 16
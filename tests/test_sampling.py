@@ -0,0 +1,88 @@
+import io
+import time
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from localtest import sampling
+
+PAYLOAD = b"x" * 100_000
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+def test_counts_downloaded_bytes_as_they_are_read(url):
+    opener = sampling.CountingOpener(urllib.request.build_opener())
+    response = opener.open(urllib.request.Request(url))
+    assert response.status == 200 # anything else is passed through to the real response
+    response.read(1000)
+    assert opener.counter.value == 1000
+    while response.read(8192):
+        pass
+    assert opener.counter.value == len(PAYLOAD)
+
+class UploadData(io.BytesIO):
+    # like speedtest-cli's HTTPUploaderData, a file-like body urllib reads in blocks
+    pass
+
+def test_counts_uploaded_bytes_once(url):
+    opener = sampling.CountingOpener(urllib.request.build_opener())
+    data = UploadData(b"y" * 50_000)
+    request = urllib.request.Request(url, data=data, headers={"Content-Length": "50000"})
+    assert opener.open(request).read() == b"ok"
+    assert opener.counter.value == 50_000 # the body, not the 2 byte reply
+
+    data.seek(0)
+    opener.open(request).read() # reused body isn't wrapped a second time
+    assert opener.counter.value == 100_000
+
+def test_attach_counter_wraps_once():
+    class FakeSpeedtest:
+        _opener = urllib.request.build_opener()
+    st = FakeSpeedtest()
+    first, second = sampling.ByteCounter(), sampling.ByteCounter()
+    sampling.attach_counter(st, first)
+    wrapped = st._opener
+    sampling.attach_counter(st, second)
+    assert st._opener is wrapped
+    assert st._opener.counter is second
+
+def test_sampler_reports_throughput():
+    counter = sampling.ByteCounter()
+    sampler = sampling.ThroughputSampler(counter, interval=0.02).start()
+    for _ in range(10):
+        counter.add(125_000)
+        time.sleep(0.01)
+    samples = sampler.stop()
+    assert len(samples) >= 2
+    assert max(samples) > 0
+
+def test_samples_round_trip():
+    samples = [0.0, 12.5, 940.25, 1e4]
+    assert list(sampling.decode_samples(sampling.encode_samples(samples))) == samples
+    assert sampling.summarize_samples(samples)["peak_mbps"] == 1e4
+    assert sampling.summarize_samples([]) is None
@@ -0,0 +1,71 @@
+import os
+import sys
+import json
+import socket
+
+import pytest
+
+speedtest = pytest.importorskip("speedtest")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+import fake_speedtest # noqa: E402
+
+from localtest import servers # noqa: E402
+
+@pytest.fixture
+def fake_server(tmp_path, monkeypatch):
+    # state files are relative to the cwd, keep them out of the repo
+    monkeypatch.chdir(tmp_path)
+    server = fake_speedtest.start(server_count=1, test_length=1)
+    original = speedtest.build_request
+    fake_speedtest.redirect_speedtest(server.base)
+    yield server
+    speedtest.build_request = original
+    server.shutdown()
+    server.server_close()
+
+def dead_url():
+    # a loopback port that was just free, nothing answers on it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/speedtest/upload.php"
+
+def test_dead_cached_server_is_forgotten(fake_server):
+    st = speedtest.Speedtest()
+    key = servers.cache_key(st.config.get("client"))
+    dead = {"url": dead_url(), "id": "1", "name": "Gone", "sponsor": "Gone", "host": "127.0.0.1", "d": 0}
+    servers.store(key, dead, 12.0)
+
+    best, latency, source = servers.choose_server(st, speedtest.Speedtest, ttl_seconds=3600)
+
+    assert source == "discovered"
+    assert best["url"] != dead["url"]
+    assert latency < servers.UNREACHABLE_MS
+    with open(servers.SERVER_CACHE_FILE) as f:
+        assert json.load(f)[key]["server"]["url"] == best["url"]
+
+def test_live_cached_server_is_used(fake_server):
+    st = speedtest.Speedtest()
+    key = servers.cache_key(st.config.get("client"))
+    live = dict(st.get_closest_servers()[0])
+    servers.store(key, live, 1.0)
+
+    best, latency, source = servers.choose_server(speedtest.Speedtest(), speedtest.Speedtest, ttl_seconds=3600)
+
+    assert source == "cache"
+    assert best["url"] == live["url"]
+    assert latency < servers.UNREACHABLE_MS
+
+def test_hung_revalidation_does_not_block_exit(tmp_path):
+    import subprocess
+    script = (
+        "import threading\n"
+        "from localtest import servers\n"
+        "servers.REVALIDATE_WAIT_SECONDS = 0.5\n"
+        "servers.revalidate_in_background(lambda: threading.Event().wait(), 'key')\n"
+    )
+    root = os.path.join(os.path.dirname(__file__), "..")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    # without the daemon flag this never returns
+    subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, timeout=10, check=True)
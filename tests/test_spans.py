@@ -0,0 +1,25 @@
+import json
+
+from localtest import spans
+
+def test_span_records_timings():
+    timings = {}
+    with spans.span("download", timings) as s:
+        pass
+    assert timings["download"] == round(s.seconds, 3)
+    assert not spans.profiling()
+
+def test_profile_trace(tmp_path):
+    spans.start_profiling()
+    try:
+        with spans.span("outer", server="x"):
+            with spans.span("inner"):
+                pass
+    finally:
+        count = spans.stop_profiling(str(tmp_path / "trace.json"))
+    assert count == 2
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["inner", "outer"]
+    assert events[1]["args"] == {"server": "x"}
+    assert events[1]["dur"] >= events[0]["dur"]
+    assert spans.stop_profiling() == 0
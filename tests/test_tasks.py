@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+
+from localtest.tasks import run_graph
+
+def test_dependencies_see_earlier_results():
+    order = []
+    both_started = threading.Barrier(2, timeout=5)
+
+    def independent(name):
+        def func(results):
+            both_started.wait() # only passes if the two run at the same time
+            return name
+        return func
+
+    tasks = {
+        "a": (independent("a"), ()),
+        "b": (independent("b"), ()),
+        "c": (lambda results: results["a"] + results["b"], ("a", "b")),
+    }
+    results = run_graph(tasks, on_done=lambda name, result: order.append(name))
+    assert results["c"] == "ab"
+    assert order[-1] == "c"
+
+def test_failed_task_becomes_its_result():
+    def broken(results):
+        raise RuntimeError("nope")
+    results = run_graph({
+        "broken": (broken, ()),
+        "after": (lambda results: isinstance(results["broken"], RuntimeError), ("broken",)),
+    })
+    assert isinstance(results["broken"], RuntimeError)
+    assert results["after"] is True
+
+def test_circular_deps_are_rejected():
+    with pytest.raises(ValueError):
+        run_graph({"a": (lambda r: 1, ("b",)), "b": (lambda r: 2, ("a",))})
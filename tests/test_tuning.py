@@ -0,0 +1,30 @@
+from localtest import tuning
+
+def link(capacity, per_stream):
+    # each stream adds per_stream bits/s until the link is full
+    calls = []
+    def measure(streams):
+        calls.append(streams)
+        return min(capacity, streams * per_stream)
+    return measure, calls
+
+def test_ramp_stops_at_the_knee():
+    measure, calls = link(800e6, 100e6)
+    best, tried = tuning.ramp(measure)
+    assert best == 8
+    assert calls == [1, 2, 4, 8, 16]
+    assert tried[-1] == {"streams": 16, "mbps": 800.0}
+
+def test_ramp_walks_back_down_from_a_remembered_value():
+    measure, calls = link(200e6, 100e6)
+    best, _ = tuning.ramp(measure, start=tuning.starting_point(16))
+    assert best == 2
+    assert calls[:2] == [8, 16]
+
+def test_memory_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    key = tuning.memory_key("isp|1.2.3", {"id": "42"})
+    assert tuning.recall(key, "download") is None
+    tuning.remember(key, "download", 8)
+    assert tuning.recall(key, "download") == 8
+    assert tuning.recall(key, "upload") is None
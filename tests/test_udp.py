@@ -0,0 +1,56 @@
+import socket
+
+import pytest
+
+from localtest import udp
+
+@pytest.fixture
+def reflector():
+    reflector = udp.UdpReflector("127.0.0.1", 0).start()
+    yield reflector
+    reflector.close()
+
+def test_loopback_stream_is_clean(reflector):
+    host, port = reflector.address
+    result = udp.run_stream(host, port, rate=500, size=200, duration=1)
+    assert result["sent"] == 500
+    assert result["send_errors"] == 0
+    # loopback with 500 packets/s: nothing lost, nothing reordered, next to no jitter
+    assert result["loss_percent"] == 0
+    assert result["upstream_loss_percent"] == 0
+    assert result["duplicates"] == 0
+    assert result["reordered"] == 0
+    assert result["jitter_up_ms"] < 1
+    assert result["jitter_down_ms"] < 1
+    assert 0 < result["rtt_p50_ms"] < 10
+    assert sum(reflector.counts.values()) == 500
+
+def test_nothing_listening_is_all_loss():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    result = udp.run_stream("127.0.0.1", port, rate=100, size=64, duration=0.2)
+    assert result["received"] == 0
+    assert result["loss_percent"] == 100
+    assert result["jitter_up_ms"] is None
+
+def _stamped(seq, sent, count, reflected):
+    return udp.HEADER.pack(udp.MAGIC, seq, sent, count, reflected)
+
+def test_analyze_counts_loss_reordering_and_duplicates():
+    send_times = [i * 0.01 for i in range(5)]
+    # 0, 2, 1 (late), 2 again, 3 never made it back, 4 never reached the reflector
+    order = [(0, 1), (2, 3), (1, 2), (2, 3)]
+    raw = b"".join(_stamped(seq, send_times[seq], count, send_times[seq] + 0.005) for seq, count in order)
+    arrivals = [send_times[seq] + 0.01 for seq, _ in order]
+    result = udp.analyze(5, send_times, raw, arrivals)
+    assert result["received"] == 3
+    assert result["loss_percent"] == 40
+    assert result["upstream_loss_percent"] == 40
+    assert result["reordered"] == 1
+    assert result["duplicates"] == 1
+
+def test_rfc3550_jitter():
+    # constant transit time means zero jitter, a single 16 ms swing gives |D| / 16 = 1 ms
+    assert round(udp._rfc3550_jitter([(i, i + 0.005) for i in range(10)]), 6) == 0
+    assert round(udp._rfc3550_jitter([(0, 0.005), (1, 1.021)]), 6) == 1.0
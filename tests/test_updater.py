@@ -0,0 +1,85 @@
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from localtest import updater
+
+ETAG = '"v2"'
+INDEX = {"meta": {"api-version": "1.0"}, "name": "localtest", "files": [
+    {"filename": "localtest-1.0.0.tar.gz"},
+    {"filename": "localtest-1.1.0-py3-none-any.whl"},
+    {"filename": "localtest-1.1.0.tar.gz"},
+]}
+
+class _StubIndex(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+        body = json.dumps(INDEX).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", updater.SIMPLE_JSON)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def stub_index(tmp_path, monkeypatch):
+    # the cache file is relative to the cwd
+    monkeypatch.chdir(tmp_path)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubIndex)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def settings_for(base, ttl_hours=24):
+    return {"update_index_url": base, "update_check_ttl_hours": ttl_hours, "update_timeout_seconds": 2}
+
+def test_fetches_then_revalidates_with_etag(stub_index):
+    settings = settings_for(f"http://127.0.0.1:{stub_index.server_address[1]}/simple", ttl_hours=0)
+    cache = updater.refresh(settings=settings)
+    assert cache["latest"] == "1.1.0"
+    assert cache["etag"] == ETAG
+    assert "If-None-Match" not in stub_index.requests[0]
+
+    # past the TTL: a conditional request, a 304, and the cached answer stands
+    cache = updater.refresh(settings=settings)
+    assert stub_index.requests[1].get("If-None-Match") == ETAG
+    assert cache["latest"] == "1.1.0"
+    assert not cache.get("error")
+
+def test_fresh_cache_skips_the_network(stub_index):
+    settings = settings_for(f"http://127.0.0.1:{stub_index.server_address[1]}/simple")
+    updater.refresh(settings=settings)
+    assert updater.refresh(settings=settings)["latest"] == "1.1.0"
+    assert len(stub_index.requests) == 1
+
+def test_unreachable_index_is_remembered(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    settings = settings_for(f"http://127.0.0.1:{port}/simple")
+
+    cache = updater.refresh(settings=settings)
+    assert cache.get("error")
+    assert cache.get("latest") is None
+    assert updater.load_cache()["attempted_at"]
+
+    # no cache before the failure, but the next run within the TTL still doesn't try again
+    def no_network(*args, **kwargs):
+        raise AssertionError("should have used the cached failure")
+    monkeypatch.setattr(updater.urllib.request, "urlopen", no_network)
+    assert updater.refresh(settings=settings).get("error") == cache["error"]